@@ -0,0 +1,143 @@
+# broadcast.py
+# Barcha sotuvchilarga ommaviy xabar yuborish (admin /xabar buyrug'i).
+import os
+import asyncio
+import logging
+
+from telegram.error import RetryAfter, Forbidden, BadRequest, TelegramError
+
+from db import get_seller_chat_ids_after, count_sellers_with_chat_id, update_broadcast, get_running_broadcasts
+
+logger = logging.getLogger("broadcast")
+
+# --- Konfiguratsiya ---
+# Telegram umumiy chegarasi taxminan 30 xabar/soniya, biz biroz pastroq ushlaymiz
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "28"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "100"))
+PROGRESS_EDIT_INTERVAL = 3.0   # holat xabarini necha soniyada bir tahrirlash
+SEND_ATTEMPTS = 3
+
+# Shu jarayonda ishlayotgan broadcast ID lari (ikki marta ishga tushmasligi uchun)
+_active_broadcasts = set()
+
+
+class RateLimiter:
+    """
+    Tezlik cheklovchisi (soniyasiga `rate` ta so'rov). Navbat joyi await siz band qilinadi,
+    shuning uchun qulf kerak emas va cheklovchi istalgan event loopda ishlaydi.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+
+    async def wait(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            paused_until = self._paused_until
+            slot = max(now, self._next_slot, paused_until)
+            self._next_slot = slot + self.interval
+            if slot > now: await asyncio.sleep(slot - now)
+            # Kutish paytida RetryAfter kelgan bo'lsa, pauzadan keyin navbat qayta olinadi
+            if self._paused_until == paused_until: return
+
+    def pause(self, seconds: float) -> None:
+        """Telegram RetryAfter qaytarganda keyingi (va allaqachon kutayotgan) barcha yuborishlarni kechiktiradi."""
+        resume_at = asyncio.get_running_loop().time() + seconds
+        self._paused_until = max(self._paused_until, resume_at)
+
+
+# Bir vaqtda ishlayotgan barcha broadcastlar uchun bitta: Bot API chegarasi bot bo'yicha umumiy,
+# RetryAfter ham hamma yuborishlarni to'xtatadi
+_limiter = RateLimiter(BROADCAST_RATE)
+
+
+async def _send_one(bot, chat_id: int, text: str, limiter: RateLimiter, semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
+        for attempt in range(SEND_ATTEMPTS):
+            await limiter.wait()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+                return True
+            except RetryAfter as e:
+                limiter.pause(float(e.retry_after))
+            except (Forbidden, BadRequest):
+                # Foydalanuvchi botni bloklagan yoki chat mavjud emas - qayta urinish befoyda
+                return False
+            except TelegramError as e:
+                logger.error(f"{chat_id} ga yuborishda xato ({attempt + 1}/{SEND_ATTEMPTS}): {e}")
+                await asyncio.sleep(1)
+        return False
+
+
+def _progress_text(sent: int, failed: int, total: int, done: bool) -> str:
+    title = "✅ Xabar yuborish yakunlandi." if done else "📨 Xabar yuborilmoqda..."
+    return f"{title}\n\nYuborildi: {sent}\nYuborilmadi: {failed}\nJami sotuvchilar: {total}"
+
+
+async def _edit_status(bot, broadcast: dict, text: str, limiter: RateLimiter) -> None:
+    if not broadcast.get('status_message_id'): return
+    await limiter.wait()
+    try:
+        await bot.edit_message_text(
+            chat_id=broadcast['admin_chat_id'], message_id=broadcast['status_message_id'], text=text
+        )
+    except TelegramError as e:
+        # "message is not modified" va shunga o'xshash xatolar yuborishni to'xtatmasligi kerak
+        logger.error(f"holat xabarini tahrirlab bo'lmadi: {e}")
+
+
+async def run_broadcast(bot, broadcast: dict) -> None:
+    """
+    Sotuvchilarni bazadan BROADCAST_BATCH_SIZE tadan o'qib, parallel (BROADCAST_CONCURRENCY)
+    va barcha broadcastlar uchun umumiy tezlik chegarasi (_limiter) ostida yuboradi. Har bir
+    to'plamdan keyin last_seller_id saqlanadi, shuning uchun jarayon qayta ishga tushsa, broadcast
+    shu joydan davom etadi (eng ko'pi bilan oxirgi to'plam qayta yuborilishi mumkin).
+    """
+    broadcast_id = broadcast['id']
+    if broadcast_id in _active_broadcasts: return
+    _active_broadcasts.add(broadcast_id)
+
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+
+    last_id = broadcast['last_seller_id']
+    sent, failed = broadcast['sent'], broadcast['failed']
+    total = count_sellers_with_chat_id()
+    last_edit = 0.0
+
+    try:
+        while True:
+            batch = get_seller_chat_ids_after(last_id, BROADCAST_BATCH_SIZE)
+            if batch is None:
+                # DB vaqtincha ishlamayapti: holat 'running' qoladi, keyinroq davom ettiriladi
+                logger.error(f"Broadcast #{broadcast_id}: sotuvchilarni o'qib bo'lmadi, to'xtatildi.")
+                return
+            if not batch: break
+
+            results = await asyncio.gather(*(
+                _send_one(bot, row['chat_id'], broadcast['matn'], _limiter, semaphore) for row in batch
+            ))
+            sent += sum(results)
+            failed += len(results) - sum(results)
+            last_id = batch[-1]['id']
+            update_broadcast(broadcast_id, last_seller_id=last_id, sent=sent, failed=failed)
+
+            if loop.time() - last_edit >= PROGRESS_EDIT_INTERVAL:
+                last_edit = loop.time()
+                await _edit_status(bot, broadcast, _progress_text(sent, failed, total, done=False), _limiter)
+
+        update_broadcast(broadcast_id, holat='done')
+        await _edit_status(bot, broadcast, _progress_text(sent, failed, total, done=True), _limiter)
+    finally:
+        _active_broadcasts.discard(broadcast_id)
+
+
+async def resume_broadcasts(application) -> None:
+    """Jarayon to'xtab qolgan ('running' holatidagi) broadcastlarni qayta ishga tushiradi."""
+    for broadcast in get_running_broadcasts():
+        logger.info(f"Broadcast #{broadcast['id']}: {broadcast['last_seller_id']} dan keyin davom ettirilmoqda.")
+        application.create_task(run_broadcast(application.bot, broadcast))
@@ -0,0 +1,71 @@
+# cache_events.py
+# Postgres LISTEN/NOTIFY orqali kesh eskirtirish xabarlarini bot loopida tinglash.
+# Boshqa jarayon (yoki bazani qo'lda tahrirlash) mahsulot/sotuvchi/inventarni o'zgartirsa,
+# db.py dagi yozuvchilar va triggerlar CACHE_CHANNEL ga xabar yuboradi; bu yerda u
+# bir necha millisekundda tegishli kesh yozuvini o'chiradi.
+import os
+import asyncio
+import logging
+
+import psycopg2
+
+from db import open_listen_connection
+
+logger = logging.getLogger("cache_events")
+
+LISTEN_RETRY_MAX_DELAY = float(os.getenv("LISTEN_RETRY_MAX_DELAY", "60"))
+
+_connected = False
+
+
+def is_connected() -> bool:
+    """Xabarlar hozir tinglanyaptimi (ha bo'lsa, keshlar o'z-o'zidan eskirtiriladi)."""
+    return _connected
+
+
+async def listen(on_event, on_flush) -> None:
+    """
+    Ulanish uzilsa, eksponensial kutish bilan qayta ulanadi. Har safar (qayta) ulanganda
+    on_flush() chaqiriladi: ulanish yo'q paytda yuborilgan xabarlar yo'qolgan bo'lishi mumkin.
+    on_event(payload) har bir xabar uchun chaqiriladi.
+    """
+    global _connected
+    loop = asyncio.get_running_loop()
+    delay = 1.0
+
+    while True:
+        # Ulanish ochilishi bloklaydi (connect_timeout gacha), shuning uchun alohida threadda
+        conn = await loop.run_in_executor(None, open_listen_connection)
+        if conn is None:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTEN_RETRY_MAX_DELAY)
+            continue
+
+        delay = 1.0
+        _connected = True
+        on_flush()
+        logger.info("Kesh xabarlari tinglanmoqda.")
+
+        readable = asyncio.Event()
+        fd = conn.fileno()
+        loop.add_reader(fd, readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                # Ulanish uzilgan bo'lsa, poll() xato chiqaradi
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        on_event(notify.payload)
+                    except Exception as e:
+                        logger.error(f"Kesh xabarini qayta ishlashda xato ({notify.payload!r}): {e}")
+        except (psycopg2.Error, OSError) as e:
+            logger.warning(f"Kesh xabarlari ulanishi uzildi, qayta ulaniladi: {e}")
+        finally:
+            _connected = False
+            loop.remove_reader(fd)
+            conn.close()
+
+        await asyncio.sleep(delay)
@@ -0,0 +1,200 @@
+# chat_processor.py
+# Update larni chat bo'yicha tartib bilan qayta ishlash: bitta chatning update lari
+# navbat bilan (ketma-ket), turli chatlar esa parallel, lekin umumiy chegaradan oshmagan holda.
+# Qabul ham chegaralangan (BoundedUpdateQueue): PTB har bir olingan update uchun darhol task
+# yaratadi, shuning uchun chegara update_queue dan olish bosqichida qo'yiladi.
+#
+# Benchmark (DB va Telegramsiz): python chat_processor.py
+import os
+import time
+import asyncio
+import threading
+from collections import Counter
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# --- Konfiguratsiya ---
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "64"))     # bir vaqtda ishlayotgan handlerlar
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES", "10000"))    # navbatda + ishlayotgan update lar
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))         # olinmagan update lar (to'lsa polling kutadi)
+
+
+def _chat_key(update: object) -> int or None:
+    """Tartib kaliti: chat, u bo'lmasa foydalanuvchi (masalan, inline so'rovlar)."""
+    if not isinstance(update, Update): return None
+    if update.effective_chat: return update.effective_chat.id
+    if update.effective_user: return update.effective_user.id
+    return None
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """
+    Application.update_queue uchun. PTB ning update fetcheri navbatdan olgan har bir update uchun
+    kutmasdan task yaratadi - odatdagi navbatda tasklar soni cheklanmaydi. Bu yerda get()
+    `max_in_flight` ta update tugallanmaguncha (task_done) keyingisini bermaydi, `maxsize` esa
+    navbatni cheklaydi: navbat to'lsa Updater ning put() i kutadi va getUpdates to'xtaydi -
+    yangi update lar Telegram serverida qoladi.
+    """
+
+    def __init__(self, maxsize: int = UPDATE_QUEUE_SIZE, max_in_flight: int = MAX_PENDING_UPDATES):
+        super().__init__(maxsize)
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._has_capacity = asyncio.Event()
+        self._has_capacity.set()
+
+    async def get(self):
+        while self._in_flight >= self.max_in_flight:
+            self._has_capacity.clear()
+            await self._has_capacity.wait()
+        item = await super().get()
+        self._in_flight += 1
+        return item
+
+    def task_done(self) -> None:
+        super().task_done()
+        # To'xtatishda PTB olinmagan update lar uchun ham task_done chaqiradi
+        if self._in_flight > 0:
+            self._in_flight -= 1
+            self._has_capacity.set()
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Bitta chat_id ning update lari kelgan tartibida, birin-ketin bajariladi (ConversationHandler
+    holatlari poyga qilmasligi uchun). Turli chatlar parallel ishlaydi, lekin bir vaqtda
+    `max_concurrent_chats` tadan ko'p handler ishlamaydi.
+
+    Chat navbatida kutayotgan update umumiy slotni band qilmaydi: bitta faol chat
+    boshqa chatlarni to'sib qo'ymaydi. `max_pending_updates` - kutayotganlar bilan
+    birga jami update lar chegarasi (PTB semafori).
+    """
+
+    def __init__(self, max_concurrent_chats: int = MAX_CONCURRENT_CHATS, max_pending_updates: int = MAX_PENDING_UPDATES):
+        super().__init__(max_concurrent_updates=max_pending_updates)
+        self.max_concurrent_chats = max_concurrent_chats
+        self._slots = None        # asyncio.Semaphore, initialize() da (loop ichida) yaratiladi
+        self._chat_locks = {}     # chat_id -> asyncio.Lock
+        self._pending = Counter() # chat_id -> navbatdagi + ishlayotgan update lar
+        self._running = 0
+        self._stats_lock = threading.Lock()   # queue_depths() HTTP server threadidan o'qiladi
+
+    async def initialize(self) -> None:
+        self._slots = asyncio.Semaphore(self.max_concurrent_chats)
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _enter(self, key) -> asyncio.Lock:
+        with self._stats_lock:
+            self._pending[key] += 1
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        return lock
+
+    def _leave(self, key) -> None:
+        with self._stats_lock:
+            self._pending[key] -= 1
+            if self._pending[key] <= 0:
+                del self._pending[key]
+                # Navbati bo'sh chatning qulfi kerak emas (xotira o'smasligi uchun)
+                self._chat_locks.pop(key, None)
+
+    async def run_update(self, update: object, coroutine) -> None:
+        """Update ni yakuniy bajarish (tracing uchun subclassda qayta aniqlanadi)."""
+        await coroutine
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = _chat_key(update)
+        if key is None:
+            async with self._slots:
+                await self._run_counted(update, coroutine)
+            return
+
+        # _enter() await siz chaqiriladi: qulf navbati update kelgan tartibda quriladi
+        lock = self._enter(key)
+        try:
+            async with lock:
+                async with self._slots:
+                    await self._run_counted(update, coroutine)
+        finally:
+            self._leave(key)
+
+    async def _run_counted(self, update: object, coroutine) -> None:
+        with self._stats_lock:
+            self._running += 1
+        try:
+            await self.run_update(update, coroutine)
+        finally:
+            with self._stats_lock:
+                self._running -= 1
+
+    def queue_depths(self, top: int = 20) -> dict:
+        """Navbat holati: ishlayotganlar, kutayotganlar va eng uzun navbatli chatlar."""
+        with self._stats_lock:
+            pending = dict(self._pending)
+            running = self._running
+        busiest = sorted(pending.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            'running': running,
+            'max_concurrent_chats': self.max_concurrent_chats,
+            'pending_total': sum(pending.values()),
+            'active_chats': len(pending),
+            'busiest_chats': [{'chat_id': key, 'pending': count} for key, count in busiest],
+        }
+
+
+# --- Benchmark: bitta "shovqinli" chat boshqalarni kutdirib qo'ymasligi kerak ---
+
+async def _benchmark(hot_updates: int = 2000, quiet_chats: int = 200, quiet_updates: int = 5,
+                     handler_ms: float = 2.0, cap: int = 32) -> None:
+    from types import SimpleNamespace
+
+    processor = ChatOrderedUpdateProcessor(max_concurrent_chats=cap)
+    await processor.initialize()
+
+    seen = {}            # chat_id -> bajarilgan tartib raqamlari
+    waits = {'hot': [], 'quiet': []}
+
+    def fake_update(chat_id: int):
+        update = Update.__new__(Update)
+        object.__setattr__(update, '_effective_chat', SimpleNamespace(id=chat_id))
+        return update
+
+    async def handler(chat_id: int, seq: int, queued_at: float) -> None:
+        waits['hot' if chat_id == 0 else 'quiet'].append(time.perf_counter() - queued_at)
+        seen.setdefault(chat_id, []).append(seq)
+        await asyncio.sleep(handler_ms / 1000)
+
+    # Avval issiq chatning butun to'lqini, keyin jim chatlar (eng yomon holat)
+    plan = [(0, i) for i in range(hot_updates)]
+    plan += [(chat_id, i) for i in range(quiet_updates) for chat_id in range(1, quiet_chats + 1)]
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(processor.process_update(fake_update(chat_id), handler(chat_id, seq, time.perf_counter())))
+        for chat_id, seq in plan
+    ]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    ordered = all(sequence == sorted(sequence) for sequence in seen.values())
+
+    def pct(values: list, q: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    print(f"Update lar: {len(plan)}, cap={cap}, handler={handler_ms}ms, jami {elapsed:.2f}s")
+    print(f"Chat ichida tartib saqlandimi: {'ha' if ordered else 'YO`Q'}")
+    for name in ('quiet', 'hot'):
+        print(f"  {name:5} kutish: p50={pct(waits[name], 0.5):8.1f}ms  p95={pct(waits[name], 0.95):8.1f}ms  "
+              f"max={pct(waits[name], 1.0):8.1f}ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(_benchmark())
@@ -1,32 +1,613 @@
 # db.py
 import os
 import sys
+import time
+import random
+import gzip
+import uuid
+import logging
+import threading
+import contextvars
+import contextlib
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
+from psycopg2.extras import RealDictCursor, execute_values
+from datetime import datetime, date
+
+import journal
+from tracing import traced
+
+logger = logging.getLogger("db")
 
 # --- Konfiguratsiya ---
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Ixtiyoriy: bir yoki bir nechta (vergul bilan ajratilgan) o'qish replikalari
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URL", "").split(',') if u.strip()]
+
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))                 # soniya
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))   # lag qayta tekshirish oralig'i
+REPLICA_RETRY_AFTER = float(os.getenv("REPLICA_RETRY_AFTER", "30"))         # ishlamayotgan replikani qayta sinash
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "3"))
+# Yozgan chat shu vaqt davomida o'qishni ham asosiy bazadan qiladi (read-your-writes)
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "10"))
+
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+# Circuit breaker: shuncha ketma-ket ulanish xatosidan keyin baza "ochiq" (ishlamayapti) deb olinadi
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "3"))
+DB_BREAKER_BASE_DELAY = float(os.getenv("DB_BREAKER_BASE_DELAY", "1"))   # birinchi qayta sinash (soniya)
+DB_BREAKER_MAX_DELAY = float(os.getenv("DB_BREAKER_MAX_DELAY", "60"))
+
+# inventory oylik bo'limlari: joriy oydan tashqari nechta oy oldindan yaratiladi
+INVENTORY_PARTITION_MONTHS_AHEAD = int(os.getenv("INVENTORY_PARTITION_MONTHS_AHEAD", "3"))
+INVENTORY_ARCHIVE_DIR = os.getenv("INVENTORY_ARCHIVE_DIR", "archive")
+
+# Mahsulot qoldig'i shuncha qatorga (shard) bo'lib saqlanadi: bir mahsulotni parallel berish
+# bitta qator qulfida navbatga turmasligi uchun
+STOCK_SHARDS = int(os.getenv("STOCK_SHARDS", "8"))
+
+# Jurnal replay qilinganda bitta tranzaksiyadagi yozuvlar soni
+JOURNAL_REPLAY_BATCH = int(os.getenv("JOURNAL_REPLAY_BATCH", "500"))
+
+# Keshlarni eskirtirish xabarlari (LISTEN/NOTIFY). Payload: 'products', 'sellers',
+# 'inventory:<seller_id>:<id>' (yangi yozuvlar, id - so'rovdagi eng kichigi), 'inventory:<seller_id>'
+# yoki 'inventory' (barcha sotuvchilar)
+CACHE_CHANNEL = "cache_invalidation"
+
+# get_user_role baza ishlamaganda qaytaradigan alohida natija
+ROLE_UNAVAILABLE = 'unavailable'
 
 if not DATABASE_URL:
-    print("!!! KRITIK XATO: DATABASE_URL muhit o'zgaruvchisi topilmadi.", file=sys.stderr)
+    logger.critical("DATABASE_URL muhit o'zgaruvchisi topilmadi.")
+
+# --- Circuit Breaker ---
+
+class CircuitBreaker:
+    """
+    Baza ishlamay qolganda har bir so'rov ulanish timeoutini kutmasligi uchun.
+    closed: odatdagi ish. Ketma-ket `failure_threshold` xatodan keyin -> open.
+    open: ulanishga urinilmaydi (darhol rad etiladi). Kutish vaqti tugagach -> half_open.
+    half_open: bitta sinov ulanishiga ruxsat; muvaffaqiyat -> closed, xato -> open
+    (kutish vaqti har safar ikki baravar oshadi, jitter bilan, max_delay gacha).
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, base_delay: float, max_delay: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trips = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED: return True
+            if self.state == self.OPEN and time.monotonic() >= self._retry_at:
+                self.state = self.HALF_OPEN
+                return True
+            # open yoki half_open sinovi hali tugamagan
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} qayta ishlayapti (circuit closed).")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trips = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._trips += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (self._trips - 1))
+                delay = random.uniform(delay / 2, delay)
+                self._retry_at = time.monotonic() + delay
+                if self.state != self.OPEN:
+                    logger.critical(f"{self.name} ishlamayapti, {delay:.1f}s dan keyin qayta sinaladi (circuit open).")
+                self.state = self.OPEN
+
+_primary_breaker = CircuitBreaker("Asosiy baza", DB_BREAKER_FAILURES, DB_BREAKER_BASE_DELAY, DB_BREAKER_MAX_DELAY)
+# Joriy update ichidagi oxirgi ulanish urinishi muvaffaqiyatsiz bo'lganmi
+_connection_failed = contextvars.ContextVar('db_connection_failed', default=False)
+
+def db_unavailable() -> bool:
+    """
+    Oxirgi DB funksiyasi bo'sh natijani baza ishlamagani uchun qaytardimi.
+    Handlerlar "topilmadi" va "vaqtincha ishlamayapti" holatlarini shu orqali ajratadi.
+    """
+    return _connection_failed.get()
+
+# --- So'rovlarni Yo'naltirish (asosiy baza / replikalar) ---
+
+# Joriy update qaysi chatga tegishli ekanini bildiradi (main.py har bir update uchun o'rnatadi)
+_current_chat_id = contextvars.ContextVar('db_current_chat_id', default=None)
+# True bo'lsa, readonly so'rovlar ham asosiy bazaga boradi (read_from_primary)
+_force_primary = contextvars.ContextVar('db_force_primary', default=False)
+# chat_id -> oxirgi yozuv vaqti (time.monotonic)
+_recent_writes = {}
+# replika url -> {'lag': float or None, 'checked_at': float, 'breaker': CircuitBreaker}
+_replica_state = {}
+
+def set_request_chat_id(chat_id: int or None) -> None:
+    _current_chat_id.set(chat_id)
+    _connection_failed.set(False)
+
+def _mark_write() -> None:
+    chat_id = _current_chat_id.get()
+    if chat_id is None: return
+    now = time.monotonic()
+    _recent_writes[chat_id] = now
+    if len(_recent_writes) > 1000:
+        for key, written_at in list(_recent_writes.items()):
+            if now - written_at > READ_YOUR_WRITES_WINDOW: del _recent_writes[key]
+
+@contextlib.contextmanager
+def read_from_primary():
+    """
+    Ichidagi o'qishlar replikaga emas, asosiy bazaga boradi. Umumiy keshlarni to'ldirish uchun:
+    asosiy bazaning NOTIFY xabari keshni tozalagandan keyin orqada qolgan replika uni eski
+    ma'lumot bilan qayta to'ldirmasligi kerak.
+    """
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+def _wrote_recently() -> bool:
+    written_at = _recent_writes.get(_current_chat_id.get())
+    return written_at is not None and time.monotonic() - written_at < READ_YOUR_WRITES_WINDOW
+
+def _replica_lag(conn) -> float or None:
+    """Replikaning orqada qolishi (soniya). Replika bo'lmagan oddiy server uchun 0."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+        """)
+        lag = float(cursor.fetchone()[0])
+        conn.rollback()
+        return lag
+    except Exception as e:
+        logger.error(f"replika lag tekshiruvi: {e}")
+        return None
+
+def _get_replica_connection():
+    now = time.monotonic()
+    urls = DATABASE_REPLICA_URLS[:]
+    random.shuffle(urls)
+
+    for url in urls:
+        state = _replica_state.get(url)
+        if state is None:
+            state = _replica_state[url] = {
+                'lag': 0.0, 'checked_at': 0.0,
+                'breaker': CircuitBreaker("Replika", 1, REPLICA_RETRY_AFTER, REPLICA_RETRY_AFTER * 4),
+            }
+
+        recheck = now - state['checked_at'] >= REPLICA_CHECK_INTERVAL
+        if not recheck and (state['lag'] is None or state['lag'] > REPLICA_MAX_LAG): continue
+        if not state['breaker'].allow(): continue
+
+        try:
+            conn = psycopg2.connect(url, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+        except Exception as e:
+            logger.error(f"replikaga ulanib bo'lmadi, asosiy bazaga o'tiladi: {e}")
+            state['breaker'].record_failure()
+            continue
+        state['breaker'].record_success()
+
+        if recheck:
+            state['lag'], state['checked_at'] = _replica_lag(conn), now
+
+        if state['lag'] is None or state['lag'] > REPLICA_MAX_LAG:
+            conn.close()
+            continue
+        return conn
+
+    return None
 
 # --- DB Ulanish Funksiyasi ---
-def get_db_connection():
-    """PostgreSQL bazasiga ulanishni yaratadi."""
+@traced("db.connect")
+def get_db_connection(readonly: bool = False):
+    """
+    PostgreSQL bazasiga ulanishni yaratadi.
+    readonly=True bo'lsa va replika sozlangan bo'lsa, ulanish replikaga ochiladi. Replika
+    ishlamasa, orqada qolsa yoki shu chat yaqinda yozgan bo'lsa - asosiy bazaga.
+    Asosiy baza circuit breaker "open" holatida bo'lsa, darhol None qaytadi.
+    """
+    if readonly and DATABASE_REPLICA_URLS and not _force_primary.get() and not _wrote_recently():
+        conn = _get_replica_connection()
+        if conn:
+            _connection_failed.set(False)
+            return conn
+
+    if not _primary_breaker.allow():
+        _connection_failed.set(True)
+        return None
+
+    try:
+        conn = psycopg2.connect(DATABASE_URL, connect_timeout=DB_CONNECT_TIMEOUT)
+    except Exception as e:
+        logger.critical(f"Bazaga ulanishda xato: {e}")
+        _primary_breaker.record_failure()
+        _connection_failed.set(True)
+        return None
+
+    _primary_breaker.record_success()
+    _connection_failed.set(False)
+    return conn
+
+def _connection_lost(conn, error: Exception) -> bool:
+    """
+    Xato ulanish uzilganidan kelib chiqqanmi. Statement timeout yoki deadlock (ular ham
+    OperationalError) ulanishni yopmaydi va bazaning ishlamayotganini bildirmaydi.
+    """
+    return bool(conn is not None and conn.closed) or isinstance(error, psycopg2.InterfaceError)
+
+def _record_query_failure(conn, error: Exception) -> None:
+    """
+    So'rov o'rtasida ulanish uzilgan bo'lsa, shu server (asosiy baza yoki replika) circuit
+    breakeriga xato yoziladi va db_unavailable() True bo'ladi - handler foydalanuvchiga
+    "topilmadi" emas, "vaqtincha ishlamayapti" deb javob beradi.
+    """
+    if not _connection_lost(conn, error): return
+    replica = _replica_state.get(getattr(conn, 'dsn', None))
+    (replica['breaker'] if replica else _primary_breaker).record_failure()
+    _connection_failed.set(True)
+
+# --- Keshlarni eskirtirish (LISTEN/NOTIFY) ---
+
+def _notify(cursor, payload: str) -> None:
+    """Tranzaksiya commit bo'lganda tinglovchilarga yuboriladi (rollback bo'lsa - yo'q).
+    Bir tranzaksiyadagi bir xil payloadlar (yozuvchi + trigger) Postgres tomonidan birlashtiriladi."""
+    cursor.execute("SELECT pg_notify(%s, %s)", (CACHE_CHANNEL, payload))
+
+def _create_notify_triggers(cursor) -> None:
+    """
+    Bazani bot chetlab o'zgartirganda ham (qo'lda tahrir, boshqa jarayon) xabar yuboriladi.
+    Hamma triggerlar statement darajasida: NOTIFY commit paytida umumiy navbat qulfini oladi,
+    shuning uchun har bir qator uchun emas, har bir so'rovda sotuvchi boshiga bittadan yuboriladi.
+    inventory ga INSERT 'inventory:<seller_id>:<eng kichik yangi id>' yuboradi - hisobot keshi
+    tashlanmaydi, faqat yangi yozuvlar bilan to'ldiriladi. UPDATE/DELETE esa 'inventory:<seller_id>'.
+    """
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'inventory_archived_totals' THEN
+                PERFORM pg_notify('{CACHE_CHANNEL}', 'inventory');
+            ELSE
+                PERFORM pg_notify('{CACHE_CHANNEL}', TG_TABLE_NAME);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    # Transition jadvallar (new_rows/old_rows) so'rov o'zgartirgan barcha qatorlarni, bo'limlangan
+    # jadvalda ham (bo'limlarga yo'naltirilganlari bilan) beradi
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_inventory_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('{CACHE_CHANNEL}', 'inventory:' || seller_id || ':' || MIN(id))
+                FROM new_rows WHERE seller_id IS NOT NULL GROUP BY seller_id;
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM pg_notify('{CACHE_CHANNEL}', 'inventory:' || seller_id)
+                FROM (SELECT seller_id FROM old_rows UNION SELECT seller_id FROM new_rows) s
+                WHERE seller_id IS NOT NULL;
+            ELSE
+                PERFORM pg_notify('{CACHE_CHANNEL}', 'inventory:' || seller_id)
+                FROM (SELECT DISTINCT seller_id FROM old_rows) s WHERE seller_id IS NOT NULL;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    # Transition jadvalli trigger faqat bitta hodisaga bo'lishi mumkin - inventory da uchta
+    triggers = (
+        ('products', 'products_cache_notify', "INSERT OR UPDATE OR DELETE", "", 'notify_cache_invalidation'),
+        ('sellers', 'sellers_cache_notify', "INSERT OR UPDATE OR DELETE", "", 'notify_cache_invalidation'),
+        ('inventory_archived_totals', 'inventory_archived_totals_cache_notify', "INSERT OR UPDATE OR DELETE", "",
+         'notify_cache_invalidation'),
+        ('inventory', 'inventory_cache_notify_insert', "INSERT", "REFERENCING NEW TABLE AS new_rows",
+         'notify_inventory_change'),
+        ('inventory', 'inventory_cache_notify_update', "UPDATE",
+         "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows", 'notify_inventory_change'),
+        ('inventory', 'inventory_cache_notify_delete', "DELETE", "REFERENCING OLD TABLE AS old_rows",
+         'notify_inventory_change'),
+    )
+    # Trigger faqat yo'q bo'lsa yaratiladi: CREATE/DROP TRIGGER jadvalni qisqa vaqtga to'liq
+    # qulflaydi, har bir jarayon ishga tushganda buni inventory da qilish kerak emas.
+    # Hali yaratilmagan jadval (migratsiya create_tables dan oldin) o'tkazib yuboriladi.
+    for table, name, events, referencing, function in triggers:
+        cursor.execute(
+            "SELECT to_regclass(%s) IS NULL OR EXISTS "
+            "(SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND tgname = %s)",
+            (table, table, name)
+        )
+        if cursor.fetchone()[0]: continue
+        cursor.execute(
+            f"CREATE TRIGGER {name} AFTER {events} ON {table} {referencing} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+
+    # Oldingi versiyaning har bir qator uchun NOTIFY yuboradigan triggeri (bir marta o'chiriladi)
+    cursor.execute(
+        "SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass('inventory') AND tgname = 'inventory_cache_notify'"
+    )
+    if cursor.fetchone():
+        cursor.execute("DROP TRIGGER inventory_cache_notify ON inventory")
+
+def open_listen_connection():
+    """CACHE_CHANNEL ni tinglovchi alohida (autocommit) ulanish. Ulanib bo'lmasa None."""
     try:
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = psycopg2.connect(
+            DATABASE_URL, connect_timeout=DB_CONNECT_TIMEOUT,
+            # Jim turgan ulanish uzilganini sezish uchun (tinglovchi o'zi so'rov yubormaydi)
+            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+        )
+        conn.autocommit = True
+        conn.cursor().execute(f"LISTEN {CACHE_CHANNEL}")
         return conn
     except Exception as e:
-        print(f"!!! KRITIK XATO (DB): Bazaga ulanishda xato: {e}", file=sys.stderr)
+        logger.error(f"open_listen_connection: {e}")
         return None
 
+# --- Inventar Bo'limlari (oylik partitionlar) ---
+
+def _inventory_ddl(table: str, id_column: str) -> str:
+    """inventory jadvalining `sana` bo'yicha oylik bo'limlangan (RANGE) ko'rinishi."""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id {id_column},
+            seller_id INTEGER REFERENCES sellers(id),
+            product_id INTEGER REFERENCES products(id),
+            soni INTEGER NOT NULL,
+            narxi DECIMAL(10, 2) NOT NULL,
+            sana TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            request_id VARCHAR(36),
+            PRIMARY KEY (id, sana),
+            UNIQUE (request_id, sana)
+        ) PARTITION BY RANGE (sana);
+    """
+
+def _add_months(month: date, count: int) -> date:
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+def _partition_name(month: date) -> str:
+    return f"inventory_y{month.year:04d}m{month.month:02d}"
+
+def _is_partitioned(cursor, table: str) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+def _create_month_partitions(cursor, parent: str, first_month: date, last_month: date) -> None:
+    month = first_month
+    while month <= last_month:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s)",
+            (month, _add_months(month, 1))
+        )
+        month = _add_months(month, 1)
+    # Hech bir oyga tushmagan yozuvlar yo'qolmasligi uchun
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS inventory_default PARTITION OF {parent} DEFAULT")
+
+def ensure_inventory_partitions() -> bool:
+    """Joriy va keyingi INVENTORY_PARTITION_MONTHS_AHEAD oy uchun bo'limlarni yaratadi (har kuni chaqiriladi)."""
+    conn = get_db_connection()
+    if not conn: return False
+    try:
+        cursor = conn.cursor()
+        if not _is_partitioned(cursor, 'inventory'): return True
+        this_month = date.today().replace(day=1)
+        _create_month_partitions(cursor, 'inventory', this_month, _add_months(this_month, INVENTORY_PARTITION_MONTHS_AHEAD))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"ensure_inventory_partitions: {e}")
+        conn.rollback()
+        return False
+    finally:
+        if conn: conn.close()
+
+def migrate_inventory_to_partitioned(batch_size: int = 5000) -> bool:
+    """
+    Eski (oddiy) inventory jadvalini bo'limlangan jadvalga bot ishlab turgan holda ko'chiradi:
+    1) inventory_partitioned yaratiladi, ma'lumot id bo'yicha kichik tranzaksiyalarda nusxalanadi
+       (bu vaqtda bot eski jadvalga yozishda davom etadi);
+    2) oxirida qisqa EXCLUSIVE lock ostida qolgan yangi yozuvlar ko'chiriladi va jadvallar
+       nomi almashtiriladi. Eski jadval inventory_legacy bo'lib qoladi (tekshirib, qo'lda o'chiriladi).
+    To'xtab qolsa, qayta ishga tushirish mumkin - nusxalash to'xtagan joyidan davom etadi.
+    """
+    conn = get_db_connection()
+    if not conn: return False
+    try:
+        cursor = conn.cursor()
+        if _is_partitioned(cursor, 'inventory'):
+            logger.info("inventory allaqachon bo'limlangan.")
+            return True
+
+        # Ko'chirish yangi kod bilan create_tables dan oldin ishga tushirilgan bo'lishi mumkin
+        _ensure_request_id_column(cursor)
+        cursor.execute("SELECT pg_get_serial_sequence('inventory', 'id')")
+        sequence = cursor.fetchone()[0]
+        cursor.execute(_inventory_ddl('inventory_partitioned', f"INTEGER NOT NULL DEFAULT nextval('{sequence}')"))
+
+        cursor.execute("SELECT MIN(sana), COALESCE(MAX(id), 0) FROM inventory")
+        min_sana, max_id = cursor.fetchone()
+        this_month = date.today().replace(day=1)
+        first_month = min_sana.date().replace(day=1) if min_sana else this_month
+        _create_month_partitions(cursor, 'inventory_partitioned', first_month, _add_months(this_month, INVENTORY_PARTITION_MONTHS_AHEAD))
+        # Indekslar jadval bo'sh paytda quriladi (nusxalashdan oldin)
+        for name, columns in _INVENTORY_INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name.replace('idx_inventory_', 'idx_inventory_p_')} ON inventory_partitioned {columns}")
+        conn.commit()
+
+        copy_sql = """
+            INSERT INTO inventory_partitioned (id, seller_id, product_id, soni, narxi, sana, request_id)
+            SELECT id, seller_id, product_id, soni, narxi, COALESCE(sana, CURRENT_TIMESTAMP), request_id
+            FROM inventory o
+        """
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM inventory_partitioned")
+        copied_id = cursor.fetchone()[0]
+        while copied_id < max_id:
+            cursor.execute(copy_sql + " WHERE o.id > %s AND o.id <= %s", (copied_id, copied_id + batch_size))
+            conn.commit()
+            copied_id += batch_size
+            logger.info(f"inventory ko'chirilmoqda: {min(copied_id, max_id)}/{max_id}")
+
+        # Yakuniy almashtirish: yozuvlar qisqa vaqt to'xtaydi, o'qish davom etadi.
+        # Nusxalash boshida hali commit qilinmagan yozuvlar ham tushib qolmasligi uchun
+        # oxirgi oraliq NOT EXISTS bilan qayta tekshiriladi.
+        cursor.execute("SET LOCAL lock_timeout = '5s'")
+        cursor.execute("LOCK TABLE inventory IN EXCLUSIVE MODE")
+        cursor.execute(
+            copy_sql + " WHERE o.id > %s AND NOT EXISTS (SELECT 1 FROM inventory_partitioned n WHERE n.id = o.id)",
+            (max(0, max_id - 10 * batch_size),)
+        )
+        cursor.execute("ALTER TABLE inventory RENAME TO inventory_legacy")
+        for name in _INVENTORY_INDEXES:
+            cursor.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name.replace('idx_inventory_', 'idx_inventory_legacy_')}")
+        cursor.execute("ALTER TABLE inventory_partitioned RENAME TO inventory")
+        for name in _INVENTORY_INDEXES:
+            cursor.execute(f"ALTER INDEX {name.replace('idx_inventory_', 'idx_inventory_p_')} RENAME TO {name}")
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY inventory.id")
+        _create_notify_triggers(cursor)
+        conn.commit()
+        logger.info("inventory bo'limlangan jadvalga ko'chirildi. Eski ma'lumot: inventory_legacy.")
+        return True
+    except Exception as e:
+        logger.critical(f"migrate_inventory_to_partitioned: {e}")
+        conn.rollback()
+        return False
+    finally:
+        if conn: conn.close()
+
+def archive_inventory_partition(month: date, directory: str = INVENTORY_ARCHIVE_DIR) -> str or None:
+    """
+    O'tgan oy bo'limini inventorydan ajratib (DETACH), <directory>/<bo'lim>.csv.gz fayliga
+    yozadi va o'chiradi. Sotuvchi/mahsulot bo'yicha jami summalar inventory_archived_totals
+    ga o'tkaziladi, shuning uchun qarzdorlik hisobi o'zgarmaydi. Fayl manzilini qaytaradi.
+    """
+    month = month.replace(day=1)
+    if month >= date.today().replace(day=1):
+        logger.error("faqat o'tgan oylarni arxivlash mumkin.")
+        return None
+
+    name = _partition_name(month)
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+        if not cursor.fetchone()[0]:
+            logger.error(f"{name} bo'limi topilmadi.")
+            return None
+
+        cursor.execute("SELECT 1 FROM pg_inherits WHERE inhrelid = %s::regclass", (name,))
+        if cursor.fetchone():
+            # Jami summalarni saqlash va ajratish bitta tranzaksiyada: qarz hech qachon ikki marta
+            # yoki umuman hisoblanmay qolmaydi
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+            cursor.execute(f"""
+                INSERT INTO inventory_archived_totals (davr, seller_id, product_id, soni, narxi)
+                SELECT %s, seller_id, product_id, SUM(soni), SUM(narxi)
+                FROM {name}
+                WHERE seller_id IS NOT NULL AND product_id IS NOT NULL
+                GROUP BY seller_id, product_id
+                ON CONFLICT (davr, seller_id, product_id) DO UPDATE
+                    SET soni = EXCLUDED.soni, narxi = EXCLUDED.narxi
+            """, (month,))
+            cursor.execute(f"ALTER TABLE inventory DETACH PARTITION {name}")
+            conn.commit()
+
+        # Ajratilgan jadval faylga to'liq yozilgandan keyingina o'chiriladi; oraliqda to'xtasa,
+        # funksiyani qayta chaqirish shu qadamdan davom etadi
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.csv.gz")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as raw_file:
+            with gzip.GzipFile(fileobj=raw_file, mode='wb') as gz_file:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", gz_file)
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+        os.replace(tmp_path, path)
+
+        cursor.execute(f"DROP TABLE {name}")
+        conn.commit()
+        logger.info(f"{name} arxivlandi: {path}")
+        return path
+    except Exception as e:
+        logger.critical(f"archive_inventory_partition: {e}")
+        conn.rollback()
+        return None
+    finally:
+        if conn: conn.close()
+
+def _ensure_request_id_column(cursor) -> None:
+    """Eski inventory jadvaliga request_id ustunini qo'shadi (ustun bo'lsa ALTER TABLE lock olinmaydi)."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'inventory' AND column_name = 'request_id'
+    """)
+    if not cursor.fetchone():
+        cursor.execute("ALTER TABLE inventory ADD COLUMN request_id VARCHAR(36);")
+
+# inventory indekslari: nomi -> ustunlar
+_INVENTORY_INDEXES = {
+    # Sotuvchining oxirgi yozuvini (MAX(id)) tez topish uchun
+    'idx_inventory_seller_id': "(seller_id, id)",
+    # Sana oralig'i bo'yicha so'rovlar (get_inventory_in_range): sotuvchi bo'yicha - btree,
+    # barcha sotuvchilar bo'yicha - BRIN (sana faqat o'sib boradi, indeks juda kichik bo'ladi)
+    'idx_inventory_seller_sana': "(seller_id, sana)",
+    'idx_inventory_sana_brin': "USING BRIN (sana)",
+    # Sotuvchi qoldig'i (get_seller_holdings): GROUP BY product_id faqat indeksdan o'qiladi (index-only scan)
+    'idx_inventory_seller_product': "(seller_id, product_id) INCLUDE (soni, narxi)",
+}
+
+# Eski (bo'limlanmagan) inventory jadvalidagi indekslar: nomi -> CREATE dan keyingi qismi
+_LEGACY_INVENTORY_INDEXES = {
+    'inventory_request_id_sana_key': "UNIQUE INDEX CONCURRENTLY inventory_request_id_sana_key ON inventory (request_id, sana)",
+    **{name: f"INDEX CONCURRENTLY {name} ON inventory {columns}" for name, columns in _INVENTORY_INDEXES.items()},
+}
+
+def _create_legacy_inventory_indexes(conn) -> None:
+    """
+    Eski inventory jadvalida indekslarni CONCURRENTLY quradi: katta jadvalda ham bot yozishda
+    davom etadi. CONCURRENTLY tranzaksiya ichida ishlamaydi, shuning uchun autocommit rejimida.
+    Oldingi urinish uzilib qolgan bo'lsa (INVALID indeks), indeks o'chirilib qayta quriladi.
+    """
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        for name, definition in _LEGACY_INVENTORY_INDEXES.items():
+            cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+            row = cursor.fetchone()
+            if row and row[0]: continue
+            if row:
+                logger.warning(f"{name} indeksi yaroqsiz (oldingi qurish uzilgan), qayta quriladi.")
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            logger.info(f"{name} indeksi qurilmoqda (CONCURRENTLY)...")
+            cursor.execute(f"CREATE {definition}")
+    finally:
+        conn.autocommit = False
+
 # --- Jadvallarni Yaratish Funksiyasi ---
 def create_tables():
     """Bot uchun kerakli PostgreSQL jadvallarini yaratadi."""
     conn = get_db_connection()
     if not conn:
-        print("!!! KRITIK XATO (DB): Jadvallarni yaratish uchun bazaga ulanib bo'lmadi.", file=sys.stderr)
+        logger.critical("Jadvallarni yaratish uchun bazaga ulanib bo'lmadi.")
         return
 
     try:
@@ -51,32 +632,85 @@ def create_tables():
             );
         """)
 
+        # Yangi bazada inventory darhol oylik bo'limlangan holda yaratiladi. Eski (oddiy) jadval
+        # o'zgarmaydi - uni `python db.py migrate-partitions` ko'chiradi.
+        cursor.execute(_inventory_ddl('inventory', 'SERIAL'))
+        if _is_partitioned(cursor, 'inventory'):
+            this_month = date.today().replace(day=1)
+            _create_month_partitions(cursor, 'inventory', this_month, _add_months(this_month, INVENTORY_PARTITION_MONTHS_AHEAD))
+
+        # Arxivlangan bo'limlarning sotuvchi/mahsulot bo'yicha jami summalari
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS inventory_archived_totals (
+                davr DATE NOT NULL,
+                seller_id INTEGER NOT NULL REFERENCES sellers(id),
+                product_id INTEGER NOT NULL REFERENCES products(id),
+                soni BIGINT NOT NULL,
+                narxi DECIMAL(14, 2) NOT NULL,
+                PRIMARY KEY (davr, seller_id, product_id)
+            );
+        """)
+
+        # Ombor qoldig'i. Qatori yo'q mahsulotning qoldig'i yuritilmaydi (cheklovsiz beriladi).
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS inventory (
+            CREATE TABLE IF NOT EXISTS product_stock (
+                product_id INTEGER NOT NULL REFERENCES products(id),
+                shard SMALLINT NOT NULL,
+                qty BIGINT NOT NULL CHECK (qty >= 0),
+                PRIMARY KEY (product_id, shard)
+            );
+        """)
+
+        # Jurnaldan qayta yozishda takrorlanmaslik uchun har bir yozuvning noyob kaliti. Bo'limlangan
+        # jadvalda UNIQUE (request_id, sana) DDL da; eski jadvalda indeks commitdan keyin quriladi
+        _ensure_request_id_column(cursor)
+
+        # Bo'limlangan jadvalda indekslar jadval bilan birga (bo'sh holda) yoki migratsiyada quriladi -
+        # bu yerda IF NOT EXISTS. Eski katta jadvalda oddiy CREATE INDEX yozishni bloklardi:
+        # u yerda indekslar commitdan keyin CONCURRENTLY quriladi.
+        legacy_inventory = not _is_partitioned(cursor, 'inventory')
+        if not legacy_inventory:
+            for name, columns in _INVENTORY_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON inventory {columns};")
+
+        # Kesh eskirtirish xabarlari (LISTEN/NOTIFY) uchun triggerlar
+        _create_notify_triggers(cursor)
+
+        # Ommaviy xabarlar: jarayon qayerda to'xtaganini saqlaydi (qayta ishga tushganda davom etadi)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS broadcasts (
                 id SERIAL PRIMARY KEY,
-                seller_id INTEGER REFERENCES sellers(id),
-                product_id INTEGER REFERENCES products(id),
-                soni INTEGER NOT NULL,
-                narxi DECIMAL(10, 2) NOT NULL,
+                matn TEXT NOT NULL,
+                admin_chat_id BIGINT NOT NULL,
+                status_message_id BIGINT,
+                last_seller_id INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                holat VARCHAR(20) NOT NULL DEFAULT 'running',
                 sana TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
 
         conn.commit()
-        print("DB Log: Jadvallar yaratildi/tekshirildi.")
+        if legacy_inventory:
+            _create_legacy_inventory_indexes(conn)
+        logger.info("Jadvallar yaratildi/tekshirildi.")
     except Exception as e:
-        print(f"!!! KRITIK XATO (DB): Jadvallarni yaratishda xato: {e}", file=sys.stderr)
+        logger.critical(f"Jadvallarni yaratishda xato: {e}")
         conn.rollback()
     finally:
         if conn: conn.close()
 
 # --- Rol va Sotuvchilar Funksiyalari ---
 
+@traced()
 def get_user_role(chat_id: int) -> str:
+    """'sotuvchi', 'not_registered' yoki baza ishlamasa ROLE_UNAVAILABLE."""
     conn = None
     try:
-        conn = get_db_connection()
-        if not conn: return 'not_registered'
+        conn = get_db_connection(readonly=True)
+        if not conn: return ROLE_UNAVAILABLE
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("SELECT ism FROM sellers WHERE chat_id = %s", (chat_id,))
         seller = cursor.fetchone()
@@ -85,11 +719,13 @@ def get_user_role(chat_id: int) -> str:
         else: return 'not_registered'
             
     except Exception as e:
-        print(f"!!! KRITIK XATO (DB): get_user_role: {e}", file=sys.stderr)
-        return 'not_registered' 
+        logger.critical(f"get_user_role: {e}")
+        _record_query_failure(conn, e)
+        return ROLE_UNAVAILABLE
     finally:
         if conn: conn.close()
         
+@traced()
 def get_seller_by_password(password: str) -> dict or None:
     conn = get_db_connection()
     if not conn: return None
@@ -98,28 +734,34 @@ def get_seller_by_password(password: str) -> dict or None:
         cursor.execute("SELECT id, ism, parol FROM sellers WHERE parol = %s", (password,))
         return cursor.fetchone()
     except Exception as e:
-        print(f"DB Xato: get_seller_by_password: {e}", file=sys.stderr)
+        logger.error(f"get_seller_by_password: {e}")
+        _record_query_failure(conn, e)
         return None
     finally:
         if conn: conn.close()
 
+@traced()
 def update_seller_chat_id(seller_id: int, chat_id: int) -> bool:
     conn = get_db_connection()
     if not conn: return False
     try:
         cursor = conn.cursor()
         cursor.execute("UPDATE sellers SET chat_id = %s WHERE id = %s", (chat_id, seller_id))
+        _notify(cursor, 'sellers')
         conn.commit()
+        _mark_write()
         return True
     except Exception as e:
-        print(f"DB Xato: update_seller_chat_id: {e}", file=sys.stderr)
-        conn.rollback()
+        logger.error(f"update_seller_chat_id: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
         return False
     finally:
         if conn: conn.close()
         
+@traced()
 def get_seller_id_by_chat_id(chat_id: int) -> int or None:
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     if not conn: return None
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -127,11 +769,13 @@ def get_seller_id_by_chat_id(chat_id: int) -> int or None:
         result = cursor.fetchone()
         return result['id'] if result else None
     except Exception as e:
-        print(f"DB Xato: get_seller_id_by_chat_id: {e}", file=sys.stderr)
+        logger.error(f"get_seller_id_by_chat_id: {e}")
+        _record_query_failure(conn, e)
         return None
     finally:
         if conn: conn.close()
 
+@traced()
 def add_new_seller(ism: str, mahalla: str, telefon: str, parol: str) -> bool:
     conn = get_db_connection()
     if not conn: return False
@@ -141,46 +785,54 @@ def add_new_seller(ism: str, mahalla: str, telefon: str, parol: str) -> bool:
             "INSERT INTO sellers (ism, mahalla, telefon, parol) VALUES (%s, %s, %s, %s)",
             (ism, mahalla, telefon, parol)
         )
+        _notify(cursor, 'sellers')
         conn.commit()
+        _mark_write()
         return True
     except psycopg2.IntegrityError:
         conn.rollback()
         return False
     except Exception as e:
-        print(f"DB Xato: add_new_seller: {e}", file=sys.stderr)
-        conn.rollback()
+        logger.error(f"add_new_seller: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
         return False
     finally:
         if conn: conn.close()
 
+@traced()
 def get_all_sellers() -> list:
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     if not conn: return []
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("SELECT id, ism, mahalla, telefon, chat_id FROM sellers ORDER BY ism")
         return cursor.fetchall()
     except Exception as e:
-        print(f"DB Xato: get_all_sellers: {e}", file=sys.stderr)
+        logger.error(f"get_all_sellers: {e}")
+        _record_query_failure(conn, e)
         return []
     finally:
         if conn: conn.close()
 
+@traced()
 def get_all_seller_passwords() -> list:
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     if not conn: return []
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("SELECT ism, parol FROM sellers ORDER BY ism")
         return cursor.fetchall()
     except Exception as e:
-        print(f"DB Xato: get_all_seller_passwords: {e}", file=sys.stderr)
+        logger.error(f"get_all_seller_passwords: {e}")
+        _record_query_failure(conn, e)
         return []
     finally:
         if conn: conn.close()
 
+@traced()
 def get_seller_password_by_id(seller_id: int) -> str or None:
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     if not conn: return None
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -188,81 +840,374 @@ def get_seller_password_by_id(seller_id: int) -> str or None:
         result = cursor.fetchone()
         return result['parol'] if result else None
     except Exception as e:
-        print(f"DB Xato: get_seller_password_by_id: {e}", file=sys.stderr)
+        logger.error(f"get_seller_password_by_id: {e}")
+        _record_query_failure(conn, e)
         return None
     finally:
         if conn: conn.close()
         
 # --- Mahsulot va Inventar Funksiyalari ---
 
+@traced()
 def add_new_product(nomi: str, narxi: float) -> bool:
     conn = get_db_connection()
     if not conn: return False
     try:
         cursor = conn.cursor()
         cursor.execute("INSERT INTO products (nomi, narxi) VALUES (%s, %s)", (nomi, narxi))
+        _notify(cursor, 'products')
         conn.commit()
+        _mark_write()
         return True
     except psycopg2.IntegrityError:
         conn.rollback()
         return False
     except Exception as e:
-        print(f"DB Xato: add_new_product: {e}", file=sys.stderr)
-        conn.rollback()
+        logger.error(f"add_new_product: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
         return False
     finally:
         if conn: conn.close()
 
+# Oxirgi o'qilgan mahsulotlar (id -> {'nomi', 'narxi'}); baza ishlamaganda jurnalga yozish uchun
+_product_snapshot = {}
+
+def invalidate_product_snapshot() -> None:
+    """Mahsulotlar o'zgarganda: eskirgan narx jurnalga yozilmasin (replay joriy narxni oladi)."""
+    _product_snapshot.clear()
+
+@traced()
 def get_all_products() -> list:
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     if not conn: return []
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT id, nomi, narxi FROM products ORDER BY nomi")
-        return cursor.fetchall()
+        # qoldiq: omborda qolgan miqdor (qoldig'i yuritilmaydigan mahsulot uchun NULL)
+        cursor.execute("""
+            SELECT p.id, p.nomi, p.narxi, s.qoldiq
+            FROM products p
+            LEFT JOIN (
+                SELECT product_id, SUM(qty) AS qoldiq FROM product_stock GROUP BY product_id
+            ) s ON s.product_id = p.id
+            ORDER BY p.nomi
+        """)
+        products = cursor.fetchall()
+        # Snapshot ham umumiy kesh: orqada qolgan replika natijasi bilan to'ldirilmaydi
+        if _force_primary.get() or not DATABASE_REPLICA_URLS:
+            _product_snapshot.clear()
+            _product_snapshot.update({p['id']: {'nomi': p['nomi'], 'narxi': p['narxi']} for p in products})
+        return products
     except Exception as e:
-        print(f"DB Xato: get_all_products: {e}", file=sys.stderr)
+        logger.error(f"get_all_products: {e}")
+        _record_query_failure(conn, e)
         return []
     finally:
         if conn: conn.close()
 
-def add_inventory(seller_id: int, product_id: int, count: int) -> tuple[bool, str, float]:
+@traced()
+def add_stock(product_id: int, count: int, shards: int = None) -> int or None:
+    """Omborga kirim: `count` shardlarga teng bo'lib qo'shiladi. Yangi jami qoldiqni qaytaradi."""
+    shards = shards or STOCK_SHARDS
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO product_stock (product_id, shard, qty)
+            SELECT %(product_id)s, s, %(base)s + CASE WHEN s < %(extra)s THEN 1 ELSE 0 END
+            FROM generate_series(0, %(shards)s - 1) AS s
+            ON CONFLICT (product_id, shard) DO UPDATE SET qty = product_stock.qty + EXCLUDED.qty
+        """, {'product_id': product_id, 'base': count // shards, 'extra': count % shards, 'shards': shards})
+        cursor.execute("SELECT SUM(qty) FROM product_stock WHERE product_id = %s", (product_id,))
+        total = cursor.fetchone()[0]
+        conn.commit()
+        _mark_write()
+        return int(total)
+    except Exception as e:
+        logger.error(f"add_stock: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
+        return None
+    finally:
+        if conn: conn.close()
+
+def _take_stock(conn, product_id: int, count: int, allow_shortfall: bool = False) -> tuple[bool, int]:
+    """
+    Joriy tranzaksiya ichida mahsulot qoldig'idan `count` ni ayiradi: (muvaffaqiyat, yetmagan_miqdor).
+    Qoldig'i yuritilmaydigan mahsulot uchun (True, 0).
+
+    1. Yetarli qoldiqli tasodifiy shard SKIP LOCKED bilan olinadi - parallel tranzaksiyalar
+       band shardni kutmasdan boshqasini oladi.
+    2. Hammasi band bo'lsa, bitta shard kutib olinadi.
+    3. Hech bir shardda yetarli bo'lmasa, barcha shardlar (tartib bilan) qulflanib, miqdor
+       bir nechtasidan yig'iladi. allow_shortfall=True bo'lsa, yetmagani uchun rad etilmaydi.
+    """
+    cursor = conn.cursor()
+    for lock_clause in ("FOR UPDATE SKIP LOCKED", "FOR UPDATE"):
+        cursor.execute(f"""
+            UPDATE product_stock SET qty = qty - %(count)s
+            WHERE (product_id, shard) = (
+                SELECT product_id, shard FROM product_stock
+                WHERE product_id = %(product_id)s AND qty >= %(count)s
+                ORDER BY random() LIMIT 1
+                {lock_clause}
+            )
+            RETURNING shard
+        """, {'product_id': product_id, 'count': count})
+        if cursor.fetchone(): return True, 0
+
+    cursor.execute("SELECT shard, qty FROM product_stock WHERE product_id = %s ORDER BY shard FOR UPDATE", (product_id,))
+    shards = cursor.fetchall()
+    if not shards: return True, 0
+
+    shortfall = max(0, count - sum(qty for _, qty in shards))
+    if shortfall and not allow_shortfall: return False, shortfall
+
+    remaining = count - shortfall
+    for shard, qty in shards:
+        if remaining <= 0: break
+        take = min(qty, remaining)
+        if not take: continue
+        cursor.execute(
+            "UPDATE product_stock SET qty = qty - %s WHERE product_id = %s AND shard = %s",
+            (take, product_id, shard)
+        )
+        remaining -= take
+    return True, shortfall
+
+def _journal_inventory(seller_id: int, product_id: int, count: int, request_id: str, sana: datetime) -> tuple[bool, str, float, bool]:
+    """
+    Baza ishlamayotganda tovar berishni mahalliy jurnalga yozadi (keyinroq replay qilinadi).
+    `sana` - INSERT dagi qiymatning o'zi: noyoblik kaliti (request_id, sana), shuning uchun
+    bazaga yetib borgan yozuv replay da takrorlanmaydi.
+    """
+    product = _product_snapshot.get(product_id)
+    product_name = product['nomi'] if product else f"#{product_id}"
+    total_price = float(product['narxi']) * count if product else None
+
+    try:
+        journal.append({
+            'request_id': request_id,
+            'seller_id': seller_id,
+            'product_id': product_id,
+            'soni': count,
+            'narxi': total_price,
+            'sana': sana.isoformat(),
+        })
+    except OSError as e:
+        logger.critical(f"add_inventory jurnalga yozilmadi: {e}")
+        return False, "DB ulanish xatosi", 0.0, False
+
+    logger.warning(f"add_inventory jurnalga yozildi ({request_id}).", extra={'request_id': request_id})
+    return True, product_name, total_price or 0.0, True
+
+@traced()
+def add_inventory(seller_id: int, product_id: int, count: int, request_id: str = None) -> tuple[bool, str, float, bool]:
+    """
+    Sotuvchiga tovar berishni yozadi: (muvaffaqiyat, mahsulot_nomi, jami_narx, navbatda).
+    Baza ishlamasa yozuv jurnalga tushadi va `navbatda` = True qaytadi.
+    """
+    request_id = request_id or uuid.uuid4().hex
+    # Vaqt bir marta olinadi: INSERT ham, jurnal ham aynan shu qiymatni yozadi
+    sana = datetime.now()
     conn = get_db_connection()
-    if not conn: return False, "DB ulanish xatosi", 0.0
+    if not conn: return _journal_inventory(seller_id, product_id, count, request_id, sana)
 
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("SELECT nomi, narxi FROM products WHERE id = %s", (product_id,))
         product_data = cursor.fetchone()
         
-        if not product_data: return False, "Mahsulot bazada topilmadi", 0.0
+        if not product_data: return False, "Mahsulot bazada topilmadi", 0.0, False
             
         product_name = product_data['nomi']
         unit_price = float(product_data['narxi'])
         total_price = unit_price * count
 
+        # Qoldiq shu tranzaksiyada kamaytiriladi: inventory yozuvi bilan birga saqlanadi yoki bekor bo'ladi
+        in_stock, shortfall = _take_stock(conn, product_id, count)
+        if not in_stock:
+            conn.rollback()
+            return False, f"omborda {product_name} yetarli emas (qoldiq: {count - shortfall} dona)", 0.0, False
+
         cursor.execute(
-            "INSERT INTO inventory (seller_id, product_id, soni, narxi) VALUES (%s, %s, %s, %s)",
-            (seller_id, product_id, count, total_price)
+            "INSERT INTO inventory (seller_id, product_id, soni, narxi, sana, request_id) VALUES (%s, %s, %s, %s, %s, %s)",
+            (seller_id, product_id, count, total_price, sana, request_id)
         )
         
         conn.commit()
-        return True, product_name, total_price
+        _mark_write()
+        return True, product_name, total_price, False
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        if _connection_lost(conn, e):
+            # Ulanish so'rov o'rtasida uzildi: yozuv jurnalga tushadi, request_id takrorlanishdan saqlaydi
+            logger.error(f"add_inventory (ulanish uzildi): {e}")
+            _record_query_failure(conn, e)
+            return _journal_inventory(seller_id, product_id, count, request_id, sana)
+        # Statement timeout, deadlock: baza ishlayapti, tranzaksiya bekor bo'ldi - admin qayta urinadi
+        logger.error(f"add_inventory: {e}")
+        conn.rollback()
+        return False, f"Ichki xato: {e}", 0.0, False
     except Exception as e:
-        print(f"DB Xato: add_inventory: {e}", file=sys.stderr)
+        logger.error(f"add_inventory: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
+        return False, f"Ichki xato: {e}", 0.0, False
+    finally:
+        if conn and not conn.closed: conn.close()
+
+@traced()
+def _apply_journal_records(conn, records: list) -> tuple[int, list]:
+    """
+    Yozuvlarni bitta tranzaksiyada bazaga yozadi va commit qiladi. request_id noyobligi
+    (ON CONFLICT) tufayli qayta yozish xavfsiz. (haqiqatan_yozilganlar_soni, mahsuloti_topilmaganlar) qaytaradi.
+    """
+    cursor = conn.cursor()
+
+    # Narxi noma'lum yozuvlar uchun joriy narxni bitta so'rovda olamiz
+    unknown_price_ids = list({r['product_id'] for r in records if r.get('narxi') is None})
+    prices = {}
+    if unknown_price_ids:
+        cursor.execute("SELECT id, narxi FROM products WHERE id = ANY(%s)", (unknown_price_ids,))
+        prices = {product_id: float(narxi) for product_id, narxi in cursor.fetchall()}
+
+    rows = []
+    missing = []
+    for r in records:
+        total_price = r.get('narxi')
+        if total_price is None:
+            if r['product_id'] not in prices:
+                missing.append(r)
+                continue
+            total_price = prices[r['product_id']] * r['soni']
+        rows.append((r['seller_id'], r['product_id'], r['soni'], total_price, r['sana'], r['request_id']))
+
+    inserted = execute_values(
+        cursor,
+        "INSERT INTO inventory (seller_id, product_id, soni, narxi, sana, request_id) VALUES %s "
+        "ON CONFLICT DO NOTHING RETURNING seller_id, product_id, soni",
+        rows,
+        page_size=500,
+        fetch=True
+    ) if rows else []
+
+    # Qoldiq faqat haqiqatan yozilganlar uchun kamaytiriladi. Tovar allaqachon berilgan,
+    # shuning uchun qoldiq yetmasa rad etilmaydi - 0 gacha tushiriladi va ogohlantiriladi.
+    issued = {}
+    for seller_id, product_id, soni in inserted:
+        issued[product_id] = issued.get(product_id, 0) + soni
+    for product_id, soni in sorted(issued.items()):
+        _, shortfall = _take_stock(conn, product_id, soni, allow_shortfall=True)
+        if shortfall:
+            logger.warning(
+                f"Jurnal: {product_id} mahsulotidan omborda {shortfall} dona yetmadi (qoldiq 0 ga tushirildi).",
+                extra={'product_id': product_id, 'shortfall': shortfall}
+            )
+    conn.commit()
+    # ON CONFLICT tufayli o'tkazib yuborilganlar (oldin yozilgan request_id) hisoblanmaydi
+    return len(inserted), missing
+
+def _replay_journal_batch(conn, records: list) -> int:
+    """
+    Bitta partiyani yozadi. Partiya rad etilsa (yaroqsiz qiymat, cheklov buzilishi), yozuvlar
+    birma-bir qayta sinaladi va yozib bo'lmaganlari karantinga ko'chiriladi - bitta yomon
+    yozuv qolganlarini abadiy to'sib qo'ymaydi. Ulanish xatolari chaqiruvchiga uzatiladi.
+    """
+    try:
+        applied, missing = _apply_journal_records(conn, records)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        raise
+    except (psycopg2.Error, KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Jurnal partiyasi rad etildi, yozuvlar birma-bir sinaladi: {e}")
         conn.rollback()
-        return False, f"Ichki xato: {e}", 0.0
+        applied, missing = 0, []
+        for record in records:
+            try:
+                count, not_found = _apply_journal_records(conn, [record])
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except (psycopg2.Error, KeyError, TypeError, ValueError) as e:
+                conn.rollback()
+                logger.error(f"Jurnal: yozuv karantinga ko'chirildi ({e}): {record}")
+                journal.quarantine(record, str(e).strip())
+                continue
+            applied += count
+            missing += not_found
+
+    for record in missing:
+        logger.error(f"Jurnal: mahsulot topilmadi, yozuv karantinga ko'chirildi: {record}")
+        journal.quarantine(record, "mahsulot topilmadi")
+    return applied
+
+def replay_inventory_journal(batch_size: int = None, max_batches: int = None) -> int or None:
+    """
+    Jurnaldagi yozuvlarni tartib bilan, `batch_size` tadan partiyalab bazaga yozadi (ko'pi bilan
+    `max_batches` ta partiya, None - hammasi). Har bir partiya commit bo'lgach jurnalda yozib
+    bo'lingan deb belgilanadi: qulash yoki uzilishda faqat commit bo'lmagan partiya qayta yoziladi.
+    Bazaga haqiqatan yozilgan yozuvlar sonini, baza ishlamasa None qaytaradi.
+    """
+    batch_size = batch_size or JOURNAL_REPLAY_BATCH
+    conn = get_db_connection()
+    if not conn: return None
+
+    replayed = 0
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            records, offset = journal.read(max_records=batch_size)
+            if not records:
+                # Faqat buzilgan (karantinga ko'chirilgan) qatorlar qolgan bo'lishi mumkin
+                journal.discard(offset)
+                break
+            replayed += _replay_journal_batch(conn, records)
+            journal.discard(offset)
+            _mark_write()
+            batches += 1
+        return replayed
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        logger.error(f"replay_inventory_journal (ulanish uzildi): {e}")
+        _record_query_failure(conn, e)
+        return replayed or None
+    except Exception as e:
+        logger.error(f"replay_inventory_journal: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
+        # Oldingi partiyalar yozilgan bo'lsa, ular soni qaytadi; qolgani keyingi urinishda
+        return replayed or None
+    finally:
+        if conn and not conn.closed: conn.close()
+
+@traced()
+def get_seller_last_inventory_id(seller_id: int) -> int or None:
+    """Sotuvchining eng oxirgi inventar yozuvi ID sini qaytaradi (yozuv bo'lmasa 0, xatoda None)."""
+    conn = get_db_connection(readonly=True)
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM inventory WHERE seller_id = %s", (seller_id,))
+        return cursor.fetchone()[0]
+    except Exception as e:
+        logger.error(f"get_seller_last_inventory_id: {e}")
+        _record_query_failure(conn, e)
+        return None
     finally:
         if conn: conn.close()
 
-def get_seller_debt_details(seller_id: int) -> tuple[float, list]:
-    conn = get_db_connection()
+@traced()
+def get_seller_debt_details(seller_id: int, after_id: int = 0) -> tuple[float, list]:
+    """
+    Sotuvchiga berilgan tovarlar va ularning jami summasi.
+    after_id berilsa, faqat undan keyingi (id > after_id) yozuvlar qaytariladi.
+    """
+    conn = get_db_connection(readonly=True)
     if not conn: return 0.0, []
     
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT 
+                i.id,
                 i.soni, 
                 i.narxi AS jami_narxi, 
                 TO_CHAR(i.sana, 'YYYY-MM-DD HH24:MI') AS sana, 
@@ -270,18 +1215,301 @@ def get_seller_debt_details(seller_id: int) -> tuple[float, list]:
             FROM inventory i
             JOIN products p ON i.product_id = p.id
             WHERE i.seller_id = %s
+              AND i.id > %s
             ORDER BY i.sana DESC;
-        """, (seller_id,))
+        """, (seller_id, after_id))
         items = cursor.fetchall()
         
         total_debt = sum(float(item['jami_narxi']) for item in items)
+
+        if not after_id:
+            # Arxivlangan oylar ro'yxatda ko'rinmaydi, lekin qarzga kiradi
+            cursor.execute(
+                "SELECT COALESCE(SUM(narxi), 0) AS jami FROM inventory_archived_totals WHERE seller_id = %s",
+                (seller_id,)
+            )
+            total_debt += float(cursor.fetchone()['jami'])
         
         return total_debt, items
     except Exception as e:
-        print(f"DB Xato: get_seller_debt_details: {e}", file=sys.stderr)
+        logger.error(f"get_seller_debt_details: {e}")
+        _record_query_failure(conn, e)
         return 0.0, []
     finally:
         if conn: conn.close()
 
+@traced()
+def get_seller_holdings(seller_id: int) -> list or None:
+    """
+    Sotuvchiga berilgan tovarlar mahsulot bo'yicha jamlangan: [{product_id, nomi, soni, jami_narxi}].
+    Arxivlangan oylar ham qo'shiladi. Qiymati bo'yicha kamayish tartibida. Xatoda None qaytaradi.
+    """
+    conn = get_db_connection(readonly=True)
+    if not conn: return None
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT h.product_id, p.nomi, SUM(h.soni) AS soni, SUM(h.narxi) AS jami_narxi
+            FROM (
+                SELECT product_id, SUM(soni) AS soni, SUM(narxi) AS narxi
+                FROM inventory WHERE seller_id = %(seller_id)s
+                GROUP BY product_id
+                UNION ALL
+                SELECT product_id, SUM(soni), SUM(narxi)
+                FROM inventory_archived_totals WHERE seller_id = %(seller_id)s
+                GROUP BY product_id
+            ) h
+            JOIN products p ON p.id = h.product_id
+            GROUP BY h.product_id, p.nomi
+            ORDER BY jami_narxi DESC, p.nomi;
+        """, {'seller_id': seller_id})
+        return cursor.fetchall()
+    except Exception as e:
+        logger.error(f"get_seller_holdings: {e}")
+        _record_query_failure(conn, e)
+        return None
+    finally:
+        if conn: conn.close()
+
+@traced()
+def get_inventory_in_range(seller_id: int or None, start: datetime, end: datetime, limit: int = 50) -> dict or None:
+    """
+    [start, end) oralig'ida berilgan tovarlar (seller_id=None bo'lsa - barcha sotuvchilar).
+    Jami summa, dona va yozuvlar soni oyna funksiyalari bilan ro'yxat bilan bitta so'rovda
+    hisoblanadi (LIMIT dan oldin), ro'yxat esa eng yangi `limit` ta yozuv bilan cheklanadi.
+    Arxivlangan oylar yozuvlari bu hisobotga kirmaydi. Xatoda None qaytaradi.
+    """
+    conn = get_db_connection(readonly=True)
+    if not conn: return None
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(f"""
+            SELECT
+                i.id,
+                i.soni,
+                i.narxi AS jami_narxi,
+                TO_CHAR(i.sana, 'YYYY-MM-DD HH24:MI') AS sana,
+                p.nomi AS mahsulot_nomi,
+                s.ism AS sotuvchi_ismi,
+                SUM(i.narxi) OVER () AS davr_jami,
+                SUM(i.soni) OVER () AS davr_soni,
+                COUNT(*) OVER () AS davr_yozuvlar
+            FROM inventory i
+            JOIN products p ON i.product_id = p.id
+            JOIN sellers s ON i.seller_id = s.id
+            WHERE i.sana >= %(start)s AND i.sana < %(end)s
+              {"AND i.seller_id = %(seller_id)s" if seller_id is not None else ""}
+            ORDER BY i.sana DESC
+            LIMIT %(limit)s;
+        """, {'seller_id': seller_id, 'start': start, 'end': end, 'limit': limit})
+        items = cursor.fetchall()
+
+        first = items[0] if items else None
+        return {
+            'total': float(first['davr_jami']) if first else 0.0,
+            'quantity': int(first['davr_soni']) if first else 0,
+            'count': int(first['davr_yozuvlar']) if first else 0,
+            'items': items,
+        }
+    except Exception as e:
+        logger.error(f"get_inventory_in_range: {e}")
+        _record_query_failure(conn, e)
+        return None
+    finally:
+        if conn: conn.close()
+
+# --- Ommaviy Xabar (Broadcast) Funksiyalari ---
+
+@traced()
+def get_seller_chat_ids_after(after_id: int, limit: int) -> list or None:
+    """Keyset sahifalash: id > after_id bo'lgan, chat_id si bor sotuvchilar. Xatoda None."""
+    conn = get_db_connection(readonly=True)
+    if not conn: return None
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(
+            "SELECT id, chat_id FROM sellers WHERE chat_id IS NOT NULL AND id > %s ORDER BY id LIMIT %s",
+            (after_id, limit)
+        )
+        return cursor.fetchall()
+    except Exception as e:
+        logger.error(f"get_seller_chat_ids_after: {e}")
+        _record_query_failure(conn, e)
+        return None
+    finally:
+        if conn: conn.close()
+
+@traced()
+def count_sellers_with_chat_id() -> int:
+    conn = get_db_connection(readonly=True)
+    if not conn: return 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sellers WHERE chat_id IS NOT NULL")
+        return cursor.fetchone()[0]
+    except Exception as e:
+        logger.error(f"count_sellers_with_chat_id: {e}")
+        _record_query_failure(conn, e)
+        return 0
+    finally:
+        if conn: conn.close()
+
+@traced()
+def create_broadcast(matn: str, admin_chat_id: int) -> dict or None:
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(
+            "INSERT INTO broadcasts (matn, admin_chat_id) VALUES (%s, %s) RETURNING *",
+            (matn, admin_chat_id)
+        )
+        broadcast = cursor.fetchone()
+        conn.commit()
+        _mark_write()
+        return broadcast
+    except Exception as e:
+        logger.error(f"create_broadcast: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
+        return None
+    finally:
+        if conn: conn.close()
+
+@traced()
+def update_broadcast(broadcast_id: int, **fields) -> bool:
+    """Faqat status_message_id, last_seller_id, sent, failed va holat ustunlarini yangilaydi."""
+    allowed = ('status_message_id', 'last_seller_id', 'sent', 'failed', 'holat')
+    columns = [column for column in allowed if column in fields]
+    if not columns: return True
+
+    conn = get_db_connection()
+    if not conn: return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE broadcasts SET {', '.join(f'{column} = %s' for column in columns)} WHERE id = %s",
+            [fields[column] for column in columns] + [broadcast_id]
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"update_broadcast: {e}")
+        _record_query_failure(conn, e)
+        if not conn.closed: conn.rollback()
+        return False
+    finally:
+        if conn: conn.close()
+
+@traced()
+def get_running_broadcasts() -> list:
+    conn = get_db_connection()
+    if not conn: return []
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("SELECT * FROM broadcasts WHERE holat = 'running' ORDER BY id")
+        return cursor.fetchall()
+    except Exception as e:
+        logger.error(f"get_running_broadcasts: {e}")
+        _record_query_failure(conn, e)
+        return []
+    finally:
+        if conn: conn.close()
+
+def bench_stock(shards: int, workers: int, issues_per_worker: int) -> float or None:
+    """
+    Bitta mahsulotni `workers` ta thread add_inventory orqali 1 donadan beradi (to'liq yo'l:
+    qoldiq kamaytirish, inventory INSERT, trigger NOTIFY, commit). Soniyasiga berishlar sonini
+    qaytaradi. Faqat sinov (scratch) bazasida ishlating.
+    """
+    conn = get_db_connection()
+    if not conn: return None
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO products (nomi, narxi) VALUES ('__stock_bench__', 1) "
+        "ON CONFLICT (nomi) DO UPDATE SET narxi = 1 RETURNING id"
+    )
+    product_id = cursor.fetchone()[0]
+    cursor.execute(
+        "INSERT INTO sellers (ism, parol) VALUES ('__stock_bench__', '__stock_bench__') "
+        "ON CONFLICT (parol) DO UPDATE SET ism = EXCLUDED.ism RETURNING id"
+    )
+    seller_id = cursor.fetchone()[0]
+    cursor.execute("DELETE FROM product_stock WHERE product_id = %s", (product_id,))
+    conn.commit()
+    add_stock(product_id, workers * issues_per_worker, shards=shards)
+
+    refused = []
+    queued = []
+
+    def worker():
+        for _ in range(issues_per_worker):
+            ok, _, _, in_journal = add_inventory(seller_id, product_id, 1)
+            if in_journal: queued.append(1)
+            elif not ok: refused.append(1)
+
+    # Baza uzilsa add_inventory jurnalga yozadi: sinov yozuvlari ishchi jurnalga tushmasin
+    journal_path = journal.JOURNAL_PATH
+    journal.JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(journal_path)), "stock_bench_journal.jsonl")
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    try:
+        start = time.perf_counter()
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if os.path.exists(journal.JOURNAL_PATH): os.remove(journal.JOURNAL_PATH)
+        journal.JOURNAL_PATH = journal_path
+
+    cursor.execute("SELECT COALESCE(SUM(qty), 0) FROM product_stock WHERE product_id = %s", (product_id,))
+    left = cursor.fetchone()[0]
+    cursor.execute("DELETE FROM inventory WHERE seller_id = %s", (seller_id,))
+    cursor.execute("DELETE FROM product_stock WHERE product_id = %s", (product_id,))
+    cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+    cursor.execute("DELETE FROM sellers WHERE id = %s", (seller_id,))
+    conn.commit()
+    conn.close()
+
+    if queued:
+        logger.error(f"bench-stock: {len(queued)} ta berish bazaga yozilmadi (ulanish xatosi), natija yaroqsiz.")
+        return None
+
+    issued = workers * issues_per_worker - len(refused)
+    print(f"shards={shards:3}: {issued} berish {elapsed:.2f}s da -> {issued / elapsed:8.1f}/s, "
+          f"rad etildi: {len(refused)}, qoldiq: {left}")
+    return issued / elapsed
+
 if __name__ == '__main__':
-    print("DB Fayli yuklandi.")
+    import argparse
+    from logs import setup_logging
+
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Baza bo'yicha xizmat buyruqlari")
+    subparsers = parser.add_subparsers(dest='command')
+    migrate_parser = subparsers.add_parser('migrate-partitions', help="inventory ni oylik bo'limlangan jadvalga ko'chirish")
+    migrate_parser.add_argument('--batch-size', type=int, default=5000)
+    subparsers.add_parser('ensure-partitions', help="Kelgusi oylar uchun bo'limlarni yaratish")
+    archive_parser = subparsers.add_parser('archive', help="O'tgan oy bo'limini .csv.gz ga arxivlash")
+    archive_parser.add_argument('month', help="YYYY-MM")
+    archive_parser.add_argument('--dir', default=INVENTORY_ARCHIVE_DIR)
+    bench_parser = subparsers.add_parser('bench-stock', help="Qoldiq kamaytirish raqobat ostida (faqat sinov bazasida!)")
+    bench_parser.add_argument('--shards', type=int, nargs='+', default=[1, STOCK_SHARDS])
+    bench_parser.add_argument('--workers', type=int, default=16)
+    bench_parser.add_argument('--issues', type=int, default=100, help="har bir worker uchun")
+    args = parser.parse_args()
+
+    if args.command == 'migrate-partitions':
+        sys.exit(0 if migrate_inventory_to_partitioned(args.batch_size) else 1)
+    elif args.command == 'ensure-partitions':
+        sys.exit(0 if ensure_inventory_partitions() else 1)
+    elif args.command == 'archive':
+        month = datetime.strptime(args.month, "%Y-%m").date()
+        sys.exit(0 if archive_inventory_partition(month, args.dir) else 1)
+    elif args.command == 'bench-stock':
+        for shards in args.shards:
+            if bench_stock(shards, args.workers, args.issues) is None: sys.exit(1)
+    else:
+        print("DB Fayli yuklandi.")
@@ -0,0 +1,192 @@
+# journal.py
+# Baza ishlamay turganda inventar yozuvlarini mahalliy faylga yozib qo'yish (write-ahead journal).
+# Har bir yozuv - bitta JSON qator (JSONL). Fayl faqat oxiriga yoziladi va har yozuvdan
+# keyin fsync qilinadi, shuning uchun admin javob olgan yozuv jarayon qulasa ham saqlanib qoladi.
+# Bazaga yozib bo'lmaydigan (buzilgan yoki rad etilgan) yozuvlar <JOURNAL_PATH>.quarantine
+# fayliga ko'chiriladi - ular qolgan yozuvlarning replay qilinishini to'sib qo'ymaydi.
+# Yozib bo'lingan qism <JOURNAL_PATH>.offset faylidagi bayt offset bilan belgilanadi - jurnal
+# har partiyadan keyin qayta yozilmaydi, hamma yozuvlar yozib bo'lingachgina o'chiriladi.
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger("journal")
+
+JOURNAL_PATH = os.getenv("INVENTORY_JOURNAL_PATH", "inventory_journal.jsonl")
+
+_lock = threading.Lock()
+_tail_checked = False
+
+
+def _fsync_dir(path: str) -> None:
+    """Yangi yaratilgan/almashtirilgan fayl nomini ham diskka yozadi."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _encode(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+
+
+def _append_line(path: str, line: bytes) -> None:
+    """Qatorni fayl oxiriga yozib, fsync qiladi."""
+    created = not os.path.exists(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    try:
+        view = memoryview(line)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    if created: _fsync_dir(path)
+
+
+def quarantine_path() -> str:
+    return JOURNAL_PATH + ".quarantine"
+
+
+def quarantine(record: dict or bytes, reason: str) -> None:
+    """
+    Yozuvni karantin fayliga (qo'lda ko'rib chiqish uchun) ko'chiradi. Jurnaldan o'chirish
+    chaqiruvchining ishi (discard) - oraliqda qulash bo'lsa yozuv karantinda ikki marta uchrashi mumkin.
+    """
+    if isinstance(record, bytes):
+        entry = {'reason': reason, 'raw': record.decode('utf-8', errors='replace')}
+    else:
+        entry = {'reason': reason, 'record': record}
+    with _lock:
+        _append_line(quarantine_path(), _encode(entry))
+
+
+def append(record: dict) -> None:
+    """Yozuvni jurnal oxiriga qo'shadi va diskka yozilganini (fsync) kutadi."""
+    global _tail_checked
+    line = _encode(record)
+
+    with _lock:
+        created = not os.path.exists(JOURNAL_PATH)
+        fd = os.open(JOURNAL_PATH, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            if not _tail_checked:
+                # Oldingi jarayon qator o'rtasida qulagan bo'lsa, yangi yozuv unga yopishib qolmasin
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    line = b"\n" + line
+                _tail_checked = True
+
+            view = memoryview(line)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if created: _fsync_dir(JOURNAL_PATH)
+
+
+def offset_path() -> str:
+    return JOURNAL_PATH + ".offset"
+
+
+def _load_offset() -> int:
+    """Bazaga yozib bo'lingan yozuvlar tugagan joy (bayt). Fayl bo'lmasa 0."""
+    try:
+        with open(offset_path(), 'rb') as f:
+            return int(f.read() or 0)
+    except FileNotFoundError:
+        return 0
+    except ValueError:
+        logger.error(f"{offset_path()} buzilgan, jurnal boshidan o'qiladi (request_id takrorlanishdan saqlaydi)")
+        return 0
+
+
+def _save_offset(offset: int) -> None:
+    tmp_path = offset_path() + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(str(offset).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, offset_path())
+    _fsync_dir(offset_path())
+
+
+def read(max_records: int = None) -> tuple[list, int]:
+    """
+    Hali yozilmagan (ko'pi bilan `max_records` ta) yozuvlarni tartib bilan qaytaradi:
+    (yozuvlar, keyingi_offset). Fayl saqlangan offsetdan boshlab faqat kerakli qatorlargacha
+    o'qiladi. Oxirgi to'liq yozilmagan qator (qulash natijasi) hisobga olinmaydi va keyingi
+    o'qishda qayta ko'riladi. Buzilgan qatorlar karantinga ko'chiriladi.
+    """
+    records = []
+    corrupt = []
+    with _lock:
+        offset = _load_offset()
+        try:
+            f = open(JOURNAL_PATH, 'rb')
+        except FileNotFoundError:
+            return [], offset
+        with f:
+            if offset > os.fstat(f.fileno()).st_size:
+                logger.error(f"{offset_path()} jurnal hajmidan katta, jurnal boshidan o'qiladi")
+                offset = 0
+            f.seek(offset)
+            while max_records is None or len(records) < max_records:
+                line = f.readline()
+                if not line.endswith(b"\n"): break
+                offset += len(line)
+                raw_line = line.strip()
+                if not raw_line: continue
+                try:
+                    records.append(json.loads(raw_line))
+                except ValueError:
+                    corrupt.append(raw_line)
+
+    for raw_line in corrupt:
+        logger.error(f"buzilgan qator karantinga ko'chirildi: {raw_line[:80]!r}")
+        quarantine(raw_line, "buzilgan qator")
+    return records, offset
+
+
+def discard(offset: int) -> None:
+    """
+    `offset` gacha bo'lgan yozuvlarni yozib bo'lingan deb belgilaydi: fayl qayta yozilmaydi,
+    faqat offset saqlanadi. Hamma yozuvlar yozib bo'linganda jurnal va offset o'chiriladi.
+    """
+    global _tail_checked
+    with _lock:
+        try:
+            size = os.path.getsize(JOURNAL_PATH)
+        except FileNotFoundError:
+            return
+
+        if offset < size:
+            _save_offset(offset)
+            return
+        # Avval offset o'chiriladi: oraliqda qulash bo'lsa jurnal boshidan qayta o'qiladi
+        # (request_id takrorlanishdan saqlaydi), yangi jurnal yozuvlari esa o'tkazib yuborilmaydi
+        if os.path.exists(offset_path()): os.remove(offset_path())
+        os.remove(JOURNAL_PATH)
+        _fsync_dir(JOURNAL_PATH)
+        _tail_checked = False
+
+
+def has_pending() -> bool:
+    """Offsetdan keyin kamida bitta to'liq yozilgan qator bormi (oxirgi yarim qator hisobga olinmaydi)."""
+    with _lock:
+        try:
+            with open(JOURNAL_PATH, 'rb') as f:
+                f.seek(_load_offset())
+                return f.readline().endswith(b"\n")
+        except OSError:
+            return False
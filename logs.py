@@ -0,0 +1,247 @@
+# logs.py
+# Bloklamaydigan, tuzilgan (JSON) loglash: handler va db.py dagi logger.* chaqiruvlari yozuvni
+# faqat navbatga qo'yadi, stdoutga yozishni alohida thread (QueueListener) bajaradi.
+# Navbat to'lsa yozuv tashlab yuboriladi (event loop hech qachon log uchun kutmaydi).
+#
+#   LOG_LEVEL=INFO                   minimal daraja
+#   LOG_SAMPLE_RATES=DEBUG=0.1       daraja bo'yicha tanlab yozish (0..1), masalan "DEBUG=0.05,INFO=1"
+#   LOG_QUEUE_SIZE=10000             navbat chegarasi
+#   LOG_STOP_TIMEOUT=5               to'xtatishda to'la navbat bo'shashini kutish (soniya)
+#
+# Benchmark (loop to'xtab qolishini o'lchash): python logs.py
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "DEBUG=0.1")
+LOG_STOP_TIMEOUT = float(os.getenv("LOG_STOP_TIMEOUT", "5"))
+
+# LogRecord ning standart maydonlari; qolganlari (extra=...) JSON ga alohida kalit bo'lib tushadi
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+
+
+def _parse_sample_rates(spec: str) -> dict:
+    rates = {}
+    for part in spec.split(','):
+        if '=' not in part: continue
+        level, rate = part.split('=', 1)
+        level_no = logging.getLevelName(level.strip().upper())
+        if isinstance(level_no, int):
+            rates[level_no] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Bitta yozuv - bitta JSON qator."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Ko'p takrorlanadigan darajalardan (masalan, DEBUG) faqat bir qismini o'tkazadi."""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        return rate is None or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Navbat to'lganda kutmaydi: yozuvni tashlab, sonini hisoblaydi."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._count_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Nusxa: logger ning boshqa handlerlari asl yozuvni (msg, args, exc_info) o'zgarmagan holda oladi.
+        # Xabar argumentlari shu yerda (chaqiruvchi threadda) satrga aylantiriladi - ular keyin
+        # o'zgarishi mumkin. JSON ga aylantirish esa listener threadida bo'ladi.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Oldingi tashlanganlar soni navbatga haqiqatan tushgan yozuvda xabar qilinadi
+        with self._count_lock:
+            unreported = self._unreported
+        if unreported:
+            record.dropped_before = unreported
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+        if unreported:
+            with self._count_lock:
+                self._unreported -= unreported
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    To'la navbatda ham to'xtaydigan QueueListener. Asl enqueue_sentinel put_nowait ishlatadi va
+    navbat to'la bo'lsa queue.Full beradi - stop() (atexit) yiqiladi, qolgan yozuvlar chiqmaydi.
+    Bu yerda sentinel `stop_timeout` soniya kutadi (listener navbatni bo'shatadi); shunda ham
+    joy bo'lmasa, eng eski yozuvlar tashlab yuborilib sentinel qo'yiladi.
+    """
+
+    def __init__(self, log_queue: queue.Queue, *handlers, respect_handler_level: bool = False,
+                 stop_timeout: float = LOG_STOP_TIMEOUT):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.stop_timeout = stop_timeout
+
+    def enqueue_sentinel(self) -> None:
+        try:
+            self.queue.put(self._sentinel, timeout=self.stop_timeout)
+            return
+        except queue.Full:
+            pass
+
+        discarded = 0
+        while True:
+            try:
+                self.queue.put_nowait(self._sentinel)
+                break
+            except queue.Full:
+                pass
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                discarded += 1
+            except queue.Empty:
+                pass
+        if discarded:
+            # Logging to'xtatilmoqda - xabar to'g'ridan-to'g'ri stderr ga
+            sys.stderr.write(f"logs: to'xtatishda navbatdan {discarded} ta yozuv tashlab yuborildi\n")
+
+
+def setup_logging(stream=None) -> None:
+    """Root loggerni navbat orqali JSON chiqishga ulaydi (bir marta chaqirilsa yetarli)."""
+    global _listener, _queue_handler
+    if _listener is not None: return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(_parse_sample_rates(LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+    # httpx har bir getUpdates so'rovini INFO da yozadi
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = DrainingQueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Jarayon tugaganda navbatda qolgan yozuvlar ham chiqariladi
+    atexit.register(_listener.stop)
+
+
+def stats() -> dict:
+    if _queue_handler is None: return {}
+    return {'queued': _queue_handler.queue.qsize(), 'dropped': _queue_handler.dropped}
+
+
+# --- Benchmark: sekin o'qiladigan stdout (log kollektori) bilan loop qancha to'xtaydi ---
+
+def _slow_pipe():
+    """Yozish uchun oqim; o'quvchi thread uni sekin bo'shatadi (to'lgan pipe yozuvchini bloklaydi)."""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, 'rb') as reader:
+            while reader.read1(4096):
+                time.sleep(0.002)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, 'w', buffering=1)
+
+
+async def _measure(logger: logging.Logger, lines: int) -> dict:
+    import asyncio
+
+    lags = []
+    stop = False
+
+    async def heartbeat():
+        loop = asyncio.get_running_loop()
+        while not stop:
+            expected = loop.time() + 0.001
+            await asyncio.sleep(0.001)
+            lags.append(max(0.0, loop.time() - expected))
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for i in range(lines):
+        logger.info("burst yozuvi %d", i, extra={'chat_id': i % 50})
+        if i % 100 == 0: await asyncio.sleep(0)
+    caller_seconds = time.perf_counter() - start
+    stop = True
+    await beat
+    return {'caller_ms': caller_seconds * 1000, 'max_stall_ms': max(lags) * 1000}
+
+
+def _benchmark(lines: int = 20000) -> None:
+    import asyncio
+
+    direct = logging.getLogger("bench.direct")
+    direct.propagate = False
+    direct.setLevel(logging.INFO)
+    handler = logging.StreamHandler(_slow_pipe())
+    handler.setFormatter(JsonFormatter())
+    direct.addHandler(handler)
+    result = asyncio.run(_measure(direct, lines))
+    print(f"To'g'ridan-to'g'ri StreamHandler: chaqiruvlar {result['caller_ms']:.0f}ms, "
+          f"loop maksimal to'xtashi {result['max_stall_ms']:.1f}ms")
+
+    setup_logging(stream=_slow_pipe())
+    queued = logging.getLogger("bench.queued")
+    result = asyncio.run(_measure(queued, lines))
+    print(f"Navbatli (logs.py):             chaqiruvlar {result['caller_ms']:.0f}ms, "
+          f"loop maksimal to'xtashi {result['max_stall_ms']:.1f}ms, tashlab yuborildi: {stats()['dropped']}")
+
+
+if __name__ == '__main__':
+    _benchmark()
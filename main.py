@@ -1,12 +1,19 @@
 import os
 import sys
 import asyncio
+import logging
+from collections import OrderedDict
+from functools import wraps
+from datetime import datetime, timedelta
 
 from telegram import Update, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, filters, 
-    ContextTypes, ConversationHandler, CallbackQueryHandler
+    ContextTypes, ConversationHandler, CallbackQueryHandler, TypeHandler
 )
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger("main")
 
 # db.py dan kerakli funksiyalarni import qilamiz
 try:
@@ -14,25 +21,48 @@ try:
         create_tables, get_user_role, add_new_product, get_all_products, 
         get_seller_by_password, update_seller_chat_id, add_new_seller,
         get_all_sellers, get_all_seller_passwords, get_seller_password_by_id,
-        add_inventory, get_seller_debt_details, get_seller_id_by_chat_id
+        add_inventory, add_stock, get_seller_debt_details, get_inventory_in_range, get_seller_holdings, get_seller_id_by_chat_id,
+        get_seller_last_inventory_id, set_request_chat_id, create_broadcast, update_broadcast,
+        replay_inventory_journal, db_unavailable, ROLE_UNAVAILABLE, ensure_inventory_partitions,
+        invalidate_product_snapshot, read_from_primary
     )
 except ImportError:
-    print("!!! KRITIK XATO: db.py fayli topilmadi yoki import qilinmadi.", file=sys.stderr)
+    logger.critical("db.py fayli topilmadi yoki import qilinmadi.")
     sys.exit(1)
 
+from broadcast import run_broadcast, resume_broadcasts
+from chat_processor import ChatOrderedUpdateProcessor, BoundedUpdateQueue
+import cache_events
+import journal
+import tracing
+import recorder
+import user_state
+
 
 # --- 1. Konfiguratsiya va Global Holatlar ---
 TOKEN = os.getenv("BOT_TOKEN")
+# O'z Bot API serveri yoki replay.py dagi stub uchun almashtirish mumkin
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "https://api.telegram.org/bot")
 
 # DB ni majburan yaratish/tekshirish (Server ishga tushganda)
 try:
-    print("🚀 [INIT] Baza jadvallarini yaratish/tekshirish boshlanmoqda...")
+    logger.info("[INIT] Baza jadvallarini yaratish/tekshirish boshlanmoqda...")
     create_tables()
-    print("✅ [INIT] Baza jadvallari tayyor.")
+    logger.info("[INIT] Baza jadvallari tayyor.")
 except Exception as e:
-    print(f"!!! KRITIK XATO (INIT): Baza jadvallarini yaratish/tekshirishda xato: {e}", file=sys.stderr)
+    logger.critical(f"[INIT] Baza jadvallarini yaratish/tekshirishda xato: {e}")
 
 ADMIN_IDS = [int(i.strip()) for i in os.getenv("ADMIN_IDS", "").split(',') if i.strip()]
+# Shuncha soniya harakatsiz qolgan suhbat tugatiladi (ConversationHandler.conversation_timeout)
+CONVERSATION_TIMEOUT = float(os.getenv("CONVERSATION_TIMEOUT", "900"))
+# Shuncha soniya harakatsiz foydalanuvchining user_data si xotiradan o'chiriladi
+USER_STATE_TTL = max(float(os.getenv("USER_STATE_TTL", "1800")), CONVERSATION_TIMEOUT)
+
+# Jurnalga tushgan (baza ishlamagan paytdagi) yozuvlarni qayta yozishga urinish oralig'i
+JOURNAL_REPLAY_INTERVAL = float(os.getenv("JOURNAL_REPLAY_INTERVAL", "15"))
+
+# Baza bilan aloqa yo'qligida (circuit breaker ochiq) foydalanuvchiga ko'rsatiladi
+UNAVAILABLE_TEXT = "⚠️ Tizim vaqtincha ishlamayapti (baza bilan aloqa yo'q). Iltimos, birozdan keyin qayta urinib ko'ring."
 
 # Holatlar (ConversationHandler uchun)
 (
@@ -40,8 +70,10 @@ ADMIN_IDS = [int(i.strip()) for i in os.getenv("ADMIN_IDS", "").split(',') if i.
     NEW_PRODUCT_NAME, NEW_PRODUCT_PRICE,
     NEW_SELLER_NAME, NEW_SELLER_MAHALLA, NEW_SELLER_PHONE, NEW_SELLER_PASSWORD,
     AWAITING_PRODUCT_SELECTION,  
-    AWAITING_PRODUCT_COUNT      
-) = range(11)
+    AWAITING_PRODUCT_COUNT,
+    BROADCAST_TEXT,
+    STOCK_PRODUCT_SELECTION, STOCK_COUNT
+) = range(14)
 
 
 # --- 2. Yordamchi Funksiyalar ---
@@ -52,13 +84,279 @@ def get_formatted_price(price: float) -> str:
     # 1234567.89 -> 1 234 568
     return f"{float(price):,.0f}".replace(",", " ") 
 
+# --- Sahifalangan tanlash klaviaturalari (kesh bilan) ---
+# Har bir sahifada PICKER_PAGE_SIZE ta tugma bo'ladi, callback_data esa faqat
+# "<tur>:<id>" yoki "<tur>pg:<sahifa>" ko'rinishida qisqa saqlanadi.
+PICKER_PAGE_SIZE = int(os.getenv("PICKER_PAGE_SIZE", "10"))
+
+# tur -> {'names': {id: nom}, 'ids': [id, ...], 'pages': {sahifa: InlineKeyboardMarkup}}
+# Barcha adminlar uchun bitta umumiy nusxa saqlanadi.
+_picker_cache = {}
+
+def invalidate_picker(kind: str) -> None:
+    """Sotuvchilar ('sel') yoki mahsulotlar ('prod') o'zgarganda keshni tozalaydi."""
+    _picker_cache.pop(kind, None)
+
+def _load_picker(kind: str) -> dict:
+    entry = _picker_cache.get(kind)
+    if entry is not None:
+        return entry
+
+    # Umumiy kesh faqat asosiy bazadan to'ldiriladi: replika NOTIFY dan orqada qolishi mumkin
+    with read_from_primary():
+        if kind == 'sel':
+            rows, name_key = get_all_sellers(), 'ism'
+        else:
+            rows, name_key = get_all_products(), 'nomi'
+
+    entry = {
+        'names': {row['id']: row[name_key] for row in rows},
+        'ids': [row['id'] for row in rows],
+        'pages': {},
+    }
+    # Bo'sh natija DB xatosi bo'lishi mumkin, shuning uchun uni keshlamaymiz
+    if rows: _picker_cache[kind] = entry
+    return entry
+
+def picker_name(kind: str, item_id: int) -> str or None:
+    return _load_picker(kind)['names'].get(item_id)
+
+def get_selected_seller_name(context: ContextTypes.DEFAULT_TYPE) -> str or None:
+    """user_data da faqat sotuvchi ID si saqlanadi, nomi umumiy indeksdan olinadi."""
+    seller_id = context.user_data.get('selected_seller_id')
+    if not seller_id: return None
+    return picker_name('sel', seller_id) or f"#{seller_id}"
+
+def get_picker_page(kind: str, page: int = 0) -> InlineKeyboardMarkup or None:
+    """Berilgan sahifa uchun tayyor (keshlangan) inline klaviaturani qaytaradi."""
+    entry = _load_picker(kind)
+    ids = entry['ids']
+    if not ids: return None
+
+    page_count = (len(ids) + PICKER_PAGE_SIZE - 1) // PICKER_PAGE_SIZE
+    page = max(0, min(page, page_count - 1))
+    if page in entry['pages']:
+        return entry['pages'][page]
+
+    page_ids = ids[page * PICKER_PAGE_SIZE:(page + 1) * PICKER_PAGE_SIZE]
+    inline_keyboard = []
+    for i in range(0, len(page_ids), 2):
+        inline_keyboard.append([
+            InlineKeyboardButton(entry['names'][item_id], callback_data=f"{kind}:{item_id}")
+            for item_id in page_ids[i:i+2]
+        ])
+
+    nav_row = []
+    if page > 0:
+        nav_row.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"{kind}pg:{page - 1}"))
+    if page < page_count - 1:
+        nav_row.append(InlineKeyboardButton(f"Keyingi ➡️ ({page + 2}/{page_count})", callback_data=f"{kind}pg:{page + 1}"))
+    if nav_row: inline_keyboard.append(nav_row)
+
+    markup = InlineKeyboardMarkup(inline_keyboard)
+    entry['pages'][page] = markup
+    return markup
+
+# --- Qarzdorlik hisoboti keshi ---
+# Kalit: seller_id, qiymat: oxirgi inventar ID si bilan tayyor matn bloklari.
+# Yangi tovar berilsa, faqat yangi yozuvlar olinib, mavjud hisobot boshiga qo'shiladi.
+# Kesh xabarlari tinglanayotganda topilgan hisobot bazaga murojaatsiz qaytariladi: yangi yozuv
+# haqida trigger xabar beradi (note_inventory_insert). Tinglovchi uzilganda esa MAX(id) tekshiriladi.
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+DEBT_REPORT_CHUNK_SIZE = 15
+
+_report_cache = OrderedDict()
+
+def invalidate_debt_report(seller_id: int = None) -> None:
+    if seller_id is None: _report_cache.clear()
+    else: _report_cache.pop(seller_id, None)
+
+def mark_debt_report_stale(seller_id: int) -> None:
+    """
+    Shu jarayon yozgan tovar berishdan keyin: NOTIFY kelishini kutmasdan, keyingi so'rov
+    yangi yozuvlarni bazadan oladi (tinglovchi ulanishi sezdirmay uzilgan bo'lsa ham).
+    """
+    cached = _report_cache.get(seller_id)
+    if cached is not None: cached['stale'] = True
+
+def note_inventory_insert(seller_id: int, inventory_id: int) -> None:
+    """
+    Yangi inventar yozuvi haqidagi xabar: hisobot tashlanmaydi, keyingi so'rovda faqat
+    yangi yozuvlar bilan to'ldiriladi. ID keshdagi chegaradan kichik bo'lsa (boshqa jarayonning
+    tranzaksiyasi kechroq commit bo'lgan) va hisobotda yo'q bo'lsa, hisobot qaytadan quriladi.
+    """
+    cached = _report_cache.get(seller_id)
+    if cached is None or inventory_id in cached['ids']: return
+    if inventory_id > cached['last_id']: cached['stale'] = True
+    else: _report_cache.pop(seller_id, None)
+
+def _render_debt_item(item: dict) -> str:
+    return (
+        f"▪️ **{item['mahsulot_nomi']}**\n"
+        f"   Soni: {item['soni']} dona\n"
+        f"   Narxi: {get_formatted_price(item['jami_narxi'])} so'm\n"
+        f"   Sana: {item['sana']}\n"
+    )
+
+def get_debt_report(seller_id: int) -> tuple[float, list]:
+    """Sotuvchining jami qarzi va tayyor (formatlangan) tovar bloklari ro'yxati."""
+    cached = _report_cache.get(seller_id)
+    if cached and not cached['stale'] and cache_events.is_connected():
+        _report_cache.move_to_end(seller_id)
+        return cached['total'], cached['items']
+
+    # Umumiy kesh faqat asosiy bazadan to'ldiriladi: replika NOTIFY dan orqada qolishi mumkin
+    with read_from_primary():
+        return _load_debt_report(seller_id, cached)
+
+def _load_debt_report(seller_id: int, cached: dict or None) -> tuple[float, list]:
+    last_id = get_seller_last_inventory_id(seller_id)
+
+    if last_id is None:
+        # DB xatosi: oxirgi ma'lum hisobotni ko'rsatamiz
+        return (cached['total'], cached['items']) if cached else (0.0, [])
+
+    if cached and cached['last_id'] == last_id and not cached['stale']:
+        _report_cache.move_to_end(seller_id)
+        return cached['total'], cached['items']
+
+    if cached and cached['last_id'] < last_id:
+        # Faqat yangi berilgan tovarlarni olib, hisobot boshiga qo'shamiz
+        base_id = cached['last_id']
+        delta_total, rows = get_seller_debt_details(seller_id, after_id=base_id)
+        total = cached['total'] + delta_total
+        items = [_render_debt_item(item) for item in rows] + cached['items']
+    else:
+        base_id = 0
+        total, rows = get_seller_debt_details(seller_id)
+        items = [_render_debt_item(item) for item in rows]
+
+    # Oraliqda yozuv bo'lishi kerak edi, bo'sh kelsa - so'rov xatosi, keshlamaymiz
+    if last_id and not rows:
+        return total, items
+
+    # Kalit sifatida haqiqatda o'qilgan eng katta ID saqlanadi: MAX(id) va ro'yxat
+    # so'rovi orasida yangi yozuv commit bo'lsa ham hisobot yozuvsiz qolmaydi
+    rendered_id = max((row['id'] for row in rows), default=base_id)
+    ids = {row['id'] for row in rows} | (cached['ids'] if base_id else set())
+    _report_cache[seller_id] = {'last_id': rendered_id, 'total': total, 'items': items, 'ids': ids, 'stale': False}
+    _report_cache.move_to_end(seller_id)
+    while len(_report_cache) > REPORT_CACHE_SIZE:
+        _report_cache.popitem(last=False)
+    return total, items
+
+async def send_debt_report(update: Update, header: str, item_texts: list, empty_text: str, list_title: str) -> None:
+    # effective_message: inline tugmadan (rng:...) chaqirilganda ham ishlaydi
+    message = update.effective_message
+    text = header + "--------------------------------------\n"
+    if not item_texts:
+        await message.reply_text(text + empty_text, parse_mode='Markdown')
+        return
+
+    # Jami qarzdorlik hisoboti
+    await message.reply_text(text + list_title, parse_mode='Markdown')
+
+    # Xabarni 15 tadan bo'lib yuborish
+    for i in range(0, len(item_texts), DEBT_REPORT_CHUNK_SIZE):
+        chunk_text = "\n".join(item_texts[i:i + DEBT_REPORT_CHUNK_SIZE])
+        await message.reply_text(f"**Tovarlar ro'yxati (davomi):**\n\n{chunk_text}", parse_mode='Markdown')
+
+# --- Sana oralig'i bo'yicha hisobot (/davr) ---
+# Ro'yxatda eng yangi RANGE_REPORT_LIMIT ta yozuv ko'rsatiladi, jami summa esa butun oraliq bo'yicha
+RANGE_REPORT_LIMIT = int(os.getenv("RANGE_REPORT_LIMIT", "50"))
+RANGE_PERIODS = {'today': "Bugun", 'week': "Shu hafta", 'month': "Shu oy"}
+
+def period_bounds(period: str) -> tuple[datetime, datetime]:
+    """Davr uchun [boshlanish, tugash) oralig'i (mahalliy vaqt)."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'today':
+        return today, today + timedelta(days=1)
+    if period == 'week':
+        monday = today - timedelta(days=today.weekday())
+        return monday, monday + timedelta(days=7)
+    first_day = today.replace(day=1)
+    return first_day, (first_day + timedelta(days=32)).replace(day=1)
+
+def parse_custom_range(args: list) -> tuple[datetime, datetime] or None:
+    """/davr 2026-01-01 [2026-01-31] - tugash sanasi ham oraliqqa kiradi."""
+    try:
+        start = datetime.strptime(args[0], "%Y-%m-%d")
+        end = datetime.strptime(args[1], "%Y-%m-%d") if len(args) > 1 else start
+    except ValueError:
+        return None
+    if end < start: return None
+    return start, end + timedelta(days=1)
+
+async def send_range_report(update: Update, context: ContextTypes.DEFAULT_TYPE, start: datetime, end: datetime, label: str) -> None:
+    """Admin: tanlangan sotuvchi (tanlanmagan bo'lsa - barcha sotuvchilar). Sotuvchi: o'zi."""
+    chat_id = update.effective_chat.id
+    if is_admin(chat_id):
+        seller_id = context.user_data.get('selected_seller_id')
+        title = get_selected_seller_name(context) if seller_id else "Barcha sotuvchilar"
+    else:
+        seller_id = get_seller_id_by_chat_id(chat_id)
+        title = "Sizga berilgan tovarlar"
+        if not seller_id:
+            await update.effective_message.reply_text(
+                UNAVAILABLE_TEXT if db_unavailable() else "Tizimda profilingiz topilmadi. /start orqali qayta urinib ko'ring."
+            )
+            return
+
+    report = get_inventory_in_range(seller_id, start, end, limit=RANGE_REPORT_LIMIT)
+    if report is None:
+        await update.effective_message.reply_text(UNAVAILABLE_TEXT if db_unavailable() else "Hisobotni olishda xato yuz berdi.")
+        return
+
+    item_texts = [
+        (f"👤 {item['sotuvchi_ismi']}\n" if seller_id is None else "") + _render_debt_item(item)
+        for item in report['items']
+    ]
+    if report['count'] > len(item_texts):
+        item_texts.append(f"... va yana {report['count'] - len(item_texts)} ta yozuv (oxirgi {len(report['items'])} tasi ko'rsatildi)")
+
+    await send_debt_report(
+        update,
+        f"📅 **{title}** - {label}\n\n"
+        f"**💳 Jami: {get_formatted_price(report['total'])} so'm**\n"
+        f"🔢 {report['quantity']} dona, {report['count']} ta yozuv\n",
+        item_texts,
+        empty_text="📦 Bu davrda tovar berilmagan.",
+        list_title="📦 **Berilgan Tovarlar Ro'yxati:**\n\n"
+    )
+
 # --- 3. Buyruqlar (Handlers) ---
 
+# --- Foydalanuvchi holatini cheklash (user_state.py) ---
+
+# Suhbat vaqtinchalik kalitlari (suhbat tugasa kerak emas)
+TRANSIENT_USER_KEYS = (
+    'selected_seller_id', 'temp_product_id',
+    'new_product_name', 'new_seller_name', 'new_seller_mahalla', 'new_seller_phone',
+)
+
+async def on_conversation_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    for key in TRANSIENT_USER_KEYS:
+        context.user_data.pop(key, None)
+
+async def evict_idle_users(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """USER_STATE_TTL dan ko'p harakatsiz foydalanuvchilarning user_data sini o'chiradi."""
+    user_state.evict_idle(context.application, USER_STATE_TTL)
+
+# UPDATE_RECORD_PATH o'rnatilgan bo'lsa, har bir update replay.py uchun faylga yoziladi
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    recorder.record(update.to_json())
+
+# Har bir update uchun DB qatlamiga chat_id ni bildiradi (read-your-writes uchun)
+async def bind_request_context(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    set_request_chat_id(update.effective_chat.id if update.effective_chat else None)
+    if update.effective_user:
+        user_state.touch(update.effective_user.id)
+
 # /start buyrug'i
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     chat_id = update.effective_chat.id
     
-    print(f"🤖 [1/6] /start buyrug'i qabul qilindi. Chat ID: {chat_id}.") 
+    logger.debug("[1/6] /start buyrug'i qabul qilindi.", extra={'chat_id': chat_id})
     
     await update.message.reply_text("✅ Tizim sizning xabaringizni qabul qildi. Roli tekshirilmoqda...") 
         
@@ -69,17 +367,21 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         else:
             role = get_user_role(chat_id)
 
-        print(f"✅ [5/6] Foydalanuvchi roli aniqlandi: {role}")
+        logger.debug("[5/6] Foydalanuvchi roli aniqlandi: %s", role, extra={'chat_id': chat_id})
         
         # Mantiqiy yo'naltirish
         if role == 'admin':
-            keyboard = [[KeyboardButton("/mahsulot"), KeyboardButton("/sotuvchi")]]
+            keyboard = [[KeyboardButton("/mahsulot"), KeyboardButton("/sotuvchi")], [KeyboardButton("/xabar"), KeyboardButton("/davr")]]
             reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
             await update.message.reply_text('Assalomu alaykum, Admin! Asosiy boshqaruv buyruqlari:', reply_markup=reply_markup)
             return ADMIN_MENU
         
+        elif role == ROLE_UNAVAILABLE:
+            await update.message.reply_text(UNAVAILABLE_TEXT)
+            return ConversationHandler.END
+
         elif role == 'sotuvchi':
-            keyboard = [[KeyboardButton("Mahsulotlarim"), KeyboardButton("Qarzdorligim")]]
+            keyboard = [[KeyboardButton("Mahsulotlarim"), KeyboardButton("Qarzdorligim")], [KeyboardButton("/davr")]]
             reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
             await update.message.reply_text("Siz tizimga kirdingiz. O'zingizga kerakli bo'limni tanlang:", reply_markup=reply_markup)
             return SELLER_MENU
@@ -91,7 +393,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return AWAITING_PASSWORD
             
     except Exception as e:
-        print(f"!!! KRITIK XATO start_command da: {e}.", file=sys.stderr) 
+        logger.exception(f"start_command da xato: {e}.", extra={'chat_id': chat_id})
         await update.message.reply_text(f"Tizimda ichki xato yuz berdi. Iltimos, keyinroq urinib ko'ring.")
         return ConversationHandler.END
 
@@ -110,6 +412,9 @@ async def handle_password(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END 
+    elif db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return AWAITING_PASSWORD
     else:
         await update.message.reply_text("Kiritilgan parol noto'g'ri. Iltimos, qayta urinib ko'ring.")
         return AWAITING_PASSWORD
@@ -118,7 +423,7 @@ async def handle_password(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def mahsulot_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
-    keyboard = [[KeyboardButton("Mahsulotlar"), KeyboardButton("Yangi mahsulot kiritish")]]
+    keyboard = [[KeyboardButton("Mahsulotlar"), KeyboardButton("Yangi mahsulot kiritish")], [KeyboardButton("Omborga kirim")]]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
     await update.message.reply_text('Mahsulotlar bo\'limi:', reply_markup=reply_markup)
     return ADMIN_MENU
@@ -126,12 +431,59 @@ async def mahsulot_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 async def show_all_products(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
     products = get_all_products()
+    if not products and db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return ADMIN_MENU
     text = "📦 **Barcha Mahsulotlar Ro'yxati:**\n\n"
     for idx, product in enumerate(products):
-        text += f"{idx+1}. **{product['nomi']}** ({get_formatted_price(product['narxi'])} so'm)\n"
+        stock = f", omborda: {product['qoldiq']} dona" if product['qoldiq'] is not None else ""
+        text += f"{idx+1}. **{product['nomi']}** ({get_formatted_price(product['narxi'])} so'm{stock})\n"
     await update.message.reply_text(text, parse_mode='Markdown')
     return ADMIN_MENU
 
+# --- Omborga kirim ---
+
+async def stock_receipt_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not is_admin(update.effective_chat.id): return ConversationHandler.END
+    reply_markup = get_picker_page('prod')
+    if not reply_markup:
+        await update.message.reply_text(UNAVAILABLE_TEXT if db_unavailable() else "Bazada mahsulotlar mavjud emas. Avval mahsulot kiriting.")
+        return ADMIN_MENU
+    await update.message.reply_text("📥 Qaysi **mahsulot** omborga keldi?", reply_markup=reply_markup, parse_mode='Markdown')
+    return STOCK_PRODUCT_SELECTION
+
+async def select_stock_product_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    context.user_data['temp_product_id'] = int(query.data.split(':')[1])
+    await query.edit_message_text(
+        f"✅ Mahsulot tanlandi: **{picker_name('prod', context.user_data['temp_product_id'])}**. "
+        f"Omborga **necha dona** kelganini kiriting (faqat butun son):",
+        parse_mode='Markdown'
+    )
+    return STOCK_COUNT
+
+async def finalize_stock_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not is_admin(update.effective_chat.id): return ConversationHandler.END
+    try:
+        count = int(update.message.text)
+        if count <= 0: raise ValueError
+    except ValueError:
+        await update.message.reply_text("Noto'g'ri qiymat. Iltimos, musbat butun son kiriting.")
+        return STOCK_COUNT
+
+    product_id = context.user_data.pop('temp_product_id', None)
+    total = add_stock(product_id, count)
+    if total is not None:
+        await update.message.reply_text(
+            f"✅ Omborga kirim qilindi: **{picker_name('prod', product_id)}** +{count} dona.\n"
+            f"📦 Joriy qoldiq: **{total} dona**",
+            parse_mode='Markdown'
+        )
+    else:
+        await update.message.reply_text(UNAVAILABLE_TEXT if db_unavailable() else "Xatolik yuz berdi. Kirim saqlanmadi.")
+    return await mahsulot_command(update, context)
+
 async def new_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("Iltimos, mahsulot nomini kiriting:")
     return NEW_PRODUCT_NAME
@@ -146,7 +498,10 @@ async def get_new_product_price(update: Update, context: ContextTypes.DEFAULT_TY
         price = float(update.message.text)
         product_name = context.user_data.pop('new_product_name')
         if add_new_product(product_name, price):
+            invalidate_picker('prod')
             await update.message.reply_text(f"Mahsulot kiritildi: **{product_name}** - {get_formatted_price(price)} so'm.", parse_mode='Markdown')
+        elif db_unavailable():
+            await update.message.reply_text(UNAVAILABLE_TEXT)
         else:
             await update.message.reply_text(f"Xatolik yuz berdi yoki '{product_name}' allaqachon mavjud.")
         return await mahsulot_command(update, context) 
@@ -158,6 +513,8 @@ async def get_new_product_price(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def sotuvchi_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
+    # Sotuvchi detal menyusidan chiqildi: /davr endi barcha sotuvchilar bo'yicha
+    context.user_data.pop('selected_seller_id', None)
     keyboard = [[KeyboardButton("Sotuvchilar"), KeyboardButton("Yangi Sotuvchi Qo'shish")]]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
     await update.message.reply_text('Sotuvchilar bo\'limi:', reply_markup=reply_markup)
@@ -165,6 +522,7 @@ async def sotuvchi_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 async def sellers_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
+    context.user_data.pop('selected_seller_id', None)
     keyboard = [
         [KeyboardButton("Barcha Sotuvchilar"), KeyboardButton("Sotuvchilar Parollari")],
         [KeyboardButton("/sotuvchi_orqaga")]
@@ -175,37 +533,49 @@ async def sellers_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 async def show_all_sellers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
-    sellers = get_all_sellers()
-    if not sellers:
-        await update.message.reply_text("Bazada hozircha hech qanday sotuvchi mavjud emas.")
+    reply_markup = get_picker_page('sel')
+    if not reply_markup:
+        await update.message.reply_text(UNAVAILABLE_TEXT if db_unavailable() else "Bazada hozircha hech qanday sotuvchi mavjud emas.")
         return await sellers_menu(update, context)
 
-    keyboard = []
-    current_row = []
-    context.user_data['seller_names_to_id'] = {} 
-    
-    for seller in sellers:
-        seller_name = seller['ism']
-        context.user_data['seller_names_to_id'][seller_name] = seller['id']
-        seller_button = KeyboardButton(seller_name)
-        if len(current_row) < 2: current_row.append(seller_button)
-        else:
-            keyboard.append(current_row)
-            current_row = [seller_button]
-            
-    if current_row: keyboard.append(current_row)
-    keyboard.append([KeyboardButton("/sotuvchi_orqaga")]) 
-
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-    
-    await update.message.reply_text("🧑‍🤝‍🧑 **Sotuvchini tanlang:**", reply_markup=reply_markup, parse_mode='Markdown')
+    await update.message.reply_text(
+        "🧑‍🤝‍🧑 **Sotuvchini tanlang:**\n(Orqaga: /sotuvchi_orqaga)",
+        reply_markup=reply_markup,
+        parse_mode='Markdown'
+    )
     return ADMIN_MENU
 
+async def picker_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sotuvchi/mahsulot ro'yxatida sahifani almashtiradi (xabarni tahrirlash orqali). Holat o'zgarmaydi."""
+    query = update.callback_query
+    await query.answer()
+
+    kind, page = query.data.split('pg:')
+    reply_markup = get_picker_page(kind, int(page))
+    if reply_markup:
+        await query.edit_message_reply_markup(reply_markup=reply_markup)
+    # None: tovar berish va omborga kirim ikkalasi ham mahsulot ro'yxatidan foydalanadi
+    return None
+
+async def select_seller_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+
+    seller_id = int(query.data.split(':')[1])
+    seller_name = picker_name('sel', seller_id)
+    if not seller_name:
+        await query.edit_message_text("Sotuvchi topilmadi. Ro'yxatni qayta oching.")
+        return ADMIN_MENU
+
+    context.user_data['selected_seller_id'] = seller_id
+    await query.edit_message_text(f"✅ Tanlandi: **{seller_name}**", parse_mode='Markdown')
+    return await show_seller_detail_menu(update, context)
+
 async def show_seller_password(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
     
     selected_seller_id = context.user_data.get('selected_seller_id')
-    selected_seller_name = context.user_data.get('selected_seller_name')
+    selected_seller_name = get_selected_seller_name(context)
 
     if not selected_seller_id:
         await update.message.reply_text("Avval sotuvchini tanlang.")
@@ -218,6 +588,8 @@ async def show_seller_password(update: Update, context: ContextTypes.DEFAULT_TYP
             f"👤 **{selected_seller_name}** paroli: `{password}`",
             parse_mode='Markdown'
         )
+    elif db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
     else:
         await update.message.reply_text(f"Parol topilmadi yoki xatolik yuz berdi.")
         
@@ -226,6 +598,9 @@ async def show_seller_password(update: Update, context: ContextTypes.DEFAULT_TYP
 async def show_seller_passwords(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
     passwords = get_all_seller_passwords()
+    if not passwords and db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return await sellers_menu(update, context)
     text = "🔐 **Sotuvchilar Parollari Ro'yxati:**\n\n"
     for seller in passwords:
         text += f"👤 {seller['ism']}: `{seller['parol']}`\n"
@@ -256,44 +631,65 @@ async def get_new_seller_password(update: Update, context: ContextTypes.DEFAULT_
     mahalla = context.user_data.pop('new_seller_mahalla')
     telefon = context.user_data.pop('new_seller_phone')
     if add_new_seller(ism, mahalla, telefon, parol):
+        invalidate_picker('sel')
         await update.message.reply_text(
             f"Yangi sotuvchi **{ism}** muvaffaqiyatli qo'shildi! Paroli: **{parol}**",
             parse_mode='Markdown'
         )
+    elif db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
     else:
         await update.message.reply_text("Sotuvchi qo'shishda xatolik yuz berdi (Balki parol allaqachon mavjud).")
     return await sotuvchi_command(update, context)
 
+# --- Admin Ommaviy Xabar ---
+
+async def broadcast_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not is_admin(update.effective_chat.id): return ConversationHandler.END
+    await update.message.reply_text(
+        "📨 Barcha sotuvchilarga yuboriladigan xabar matnini kiriting:",
+        reply_markup=ReplyKeyboardRemove()
+    )
+    return BROADCAST_TEXT
+
+async def broadcast_send(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not is_admin(update.effective_chat.id): return ConversationHandler.END
+
+    broadcast = create_broadcast(update.message.text, update.effective_chat.id)
+    if not broadcast:
+        await update.message.reply_text("Xabarni saqlashda xatolik yuz berdi. Keyinroq urinib ko'ring.")
+        return ADMIN_MENU
+
+    status_message = await update.message.reply_text("📨 Xabar yuborish boshlandi...")
+    broadcast['status_message_id'] = status_message.message_id
+    update_broadcast(broadcast['id'], status_message_id=status_message.message_id)
+
+    # Yuborish fonda davom etadi, admin bot bilan ishlashda davom etishi mumkin
+    context.application.create_task(run_broadcast(context.bot, broadcast))
+    await update.message.reply_text("Asosiy menyu: /mahsulot, /sotuvchi")
+    return ADMIN_MENU
+
 # --- Admin Sotuvchi Detal Menyusi ---
 
 async def show_seller_detail_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
 
-    # Agar Message Handler orqali kelsa (sotuvchi tanlansa)
-    if update.message and update.message.text:
-        selected_seller_name = update.message.text
-        seller_id_map = context.user_data.get('seller_names_to_id', {})
-        selected_seller_id = seller_id_map.get(selected_seller_name)
-        
-        if selected_seller_id:
-            context.user_data['selected_seller_id'] = selected_seller_id
-            context.user_data['selected_seller_name'] = selected_seller_name
-    
-    selected_seller_name = context.user_data.get('selected_seller_name', 'Tanlanmagan Sotuvchi')
+    # Sotuvchi inline ro'yxatdan (select_seller_callback) tanlanadi
+    selected_seller_name = get_selected_seller_name(context) or 'Tanlanmagan Sotuvchi'
     
     if selected_seller_name == 'Tanlanmagan Sotuvchi':
-        await update.message.reply_text("Iltimos, avval ro'yxatdan sotuvchini tanlang.")
+        await update.effective_message.reply_text("Iltimos, avval ro'yxatdan sotuvchini tanlang.")
         return ADMIN_MENU
 
     keyboard = [
         [KeyboardButton("Mahsulotlar va Qarzdorlik"), KeyboardButton("Yangi Tovar Berish")],
-        [KeyboardButton("Sotuvchi Paroli")],
+        [KeyboardButton("Sotuvchi Paroli"), KeyboardButton("/davr")],
         [KeyboardButton("/sotuvchi_orqaga_detal")] 
     ]
 
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
     
-    await update.message.reply_text(
+    await update.effective_message.reply_text(
         f"👤 **{selected_seller_name}** uchun boshqaruv menyusi:",
         reply_markup=reply_markup,
         parse_mode='Markdown'
@@ -306,27 +702,17 @@ async def start_new_inventory(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
     
     selected_seller_id = context.user_data.get('selected_seller_id')
-    selected_seller_name = context.user_data.get('selected_seller_name')
+    selected_seller_name = get_selected_seller_name(context)
 
     if not selected_seller_id:
         await update.message.reply_text("Avval sotuvchini tanlang.")
         return ADMIN_MENU
 
-    products = get_all_products()
-    if not products:
-        await update.message.reply_text("Bazada mahsulotlar mavjud emas. Avval mahsulot kiriting.")
+    reply_markup = get_picker_page('prod')
+    if not reply_markup:
+        await update.message.reply_text(UNAVAILABLE_TEXT if db_unavailable() else "Bazada mahsulotlar mavjud emas. Avval mahsulot kiriting.")
         return ADMIN_MENU
 
-    inline_keyboard = []
-    for i in range(0, len(products), 2):
-        row = []
-        for product in products[i:i+2]:
-             callback_data = f"prod:{product['id']}"
-             row.append(InlineKeyboardButton(product['nomi'], callback_data=callback_data))
-        inline_keyboard.append(row)
-
-    reply_markup = InlineKeyboardMarkup(inline_keyboard)
-    
     await update.message.reply_text(
         f"➡️ **{selected_seller_name}** uchun qaysi **mahsulot**ni berasiz?",
         reply_markup=reply_markup,
@@ -356,7 +742,7 @@ async def finalize_inventory_count(update: Update, context: ContextTypes.DEFAULT
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
     
     selected_seller_id = context.user_data.get('selected_seller_id')
-    selected_seller_name = context.user_data.get('selected_seller_name')
+    selected_seller_name = get_selected_seller_name(context)
     product_id = context.user_data.get('temp_product_id')
     
     try:
@@ -366,12 +752,17 @@ async def finalize_inventory_count(update: Update, context: ContextTypes.DEFAULT
         await update.message.reply_text("Noto'g'ri qiymat. Iltimos, musbat butun son kiriting.")
         return AWAITING_PRODUCT_COUNT
 
-    success, product_name, total_price = add_inventory(selected_seller_id, product_id, count)
+    success, product_name, total_price, queued = add_inventory(selected_seller_id, product_id, count)
     
     if success:
+        mark_debt_report_stale(selected_seller_id)
         formatted_price = get_formatted_price(total_price)
+        title = (
+            "⏳ Baza vaqtincha ishlamayapti. Tovar berish navbatga yozildi va baza tiklanishi bilan saqlanadi."
+            if queued else "✅ Tovar muvaffaqiyatli berildi!"
+        )
         await update.message.reply_text(
-            f"✅ Tovar muvaffaqiyatli berildi!\n\n"
+            f"{title}\n\n"
             f"👤 Sotuvchi: **{selected_seller_name}**\n"
             f"📦 Mahsulot: **{product_name}**\n"
             f"🔢 Soni: **{count} dona**\n"
@@ -390,46 +781,25 @@ async def show_seller_debt(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if not is_admin(update.effective_chat.id): return ConversationHandler.END
     
     selected_seller_id = context.user_data.get('selected_seller_id')
-    selected_seller_name = context.user_data.get('selected_seller_name')
+    selected_seller_name = get_selected_seller_name(context)
 
     if not selected_seller_id:
         await update.message.reply_text("Avval sotuvchini tanlang.")
         return ADMIN_MENU
 
-    total_debt, items = get_seller_debt_details(selected_seller_id)
-
-    formatted_debt = get_formatted_price(total_debt)
-    
-    text = f"💰 **{selected_seller_name}** uchun qarzdorlik hisoboti:\n\n"
-    text += f"**💳 JAMI QARZDORLIK: {formatted_debt} so'm**\n"
-    text += "--------------------------------------\n"
-    
-    if not items:
-        text += "📦 Sotuvchiga hali hech qanday tovar berilmagan."
-    else:
-        text += "📦 **Berilgan Tovarlar Ro'yxati:**\n\n"
-        
-        # Xabarni 15 tadan bo'lib yuborish
-        chunk_size = 15
-        
-        # Barcha qismlarni yig'amiz
-        all_item_texts = []
-        for item in items:
-            all_item_texts.append(
-                f"▪️ **{item['mahsulot_nomi']}**\n"
-                f"   Soni: {item['soni']} dona\n"
-                f"   Narxi: {get_formatted_price(item['jami_narxi'])} so'm\n"
-                f"   Sana: {item['sana']}\n"
-            )
-        
-        # Jami qarzdorlik hisoboti
-        await update.message.reply_text(text, parse_mode='Markdown')
-        
-        # Har bir bo'lakni yuborish
-        for i in range(0, len(all_item_texts), chunk_size):
-            chunk_text = "\n".join(all_item_texts[i:i + chunk_size])
-            await update.message.reply_text(f"**Tovarlar ro'yxati (davomi):**\n\n{chunk_text}", parse_mode='Markdown')
-
+    total_debt, item_texts = get_debt_report(selected_seller_id)
+    if not item_texts and db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return await show_seller_detail_menu(update, context)
+
+    await send_debt_report(
+        update,
+        f"💰 **{selected_seller_name}** uchun qarzdorlik hisoboti:\n\n"
+        f"**💳 JAMI QARZDORLIK: {get_formatted_price(total_debt)} so'm**\n",
+        item_texts,
+        empty_text="📦 Sotuvchiga hali hech qanday tovar berilmagan.",
+        list_title="📦 **Berilgan Tovarlar Ro'yxati:**\n\n"
+    )
 
     return await show_seller_detail_menu(update, context)
 
@@ -439,67 +809,237 @@ async def show_my_debt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     chat_id = update.effective_chat.id
     seller_id = get_seller_id_by_chat_id(chat_id)
     
+    if not seller_id and db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return SELLER_MENU
+
     if not seller_id:
         await update.message.reply_text("Tizimda profilingiz topilmadi. /start orqali qayta urinib ko'ring.")
         return ConversationHandler.END
 
-    total_debt, items = get_seller_debt_details(seller_id)
-
-    formatted_debt = get_formatted_price(total_debt)
-    
-    text = f"💰 **Sizning Qarzdorlik Hisobotingiz:**\n\n**💳 JAMI QARZDORLIK: {formatted_debt} so'm**\n"
-    
-    if not items:
-        text += "--------------------------------------\n📦 Sizga hali tovar berilmagan."
-    else:
-        text += "--------------------------------------\n📦 **Olingan Tovarlar Ro'yxati:**\n\n"
-        
-        # Xabarni 15 tadan bo'lib yuborish
-        chunk_size = 15
-        
-        # Barcha qismlarni yig'amiz
-        all_item_texts = []
-        for item in items:
-            all_item_texts.append(
-                f"▪️ **{item['mahsulot_nomi']}**\n"
-                f"   Soni: {item['soni']} dona\n"
-                f"   Narxi: {get_formatted_price(item['jami_narxi'])} so'm\n"
-                f"   Sana: {item['sana']}\n"
-            )
-        
-        # Jami qarzdorlik hisoboti
-        await update.message.reply_text(text, parse_mode='Markdown')
-        
-        # Har bir bo'lakni yuborish
-        for i in range(0, len(all_item_texts), chunk_size):
-            chunk_text = "\n".join(all_item_texts[i:i + chunk_size])
-            await update.message.reply_text(f"**Tovarlar ro'yxati (davomi):**\n\n{chunk_text}", parse_mode='Markdown')
+    total_debt, item_texts = get_debt_report(seller_id)
+    if not item_texts and db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return SELLER_MENU
+
+    await send_debt_report(
+        update,
+        f"💰 **Sizning Qarzdorlik Hisobotingiz:**\n\n"
+        f"**💳 JAMI QARZDORLIK: {get_formatted_price(total_debt)} so'm**\n",
+        item_texts,
+        empty_text="📦 Sizga hali tovar berilmagan.",
+        list_title="📦 **Olingan Tovarlar Ro'yxati:**\n\n"
+    )
 
     return SELLER_MENU 
 
+def seller_entry(callback):
+    """
+    Suhbat tashqarisidan (entry point) kirish: faqat ro'yxatdan o'tgan sotuvchi o'tkaziladi.
+    SELLER_MENU ichida rol /start da tekshirilgan, u yerda callback o'zi ishlatiladi.
+    """
+    @wraps(callback)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        role = get_user_role(update.effective_chat.id)
+        if role == ROLE_UNAVAILABLE:
+            await update.message.reply_text(UNAVAILABLE_TEXT)
+            return ConversationHandler.END
+        if role != 'sotuvchi':
+            await update.message.reply_text("Bu bo'lim faqat sotuvchilar uchun. /start orqali tizimga kiring.")
+            return ConversationHandler.END
+        return await callback(update, context)
+    return wrapper
+
+# Telegram xabar chegarasi 4096 belgi; qolgan mahsulotlar bitta qator bilan jamlanadi
+HOLDINGS_MESSAGE_LIMIT = 3800
+
 async def show_seller_products(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    products = get_all_products()
-    if not products:
-        await update.message.reply_text("Bazada hozircha mahsulotlar mavjud emas.")
-    else:
-        product_list_text = "📦 **Mahsulotlarning Jami Ro'yxati:**\n\n"
-        for idx, product in enumerate(products):
-            product_list_text += f"{idx+1}. **{product['nomi']}** (Narxi: {get_formatted_price(product['narxi'])} so'm)\n"
-        await update.message.reply_text(product_list_text, parse_mode='Markdown')
+    """Sotuvchining o'z qoldig'i: mahsulot bo'yicha jami dona va qiymat (bitta xabarda)."""
+    seller_id = get_seller_id_by_chat_id(update.effective_chat.id)
+    holdings = get_seller_holdings(seller_id) if seller_id else None
+
+    if holdings is None and db_unavailable():
+        await update.message.reply_text(UNAVAILABLE_TEXT)
+        return SELLER_MENU
+    if not seller_id:
+        await update.message.reply_text("Tizimda profilingiz topilmadi. /start orqali qayta urinib ko'ring.")
+        return ConversationHandler.END
+    if holdings is None:
+        await update.message.reply_text("Ma'lumotni olishda xato yuz berdi. Iltimos, keyinroq urinib ko'ring.")
+        return SELLER_MENU
+    if not holdings:
+        await update.message.reply_text("📦 Sizga hali tovar berilmagan.")
+        return SELLER_MENU
+
+    total_value = sum(float(row['jami_narxi']) for row in holdings)
+    text = (
+        f"📦 **Mahsulotlarim:**\n\n"
+        f"**💳 Jami qiymat: {get_formatted_price(total_value)} so'm**\n"
+        "--------------------------------------\n"
+    )
+    for idx, row in enumerate(holdings):
+        line = f"{idx+1}. **{row['nomi']}** - {row['soni']} dona, {get_formatted_price(row['jami_narxi'])} so'm\n"
+        if len(text) + len(line) > HOLDINGS_MESSAGE_LIMIT:
+            rest = holdings[idx:]
+            text += (
+                f"... va yana {len(rest)} ta mahsulot "
+                f"({get_formatted_price(sum(float(r['jami_narxi']) for r in rest))} so'm)\n"
+            )
+            break
+        text += line
+    await update.message.reply_text(text, parse_mode='Markdown')
     return SELLER_MENU 
 
+# --- Davr bo'yicha hisobot (admin va sotuvchi) ---
+
+async def range_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/davr - davr tanlash tugmalari; /davr YYYY-MM-DD [YYYY-MM-DD] - ixtiyoriy oraliq."""
+    if context.args:
+        bounds = parse_custom_range(context.args)
+        if not bounds:
+            await update.message.reply_text("Sana noto'g'ri. Masalan: /davr 2026-01-01 2026-01-31")
+            return None
+        start, end = bounds
+        label = f"{start:%Y-%m-%d} - {end - timedelta(days=1):%Y-%m-%d}"
+        await send_range_report(update, context, start, end, label)
+        return None
+
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton(label, callback_data=f"rng:{period}") for period, label in RANGE_PERIODS.items()
+    ]])
+    scope = ""
+    if is_admin(update.effective_chat.id):
+        # Tanlangan sotuvchi sotuvchilar bo'limiga qaytilganda tozalanadi
+        scope = (f"👤 {get_selected_seller_name(context)}\n" if context.user_data.get('selected_seller_id')
+                 else "👥 Barcha sotuvchilar\n")
+    await update.message.reply_text(
+        f"{scope}📅 Davrni tanlang (yoki oraliq kiriting: /davr 2026-01-01 2026-01-31):",
+        reply_markup=keyboard
+    )
+    # None: joriy suhbat holati o'zgarmaydi
+    return None
+
+async def range_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    period = query.data.split(':')[1]
+    start, end = period_bounds(period)
+    await send_range_report(update, context, start, end, RANGE_PERIODS[period])
+    return None
+
 # --- 4. Botni ishga tushirish (Long Polling Konfiguratsiyasi) ---
 
 if not TOKEN:
-    print("!!! KRITIK XATO: BOT_TOKEN muhit o'zgaruvchisi topilmadi.", file=sys.stderr)
+    logger.critical("BOT_TOKEN muhit o'zgaruvchisi topilmadi.")
     sys.exit(1)
 
+async def journal_replay_loop() -> None:
+    """
+    Baza tiklanganda jurnaldagi tovar berishlarni tartib bilan bazaga yozadi. Har qadamda bitta
+    partiya alohida oqimda yoziladi - event loop (foydalanuvchi update lari) bloklanmaydi.
+    Partiya yozilib, jurnalda yana yozuv qolsa keyingi partiya kutmasdan olinadi.
+    """
+    while True:
+        replayed = None
+        if await asyncio.to_thread(journal.has_pending):
+            replayed = await asyncio.to_thread(replay_inventory_journal, max_batches=1)
+            if replayed:
+                logger.info(f"Jurnaldan {replayed} ta tovar berish bazaga yozildi.")
+        if replayed is not None and await asyncio.to_thread(journal.has_pending):
+            await asyncio.sleep(0)  # boshqa vazifalarga navbat berib, keyingi partiya
+        else:
+            await asyncio.sleep(JOURNAL_REPLAY_INTERVAL)
+
+async def maintain_inventory_partitions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Kelgusi oylar uchun inventory bo'limlari oldindan tayyor turishi uchun (har kuni)."""
+    ensure_inventory_partitions()
+
+def flush_caches() -> None:
+    """Barcha keshlarni tozalaydi (kesh xabarlari o'tkazib yuborilgan bo'lishi mumkin bo'lganda)."""
+    invalidate_picker('sel')
+    invalidate_picker('prod')
+    invalidate_debt_report()
+    invalidate_product_snapshot()
+
+def on_cache_event(payload: str) -> None:
+    """
+    db.CACHE_CHANNEL xabari: 'products', 'sellers', 'inventory:<seller_id>[:<id>]' yoki 'inventory'.
+    INSERT xabari so'rov boshiga bitta: <id> - shu sotuvchining eng kichik yangi yozuvi.
+    """
+    kind, _, key = payload.partition(':')
+    seller_key, _, inventory_id = key.partition(':')
+    if kind == 'products':
+        invalidate_picker('prod')
+        invalidate_product_snapshot()
+    elif kind == 'sellers':
+        invalidate_picker('sel')
+    elif kind == 'inventory' and seller_key.isdigit() and inventory_id.isdigit():
+        note_inventory_insert(int(seller_key), int(inventory_id))
+    elif kind == 'inventory':
+        invalidate_debt_report(int(seller_key) if seller_key.isdigit() else None)
+    else:
+        flush_caches()
+
+async def post_init(application: Application) -> None:
+    """Polling boshlanishidan oldin fon vazifalarini ishga tushiradi."""
+    application.create_task(journal_replay_loop())
+    application.create_task(cache_events.listen(on_cache_event, flush_caches))
+    application.job_queue.run_repeating(evict_idle_users, interval=USER_STATE_TTL / 4, first=USER_STATE_TTL / 4)
+    application.job_queue.run_repeating(maintain_inventory_partitions, interval=24 * 60 * 60, first=60)
+    await resume_broadcasts(application)
+
+# --- Tracing (har bir update uchun) ---
+
+class TracingUpdateProcessor(ChatOrderedUpdateProcessor):
+    """Chat bo'yicha tartibli processor; har bir update alohida trace ichida (tracing.py)."""
+
+    async def run_update(self, update: object, coroutine) -> None:
+        chat_id = update_id = None
+        if isinstance(update, Update):
+            update_id = update.update_id
+            chat_id = update.effective_chat.id if update.effective_chat else None
+        with tracing.trace("update", chat_id=chat_id, update_id=update_id):
+            await coroutine
+
+class TracingRequest(HTTPXRequest):
+    """Telegram Bot API ga har bir so'rovni "tg.<metod>" span sifatida yozadi."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # URL ichida token bor, shuning uchun faqat metod nomi olinadi
+        with tracing.span(f"tg.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
+
+def trace_handler_callbacks(handlers: list) -> None:
+    for handler in handlers:
+        handler.callback = tracing.traced_async(f"handler.{handler.callback.__name__}")(handler.callback)
+
 # !!! application Obyektini GLOBAL darajada saqlaymiz !!!
-application = Application.builder().token(TOKEN).concurrent_updates(True).build()
+application = (
+    Application.builder()
+    .token(TOKEN)
+    .base_url(BOT_API_BASE_URL)
+    .concurrent_updates(TracingUpdateProcessor())
+    # Qabul chegarasi: ishlanayotgan update lar MAX_PENDING_UPDATES dan oshsa getUpdates kutadi
+    .update_queue(BoundedUpdateQueue())
+    .request(TracingRequest(connection_pool_size=256))
+    .post_init(post_init)
+    .build()
+)
 
-# Konversiya Handlerni yaratish (O'zgartirishsiz)
+# Konversiya Handlerni yaratish
 conv_handler = ConversationHandler(
-    entry_points=[CommandHandler("start", start_command)],
+    entry_points=[
+        CommandHandler("start", start_command),
+        # Suhbat vaqti tugagandan keyin ham menyu tugmalari ishlashda davom etadi
+        CommandHandler("mahsulot", mahsulot_command),
+        CommandHandler("sotuvchi", sotuvchi_command),
+        CommandHandler("xabar", broadcast_start),
+        CommandHandler("davr", range_command),
+        CallbackQueryHandler(range_callback, pattern=r'^rng:(today|week|month)$'),
+        # Suhbatdan tashqarida bosilgan sotuvchi tugmalari: avval rol tekshiriladi
+        MessageHandler(filters.Text("Qarzdorligim"), seller_entry(show_my_debt)),
+        MessageHandler(filters.Text("Mahsulotlarim"), seller_entry(show_seller_products)),
+    ],
     states={
         AWAITING_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_password)],
         
@@ -508,7 +1048,15 @@ conv_handler = ConversationHandler(
             CommandHandler("mahsulot", mahsulot_command),
             MessageHandler(filters.Text("Mahsulotlar"), show_all_products),
             MessageHandler(filters.Text("Yangi mahsulot kiritish"), new_product_start),
+            MessageHandler(filters.Text("Omborga kirim"), stock_receipt_start),
             
+            # Ommaviy xabar
+            CommandHandler("xabar", broadcast_start),
+
+            # Davr bo'yicha hisobot
+            CommandHandler("davr", range_command),
+            CallbackQueryHandler(range_callback, pattern=r'^rng:(today|week|month)$'),
+
             # Sotuvchi
             CommandHandler("sotuvchi", sotuvchi_command),
             MessageHandler(filters.Text("Sotuvchilar"), sellers_menu),
@@ -527,7 +1075,9 @@ conv_handler = ConversationHandler(
             CommandHandler("sotuvchi_orqaga", sotuvchi_command),
             CommandHandler("sotuvchi_orqaga_detal", sellers_menu),
 
-            # Sotuvchi ismini tanlash (show_all_sellersdan keyin)
+            # Sotuvchini inline ro'yxatdan tanlash (show_all_sellersdan keyin)
+            CallbackQueryHandler(picker_page_callback, pattern=r'^selpg:\d+$'),
+            CallbackQueryHandler(select_seller_callback, pattern=r'^sel:\d+$'),
             MessageHandler(
                 filters.TEXT & ~filters.COMMAND & filters.UpdateType.MESSAGE,
                 show_seller_detail_menu
@@ -541,30 +1091,53 @@ conv_handler = ConversationHandler(
         NEW_SELLER_MAHALLA: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_new_seller_mahalla)],
         NEW_SELLER_PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_new_seller_phone)],
         NEW_SELLER_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_new_seller_password)],
+        BROADCAST_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, broadcast_send)],
         
         # Tovar Berish mantiqi
-        AWAITING_PRODUCT_SELECTION: [CallbackQueryHandler(select_product_callback)],
+        AWAITING_PRODUCT_SELECTION: [
+            CallbackQueryHandler(picker_page_callback, pattern=r'^prodpg:\d+$'),
+            CallbackQueryHandler(select_product_callback)
+        ],
         AWAITING_PRODUCT_COUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, finalize_inventory_count)],
+
+        # Omborga kirim
+        STOCK_PRODUCT_SELECTION: [
+            CallbackQueryHandler(picker_page_callback, pattern=r'^prodpg:\d+$'),
+            CallbackQueryHandler(select_stock_product_callback, pattern=r'^prod:\d+$')
+        ],
+        STOCK_COUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, finalize_stock_receipt)],
         
         # Sotuvchi Menyusi
         SELLER_MENU: [
             MessageHandler(filters.Text("Qarzdorligim"), show_my_debt),
-            MessageHandler(filters.Text("Mahsulotlarim"), show_seller_products) 
-        ]
+            MessageHandler(filters.Text("Mahsulotlarim"), show_seller_products),
+            CommandHandler("davr", range_command),
+            CallbackQueryHandler(range_callback, pattern=r'^rng:(today|week|month)$')
+        ],
+
+        ConversationHandler.TIMEOUT: [TypeHandler(Update, on_conversation_timeout)]
     },
     fallbacks=[CommandHandler("start", start_command)],
+    conversation_timeout=CONVERSATION_TIMEOUT,
 )
 
+trace_handler_callbacks(conv_handler.entry_points + conv_handler.fallbacks)
+for state_handlers in conv_handler.states.values():
+    trace_handler_callbacks(state_handlers)
+
+if recorder.is_enabled():
+    application.add_handler(TypeHandler(Update, record_update), group=-2)
+application.add_handler(TypeHandler(Update, bind_request_context), group=-1)
 application.add_handler(conv_handler)
 
 
 # --- ASOSIY ISHGA TUSHIRISH FUNKSIYASI ---
 async def main() -> None:
     """Server.py tomonidan chaqiriladigan asosiy asinxron bot funksiyasi (Long Polling)."""
-    print("🤖 [INIT] Bot asosiy jarayoni (Long Polling) ishga tushirildi.")
+    logger.info("[INIT] Bot asosiy jarayoni (Long Polling) ishga tushirildi.")
     # Webhookni to'liq o'chirib tashlaymiz
     await application.bot.delete_webhook()
-    print("✅ Telegram Webhook o'chirildi.")
+    logger.info("Telegram Webhook o'chirildi.")
     
     # !!! MUHIM O'ZGARTIRISH: Loopni yopish xatosini keltirib chiqarishi mumkin bo'lgan
     # await asyncio.sleep(1) funksiyasi olib tashlandi.
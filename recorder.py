@@ -0,0 +1,100 @@
+# recorder.py
+# Kiruvchi Update larni vaqt belgisi bilan faylga yozish (ixtiyoriy, UPDATE_RECORD_PATH o'rnatilsa).
+# Yozuvlar replay.py orqali lokal muhitda qayta o'ynatiladi.
+# record() faqat navbatga qo'yadi: faylga yozish va gzip bilan aylantirish alohida threadda
+# (logs.py dagi kabi QueueListener), event loop diskni kutmaydi. Navbat to'lsa update yozilmaydi.
+# DIQQAT: yozuvlarda foydalanuvchi xabarlari (jumladan, kiritilgan parollar) bo'ladi -
+# fayllarni faqat ishonchli joyda saqlang.
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+from logging.handlers import RotatingFileHandler
+
+from logs import DroppingQueueHandler, DrainingQueueListener
+
+UPDATE_RECORD_PATH = os.getenv("UPDATE_RECORD_PATH")
+UPDATE_RECORD_MAX_BYTES = int(os.getenv("UPDATE_RECORD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPDATE_RECORD_BACKUPS = int(os.getenv("UPDATE_RECORD_BACKUPS", "5"))
+UPDATE_RECORD_QUEUE_SIZE = int(os.getenv("UPDATE_RECORD_QUEUE_SIZE", "10000"))
+
+_logger = None
+_listener = None
+_queue_handler = None
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Aylantirilgan (rotate) faylni siqib saqlaydi: updates.jsonl -> updates.jsonl.1.gz"""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def is_enabled() -> bool:
+    return bool(UPDATE_RECORD_PATH)
+
+
+def _get_logger() -> logging.Logger:
+    global _logger, _listener, _queue_handler
+    if _logger is None:
+        handler = RotatingFileHandler(
+            UPDATE_RECORD_PATH, maxBytes=UPDATE_RECORD_MAX_BYTES, backupCount=UPDATE_RECORD_BACKUPS, encoding='utf-8'
+        )
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _gzip_rotator
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=UPDATE_RECORD_QUEUE_SIZE))
+        # To'la navbatda ham close() yiqilmaydi (logs.py dagi listener bilan bir xil)
+        _listener = DrainingQueueListener(_queue_handler.queue, handler)
+        _listener.start()
+        atexit.register(close)
+
+        _logger = logging.getLogger("update_recorder")
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        _logger.addHandler(_queue_handler)
+    return _logger
+
+
+def close() -> None:
+    """Navbatdagi yozuvlarni faylga chiqarib, yozuvchi threadni to'xtatadi."""
+    global _logger, _listener, _queue_handler
+    if _listener is None: return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _logger.removeHandler(_queue_handler)
+    _logger = _listener = _queue_handler = None
+
+
+def dropped() -> int:
+    """Navbat to'lgani uchun yozilmagan update lar soni."""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def record(update_json: str) -> None:
+    """Bitta qator: {"t": <unix vaqt>, "u": <Update JSON>}"""
+    _get_logger().info('{"t":%.3f,"u":%s}', time.time(), update_json)
+
+
+def read_recording(paths: list) -> list:
+    """Bir yoki bir nechta yozuv faylini (.jsonl yoki .jsonl.N.gz) o'qib, vaqt bo'yicha tartiblaydi."""
+    entries = []
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line: continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Jarayon yozish o'rtasida to'xtagan bo'lsa, oxirgi qator chala bo'lishi mumkin
+                    continue
+    entries.sort(key=lambda entry: entry['t'])
+    return entries
@@ -0,0 +1,228 @@
+# replay.py
+# recorder.py yozgan Update larni lokal muhitda qayta o'ynatish (regression test uchun).
+#
+#   python replay.py run updates.jsonl [updates.jsonl.1.gz ...] --database-url postgresql://.../scratch \
+#       --speed 10 --out report_new.json
+#   python replay.py diff report_old.json report_new.json
+#
+# `run` Bot API o'rniga lokal stub server ko'taradi (hech narsa Telegramga yuborilmaydi) va
+# bot kodini ko'rsatilgan vaqtinchalik (scratch) bazaga ulaydi. Har bir update uchun handler
+# kechikishi va xatolari hisobotga yoziladi; `diff` ikki kod versiyasining hisobotlarini solishtiradi.
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+REPLAY_TOKEN = "123456:REPLAY"
+
+
+# --- Bot API stub ---
+
+class StubBotAPIHandler(BaseHTTPRequestHandler):
+    """Har qanday Bot API metodiga muvaffaqiyatli (ok=true) javob qaytaradi."""
+
+    calls = Counter()
+    _message_ids = iter(range(1, 10 ** 9))
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        method = self.path.rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        params = {key: values[0] for key, values in parse_qs(body).items()}
+
+        with self._lock:
+            self.calls[method] += 1
+            message_id = next(self._message_ids)
+
+        if method == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "Replay", "username": "replay_bot"}
+        elif method in ('sendMessage', 'editMessageText', 'editMessageReplyMarkup'):
+            # PTB satr parametrlarni o'zicha, qolganlarini JSON ko'rinishida yuboradi
+            try:
+                chat_id = int(params.get('chat_id', '0'))
+            except ValueError:
+                chat_id = 0
+            result = {
+                "message_id": int(params.get('message_id', message_id)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get('text', ""),
+            }
+        else:
+            result = True
+
+        payload = json.dumps({"ok": True, "result": result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        return
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubBotAPIHandler)
+    threading.Thread(target=server.serve_forever, name="StubBotAPI", daemon=True).start()
+    return server
+
+
+# --- Replay ---
+
+def _percentile(values: list, q: float) -> float:
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary(results: dict) -> dict:
+    latencies = [r['latency_ms'] for r in results.values()]
+    return {
+        'count': len(results),
+        'errors': sum(1 for r in results.values() if r['error']),
+        'p50_ms': round(_percentile(latencies, 0.50), 3),
+        'p95_ms': round(_percentile(latencies, 0.95), 3),
+        'p99_ms': round(_percentile(latencies, 0.99), 3),
+        'max_ms': round(max(latencies, default=0.0), 3),
+    }
+
+
+async def _replay(entries: list, speed: float or None, application=None) -> dict:
+    """Update larni `application` ga (berilmasa - main.application) yozilgan tartib va tezlikda beradi."""
+    from telegram import Update
+    if application is None:
+        # main faqat muhit o'zgaruvchilari o'rnatilgandan keyin import qilinadi
+        from main import application
+
+    results = {}
+    errors = {}
+
+    async def capture_error(update, context) -> None:
+        if isinstance(update, Update):
+            errors[update.update_id] = f"{type(context.error).__name__}: {context.error}"
+
+    application.add_error_handler(capture_error)
+    await application.initialize()
+    await application.start()
+
+    async def run_one(update) -> None:
+        start = time.perf_counter()
+        await application.update_processor.process_update(update, application.process_update(update))
+        results[update.update_id] = {
+            'chat_id': update.effective_chat.id if update.effective_chat else None,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+            'error': None,
+        }
+
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    first_t = entries[0]['t'] if entries else 0.0
+    tasks = []
+    for entry in entries:
+        if speed:
+            delay = (entry['t'] - first_t) / speed - (loop.time() - started_at)
+            if delay > 0: await asyncio.sleep(delay)
+        update = Update.de_json(entry['u'], application.bot)
+        tasks.append(asyncio.create_task(run_one(update)))
+        # Vazifalar kelish tartibida boshlansin (bir chat xabarlari tartibi saqlanadi)
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*tasks)
+    wall_seconds = loop.time() - started_at
+
+    await application.stop()
+    await application.shutdown()
+
+    for update_id, error in errors.items():
+        if update_id in results: results[update_id]['error'] = error
+    return {'results': results, 'wall_seconds': round(wall_seconds, 3)}
+
+
+def run_command(args) -> int:
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['DATABASE_REPLICA_URL'] = ""
+    os.environ['BOT_TOKEN'] = REPLAY_TOKEN
+    os.environ.pop('UPDATE_RECORD_PATH', None)
+
+    server = start_stub_server()
+    os.environ['BOT_API_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/bot"
+
+    from logs import setup_logging
+    from recorder import read_recording
+
+    setup_logging(stream=sys.stderr)
+    entries = read_recording(args.recordings)
+    if not entries:
+        print("Yozuvlarda update topilmadi.", file=sys.stderr)
+        return 1
+
+    speed = None if args.speed == 'max' else float(args.speed)
+    outcome = asyncio.run(_replay(entries, speed))
+    server.shutdown()
+
+    report = {
+        'recordings': args.recordings,
+        'speed': args.speed,
+        'wall_seconds': outcome['wall_seconds'],
+        'summary': _summary(outcome['results']),
+        'bot_api_calls': dict(StubBotAPIHandler.calls),
+        'updates': {str(update_id): r for update_id, r in sorted(outcome['results'].items())},
+    }
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+
+    print(json.dumps(report['summary'], indent=1))
+    print(f"Hisobot: {args.out}")
+    return 0
+
+
+def diff_command(args) -> int:
+    with open(args.old, encoding='utf-8') as f: old = json.load(f)
+    with open(args.new, encoding='utf-8') as f: new = json.load(f)
+
+    print(f"{'':10} {'eski':>12} {'yangi':>12} {'farq':>12}")
+    for key in ('count', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'):
+        a, b = old['summary'][key], new['summary'][key]
+        print(f"{key:10} {a:>12} {b:>12} {round(b - a, 3):>+12}")
+
+    old_errors = {k: v['error'] for k, v in old['updates'].items() if v['error']}
+    new_errors = {k: v['error'] for k, v in new['updates'].items() if v['error']}
+    added = sorted(set(new_errors) - set(old_errors), key=int)
+    fixed = sorted(set(old_errors) - set(new_errors), key=int)
+    changed = sorted((k for k in set(old_errors) & set(new_errors) if old_errors[k] != new_errors[k]), key=int)
+
+    for title, keys, source in (("Yangi xatolar", added, new_errors), ("Tuzatilgan xatolar", fixed, old_errors),
+                                ("O'zgargan xatolar", changed, new_errors)):
+        if not keys: continue
+        print(f"\n{title} ({len(keys)}):")
+        for key in keys:
+            print(f"  update {key}: {source[key]}")
+
+    # Yangi xato paydo bo'lsa, CI da muvaffaqiyatsiz deb belgilanadi
+    return 1 if added else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Yozib olingan Update larni qayta o'ynatish")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Yozuvni stub Bot API va scratch bazaga qarshi o'ynatish")
+    run_parser.add_argument('recordings', nargs='+')
+    run_parser.add_argument('--database-url', required=True, help="Vaqtinchalik (scratch) baza - ishchi baza emas!")
+    run_parser.add_argument('--speed', default='1', choices=['1', '10', 'max'])
+    run_parser.add_argument('--out', default='replay_report.json')
+
+    diff_parser = subparsers.add_parser('diff', help="Ikki hisobotni solishtirish")
+    diff_parser.add_argument('old')
+    diff_parser.add_argument('new')
+
+    args = parser.parse_args()
+    sys.exit(run_command(args) if args.command == 'run' else diff_command(args))
@@ -4,18 +4,23 @@ import threading
 import asyncio
 import signal
 import time
+import json
+import hmac
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 from logging import getLogger
 
-# Loggingni sozlash
-import logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Loggingni sozlash (JSON, navbat orqali - logs.py)
+from logs import setup_logging, stats as logs_stats
+setup_logging()
 logger = getLogger("server")
 
 # main.py dan Application va main funksiyalarini import qilamiz
 try:
     # main.py da 'application' obyektining GLOBAL e'lon qilinganligi muhim!
     from main import main, application 
+    import tracing
+    import recorder
 except ImportError as e:
     logger.error(f"!!! KRITIK XATO: main.py fayli topilmadi yoki import qilinmadi: {e}")
     sys.exit(1)
@@ -24,6 +29,8 @@ except ImportError as e:
 HOST = '0.0.0.0'
 # Render talab qiladigan port
 PORT = int(os.getenv("PORT", 10000)) 
+# /debug/... endpointlari faqat shu token bilan ochiladi (o'rnatilmasa - o'chirilgan)
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN")
 
 # --- Global O'zgaruvchilar ---
 httpd = None
@@ -117,9 +124,55 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
         if message:
             self.wfile.write(message.encode('utf-8'))
     
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _debug_traces(self, query):
+        """/debug/traces?token=...&chat_id=...&min_ms=...&limit=..."""
+        try:
+            chat_id = int(query['chat_id'][0]) if 'chat_id' in query else None
+            min_ms = float(query.get('min_ms', ['0'])[0])
+            limit = int(query.get('limit', ['100'])[0])
+        except ValueError:
+            self._send_response(400, 'chat_id, min_ms va limit son bo\'lishi kerak')
+            return
+        self._send_json(200, tracing.get_traces(chat_id=chat_id, min_duration_ms=min_ms, limit=limit))
+
+    def _debug_queues(self, query):
+        """/debug/queues?token=...&top=... - chatlar bo'yicha update navbatlari (chat_processor.py)"""
+        try:
+            top = int(query.get('top', ['20'])[0])
+        except ValueError:
+            self._send_response(400, 'top son bo\'lishi kerak')
+            return
+        payload = application.update_processor.queue_depths(top=top)
+        payload['update_queue'] = {'queued': application.update_queue.qsize(), 'in_flight': application.update_queue.in_flight()}
+        payload['log_queue'] = logs_stats()
+        if recorder.is_enabled():
+            payload['update_recorder_dropped'] = recorder.dropped()
+        self._send_json(200, payload)
+
     def do_GET(self):
-        if self.path == '/health':
+        url = urlparse(self.path)
+        if url.path == '/health':
             self._send_response(200, 'OK')
+        elif url.path.startswith('/debug/') and DEBUG_TOKEN:
+            query = parse_qs(url.query)
+            token = self.headers.get('X-Debug-Token') or query.get('token', [None])[0]
+            # str bilan compare_digest ASCII bo'lmagan tokenda TypeError beradi (500 o'rniga 403 kerak)
+            if not token or not hmac.compare_digest(token.encode(), DEBUG_TOKEN.encode()):
+                self._send_response(403)
+            elif url.path == '/debug/traces':
+                self._debug_traces(query)
+            elif url.path == '/debug/queues':
+                self._debug_queues(query)
+            else:
+                self._send_response(404)
         else:
             self._send_response(404)
 
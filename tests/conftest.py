@@ -0,0 +1,80 @@
+# Testlar repo ildizidagi modullarni (db.py, journal.py, ...) to'g'ridan-to'g'ri import qiladi.
+#
+#   python -m pytest -q
+#   TEST_DATABASE_URL=postgresql://.../scratch python -m pytest -q    # bazaga bog'liq testlar bilan
+#   TEST_DATABASE_REPLICA_URL=postgresql://...                         # + replika yo'naltirish testi
+import os
+import sys
+from types import SimpleNamespace
+from collections import OrderedDict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    """Jurnal vaqtinchalik faylga yo'naltiriladi."""
+    import journal
+
+    path = str(tmp_path / "inventory_journal.jsonl")
+    monkeypatch.setattr(journal, "JOURNAL_PATH", path)
+    monkeypatch.setattr(journal, "_tail_checked", False)
+    return path
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    """Vaqtinchalik (scratch) baza; TEST_DATABASE_URL berilmasa test o'tkazib yuboriladi."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL berilmagan")
+    import db
+
+    monkeypatch.setattr(db, "DATABASE_URL", TEST_DATABASE_URL)
+    monkeypatch.setattr(db, "DATABASE_REPLICA_URLS", [])
+    # Oldingi testlardagi ulanish xatolari breakerni ochib qo'ymasin
+    monkeypatch.setattr(db, "_primary_breaker", db.CircuitBreaker("Test baza", 3, 1, 60))
+    db.create_tables()
+    return db
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """main.py (Telegramga ulanmasdan); keshlar har test uchun bo'sh."""
+    os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+    import main
+
+    monkeypatch.setattr(main, "_picker_cache", {})
+    monkeypatch.setattr(main, "_report_cache", OrderedDict())
+    return main
+
+
+class FakeMessage:
+    def __init__(self, text: str = None):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text: str, **kwargs) -> None:
+        self.replies.append(text)
+
+
+@pytest.fixture
+def make_update():
+    """Handlerlar uchun soddalashtirilgan Update: chat, foydalanuvchi va javoblarni yig'uvchi xabar."""
+    def make(chat_id: int = 1, text: str = None):
+        message = FakeMessage(text)
+        return SimpleNamespace(
+            effective_chat=SimpleNamespace(id=chat_id), effective_user=SimpleNamespace(id=chat_id),
+            message=message, effective_message=message,
+        )
+    return make
+
+
+@pytest.fixture
+def make_context():
+    def make(user_data: dict = None, args: list = None):
+        return SimpleNamespace(user_data={} if user_data is None else user_data, args=args or [])
+    return make
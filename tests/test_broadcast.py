@@ -0,0 +1,158 @@
+# Ommaviy xabar: umumiy tezlik cheklovchisi, RetryAfter pauzasi va last_seller_id dan davom etish.
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+import broadcast
+
+
+class FakeBot:
+    def __init__(self, retry_after_for: set = ()):
+        self.sent = []          # (loop vaqti, chat_id)
+        self.edits = 0
+        self._retry_after_for = set(retry_after_for)
+
+    async def send_message(self, chat_id, text):
+        if chat_id in self._retry_after_for:
+            self._retry_after_for.discard(chat_id)
+            raise RetryAfter(1)
+        self.sent.append((asyncio.get_running_loop().time(), chat_id))
+
+    async def edit_message_text(self, **kwargs):
+        self.edits += 1
+
+
+@pytest.fixture
+def sellers(monkeypatch):
+    """seller id -> chat_id; broadcast yangilanishlari `updates` ga yoziladi."""
+    rows = [{'id': i, 'chat_id': 1000 + i} for i in range(1, 11)]
+    updates = []
+
+    def get_seller_chat_ids_after(last_id, limit):
+        return [row for row in rows if row['id'] > last_id][:limit]
+
+    monkeypatch.setattr(broadcast, "get_seller_chat_ids_after", get_seller_chat_ids_after)
+    monkeypatch.setattr(broadcast, "count_sellers_with_chat_id", lambda: len(rows))
+    monkeypatch.setattr(broadcast, "update_broadcast", lambda broadcast_id, **fields: updates.append((broadcast_id, fields)))
+    monkeypatch.setattr(broadcast, "BROADCAST_BATCH_SIZE", 4)
+    monkeypatch.setattr(broadcast, "_limiter", broadcast.RateLimiter(100))
+    monkeypatch.setattr(broadcast, "_active_broadcasts", set())
+    return rows, updates
+
+
+def _broadcast(broadcast_id: int, last_seller_id: int = 0, sent: int = 0) -> dict:
+    return {'id': broadcast_id, 'matn': "salom", 'admin_chat_id': 1, 'status_message_id': None,
+            'last_seller_id': last_seller_id, 'sent': sent, 'failed': 0}
+
+
+def _min_span(times: list, k: int = 5) -> float:
+    """k ta ketma-ket so'rov orasidagi eng qisqa vaqt (alohida so'rovlar loop jitteriga bog'liq)."""
+    times = sorted(times)
+    return min(b - a for a, b in zip(times, times[k:]))
+
+
+def test_limiter_paces_requests():
+    limiter = broadcast.RateLimiter(50)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        times = []
+
+        async def one():
+            await limiter.wait()
+            times.append(loop.time())
+
+        await asyncio.gather(*(one() for _ in range(20)))
+        return start, times
+
+    start, times = asyncio.run(run())
+    assert max(times) - start >= 19 * 0.02 * 0.95
+    assert _min_span(times) >= 5 * 0.02 * 0.9
+
+
+def test_pause_delays_waiters_already_in_line():
+    limiter = broadcast.RateLimiter(100)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        times = []
+
+        async def one():
+            await limiter.wait()
+            times.append(loop.time())
+
+        tasks = [asyncio.create_task(one()) for _ in range(10)]
+        await asyncio.sleep(0.025)
+        paused_at = loop.time()
+        limiter.pause(0.2)
+        await asyncio.gather(*tasks)
+        return paused_at, times
+
+    paused_at, times = asyncio.run(run())
+    before = [t for t in times if t < paused_at]
+    after = [t for t in times if t >= paused_at]
+    assert 1 <= len(before) < 10
+    assert min(after) >= paused_at + 0.2 * 0.95
+    assert _min_span(after) >= 5 * 0.01 * 0.9
+
+
+def test_concurrent_broadcasts_share_the_limit(sellers):
+    bot = FakeBot()
+
+    async def run():
+        await asyncio.gather(broadcast.run_broadcast(bot, _broadcast(1)), broadcast.run_broadcast(bot, _broadcast(2)))
+
+    asyncio.run(run())
+    assert len(bot.sent) == 20
+    # Ikki broadcast birgalikda ham soniyasiga 100 tadan oshmaydi
+    assert _min_span([t for t, _ in bot.sent]) >= 5 * 0.01 * 0.9
+
+
+def test_retry_after_pauses_every_broadcast(sellers):
+    # Birinchi broadcastning birinchi xabari RetryAfter(1) oladi
+    bot = FakeBot(retry_after_for={1001})
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(broadcast.run_broadcast(bot, _broadcast(1)), broadcast.run_broadcast(bot, _broadcast(2)))
+        return start
+
+    start = asyncio.run(run())
+    assert len(bot.sent) == 20
+    assert sorted(chat_id for _, chat_id in bot.sent).count(1001) == 2
+    # Pauza ikkinchi broadcastga ham ta'sir qildi: 1 soniyadan keyin ko'p xabar yuborilgan
+    late = [t for t, _ in bot.sent if t - start >= 1.0]
+    assert len(late) >= 15
+
+
+def test_resume_from_last_seller_id(sellers):
+    _, updates = sellers
+    bot = FakeBot()
+    asyncio.run(broadcast.run_broadcast(bot, _broadcast(3, last_seller_id=6, sent=6)))
+
+    assert [chat_id for _, chat_id in bot.sent] == [1007, 1008, 1009, 1010]
+    assert updates[0] == (3, {'last_seller_id': 10, 'sent': 10, 'failed': 0})
+    assert updates[-1] == (3, {'holat': 'done'})
+
+
+def test_resume_broadcasts_starts_running_ones(sellers, monkeypatch):
+    bot = FakeBot()
+    running = [_broadcast(4, last_seller_id=8, sent=8), _broadcast(5, last_seller_id=10, sent=10)]
+    monkeypatch.setattr(broadcast, "get_running_broadcasts", lambda: running)
+
+    async def run():
+        tasks = []
+
+        class App:
+            def create_task(self, coroutine):
+                tasks.append(asyncio.create_task(coroutine))
+
+        App.bot = bot
+        await broadcast.resume_broadcasts(App())
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert sorted(chat_id for _, chat_id in bot.sent) == [1009, 1010]
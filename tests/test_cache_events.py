@@ -0,0 +1,103 @@
+# Kesh xabarlari: on_cache_event payload -> qaysi kesh eskirtiriladi, va inventory
+# triggerlari (so'rov boshiga, sotuvchi boshiga bitta NOTIFY). Oxirgisi bazaga bog'liq.
+import uuid
+import select
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def calls(bot, monkeypatch):
+    calls = []
+    for name in ("invalidate_picker", "invalidate_product_snapshot", "note_inventory_insert",
+                 "invalidate_debt_report", "flush_caches"):
+        monkeypatch.setattr(bot, name, lambda *args, name=name: calls.append((name, *args)))
+    return calls
+
+
+@pytest.mark.parametrize("payload, expected", [
+    ("products", [("invalidate_picker", 'prod'), ("invalidate_product_snapshot",)]),
+    ("sellers", [("invalidate_picker", 'sel')]),
+    ("inventory:7:42", [("note_inventory_insert", 7, 42)]),
+    ("inventory:7", [("invalidate_debt_report", 7)]),
+    ("inventory", [("invalidate_debt_report", None)]),
+    # Buzilgan qism - butun inventar keshi, noma'lum xabar - hamma keshlar
+    ("inventory:x:1", [("invalidate_debt_report", None)]),
+    ("inventory_legacy", [("flush_caches",)]),
+    ("", [("flush_caches",)]),
+])
+def test_payload_maps_to_invalidation(bot, calls, payload, expected):
+    bot.on_cache_event(payload)
+    assert calls == expected
+
+
+@pytest.fixture
+def listener(test_db):
+    db = test_db
+    tag = uuid.uuid4().hex[:8]
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    seller_ids = []
+    for i in range(2):
+        cursor.execute("INSERT INTO sellers (ism, parol) VALUES (%s, %s) RETURNING id", (f"c{i}-{tag}", f"c{i}-{tag}"))
+        seller_ids.append(cursor.fetchone()[0])
+    cursor.execute("INSERT INTO products (nomi, narxi) VALUES (%s, 10) RETURNING id", (f"c-{tag}",))
+    product_id = cursor.fetchone()[0]
+    conn.commit()
+
+    listen = db.open_listen_connection()
+    assert listen is not None
+
+    def received() -> list:
+        payloads = []
+        while select.select([listen], [], [], 0.5)[0]:
+            listen.poll()
+            while listen.notifies:
+                payloads.append(listen.notifies.pop(0).payload)
+        return payloads
+
+    yield conn, seller_ids, product_id, received
+
+    listen.close()
+    cursor.execute("DELETE FROM inventory WHERE product_id = %s", (product_id,))
+    cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+    cursor.execute("DELETE FROM sellers WHERE id = ANY(%s)", (seller_ids,))
+    conn.commit()
+    conn.close()
+
+
+def test_inventory_notifies_once_per_seller_per_statement(listener):
+    conn, (a, b), product_id, received = listener
+    cursor = conn.cursor()
+    assert received() == []
+
+    now = datetime.now()
+    cursor.execute("""
+        INSERT INTO inventory (seller_id, product_id, soni, narxi, sana)
+        SELECT s, %s, g, g * 10, %s FROM unnest(%s::int[]) s, generate_series(1, 5) g
+        RETURNING id, seller_id
+    """, (product_id, now, [a, b]))
+    first_ids = {}
+    for row_id, seller_id in cursor.fetchall():
+        first_ids[seller_id] = min(row_id, first_ids.get(seller_id, row_id))
+    conn.commit()
+    # 10 ta qator - ikkita xabar, har biri sotuvchining eng kichik yangi ID si bilan
+    assert sorted(received()) == sorted(f"inventory:{s}:{first_ids[s]}" for s in (a, b))
+
+    cursor.execute("UPDATE inventory SET soni = soni + 1 WHERE product_id = %s", (product_id,))
+    conn.commit()
+    assert sorted(received()) == sorted(f"inventory:{s}" for s in (a, b))
+
+    cursor.execute("DELETE FROM inventory WHERE seller_id = %s", (a,))
+    conn.commit()
+    assert received() == [f"inventory:{a}"]
+
+    # Eski har-qator triggeri qolmagan
+    cursor.execute("""
+        SELECT tgname FROM pg_trigger WHERE tgrelid = 'inventory'::regclass AND tgname LIKE '%%cache_notify%%'
+        ORDER BY tgname
+    """)
+    assert [name for name, in cursor.fetchall()] == [
+        'inventory_cache_notify_delete', 'inventory_cache_notify_insert', 'inventory_cache_notify_update',
+    ]
@@ -0,0 +1,87 @@
+# chat_processor.py: PTB Application ichida chat bo'yicha tartib va cheklangan qabul
+# (BoundedUpdateQueue). Bot API o'rniga replay.py dagi stub server.
+import asyncio
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+import replay
+from chat_processor import ChatOrderedUpdateProcessor, BoundedUpdateQueue
+
+
+@pytest.fixture
+def stub_server():
+    server = replay.start_stub_server()
+    yield f"http://127.0.0.1:{server.server_address[1]}/bot"
+    server.shutdown()
+
+
+def _message_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 1767225600 + update_id, 'text': str(update_id),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f"u{chat_id}"},
+        },
+    }, None)
+
+
+def _update_tasks() -> int:
+    return sum('process_concurrent_update' in task.get_name() for task in asyncio.all_tasks())
+
+
+def test_chat_order_and_bounded_intake(stub_server):
+    queue_size, in_flight = 4, 3
+    updates = [_message_update(i, chat_id=100 + i % 3) for i in range(1, 31)]
+    handled = {}
+    peak_tasks = 0
+    gate = asyncio.Event()
+
+    async def handler(update, context):
+        nonlocal peak_tasks
+        peak_tasks = max(peak_tasks, _update_tasks())
+        await gate.wait()
+        handled.setdefault(update.effective_chat.id, []).append(update.update_id)
+        await asyncio.sleep(0.001)
+
+    async def run():
+        application = (
+            ApplicationBuilder().token(replay.REPLAY_TOKEN).base_url(stub_server).updater(None)
+            .concurrent_updates(ChatOrderedUpdateProcessor(max_concurrent_chats=2, max_pending_updates=100))
+            .update_queue(BoundedUpdateQueue(maxsize=queue_size, max_in_flight=in_flight))
+            .build()
+        )
+        application.add_handler(MessageHandler(filters.TEXT, handler))
+        await application.initialize()
+        await application.start()
+
+        put = 0
+
+        async def produce():
+            nonlocal put
+            for update in updates:
+                await application.update_queue.put(update)
+                put += 1
+
+        producer = asyncio.create_task(produce())
+        await asyncio.sleep(0.2)
+        # Handlerlar band: ko'pi bilan `in_flight` ta task, navbat to'lgach ishlab chiqaruvchi kutadi
+        assert _update_tasks() == in_flight
+        assert application.update_queue.in_flight() == in_flight
+        assert put == in_flight + queue_size
+
+        gate.set()
+        await producer
+        await application.update_queue.join()
+        await application.stop()
+        await application.shutdown()
+
+    asyncio.run(run())
+
+    assert peak_tasks <= in_flight
+    assert sum(len(ids) for ids in handled.values()) == len(updates)
+    # Har bir chat ichida update lar kelgan tartibda bajarilgan
+    for chat_id, ids in handled.items():
+        assert ids == sorted(ids)
@@ -0,0 +1,139 @@
+# Circuit breaker: holatlar (closed -> open -> half_open -> closed), jitterli backoff va
+# so'rov o'rtasidagi xatolarning breakerga yozilishi. Bazasiz (soxta soat va ulanish bilan).
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import db
+import journal
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_closed_open_half_open_closed(clock):
+    breaker = db.CircuitBreaker("Test", 3, 1.0, 60.0)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+
+    # Kutish vaqti (jitter bilan ko'pi bilan base_delay) tugagach bitta sinov ulanishi
+    clock[0] += 1.0
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow() and breaker.failures == 0
+
+
+def test_half_open_failure_backs_off_with_jitter(clock, monkeypatch):
+    monkeypatch.setattr(db, "random", random.Random(7))
+    breaker = db.CircuitBreaker("Test", 1, 1.0, 8.0)
+
+    delays = []
+    for trip in range(6):
+        breaker.record_failure()
+        assert breaker.state == breaker.OPEN
+        delay = breaker._retry_at - clock[0]
+        # Kutish har safar ikki baravar (max_delay gacha), jitter bilan [delay/2, delay]
+        expected = min(8.0, 2.0 ** trip)
+        assert expected / 2 <= delay <= expected
+        delays.append(delay)
+
+        clock[0] += delay - 0.01
+        assert not breaker.allow()
+        clock[0] += 0.01
+        assert breaker.allow() and breaker.state == breaker.HALF_OPEN
+
+    # Jitter: bir vaqtda ochilgan breakerlar bir xil paytda qayta urinmaydi
+    assert len(set(delays)) == len(delays)
+
+
+class FailingConnection:
+    """Birinchi so'rovda `error` beradi; `lost` bo'lsa ulanish yopilgan holatga o'tadi."""
+
+    def __init__(self, error: Exception, lost: bool):
+        self.error = error
+        self.lost = lost
+        self.closed = 0
+        self.dsn = db.DATABASE_URL
+
+    def cursor(self, cursor_factory=None):
+        return self
+
+    def execute(self, query, params=None):
+        if self.lost: self.closed = 2
+        raise self.error
+
+    def rollback(self):
+        assert not self.closed
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def failing_db(monkeypatch, journal_path):
+    breaker = db.CircuitBreaker("Test baza", 3, 1, 60)
+    monkeypatch.setattr(db, "_primary_breaker", breaker)
+    db.set_request_chat_id(None)
+
+    def use(error: Exception, lost: bool):
+        conn = FailingConnection(error, lost)
+        monkeypatch.setattr(db, "get_db_connection", lambda readonly=False: conn)
+        return conn
+
+    yield breaker, use
+    db.set_request_chat_id(None)
+
+
+def test_read_path_connection_loss_is_reported(failing_db):
+    breaker, use = failing_db
+    use(db.psycopg2.OperationalError("server closed the connection unexpectedly"), lost=True)
+
+    assert db.get_seller_id_by_chat_id(5) is None
+    # Handler "topilmadi" emas, UNAVAILABLE_TEXT ko'rsatadi
+    assert db.db_unavailable()
+    assert breaker.failures == 1
+    assert db.get_user_role(5) == db.ROLE_UNAVAILABLE
+    assert breaker.failures == 2
+
+
+def test_statement_timeout_does_not_trip_breaker(failing_db):
+    breaker, use = failing_db
+    use(db.psycopg2.errors.QueryCanceled("canceling statement due to statement timeout"), lost=False)
+
+    assert db.get_seller_id_by_chat_id(5) is None
+    assert not db.db_unavailable()
+    assert breaker.failures == 0
+
+
+def test_add_inventory_journals_only_on_connection_loss(failing_db):
+    breaker, use = failing_db
+
+    # Deadlock: baza ishlayapti - yozuv jurnalga tushmaydi, admin qayta urinadi
+    use(db.psycopg2.errors.DeadlockDetected("deadlock detected"), lost=False)
+    success, _, _, queued = db.add_inventory(1, 1, 2)
+    assert not success and not queued
+    assert not journal.has_pending()
+    assert breaker.failures == 0
+
+    # Ulanish uzildi: yozuv jurnalga tushadi
+    use(db.psycopg2.OperationalError("server closed the connection unexpectedly"), lost=True)
+    success, _, _, queued = db.add_inventory(1, 1, 2)
+    assert success and queued
+    assert [r['soni'] for r in journal.read()[0]] == [2]
+    assert breaker.failures == 1
@@ -0,0 +1,119 @@
+# Qarzdorlik hisoboti keshi (main.get_debt_report): topilishi, yangi yozuvlar bilan to'ldirish
+# va eskirtirish. Baza o'rniga xotiradagi inventar ro'yxati ishlatiladi.
+import asyncio
+
+import pytest
+
+import cache_events
+
+
+@pytest.fixture
+def inventory(bot, monkeypatch):
+    """seller_id=7 ning yozuvlari va bazaga murojaatlar hisobi."""
+    rows = []
+    calls = {'last_id': 0, 'details': []}
+
+    def add(soni: int, narxi: float) -> int:
+        row_id = len(rows) + 1
+        rows.append({'id': row_id, 'soni': soni, 'jami_narxi': narxi, 'sana': f"2026-01-{row_id:02d} 10:00",
+                     'mahsulot_nomi': f"m{row_id}"})
+        return row_id
+
+    def get_seller_last_inventory_id(seller_id):
+        calls['last_id'] += 1
+        return max((r['id'] for r in rows), default=0)
+
+    def get_seller_debt_details(seller_id, after_id=0):
+        calls['details'].append(after_id)
+        items = sorted((r for r in rows if r['id'] > after_id), key=lambda r: r['id'], reverse=True)
+        return sum(r['jami_narxi'] for r in items), [dict(r) for r in items]
+
+    monkeypatch.setattr(bot, "get_seller_last_inventory_id", get_seller_last_inventory_id)
+    monkeypatch.setattr(bot, "get_seller_debt_details", get_seller_debt_details)
+    monkeypatch.setattr(cache_events, "_connected", True)
+    add(1, 100.0)
+    add(2, 200.0)
+    return add, calls
+
+
+def test_hit_needs_no_db_round_trip(bot, inventory):
+    _, calls = inventory
+    total, items = bot.get_debt_report(7)
+    assert total == 300.0 and len(items) == 2
+
+    assert bot.get_debt_report(7) == (total, items)
+    assert calls == {'last_id': 1, 'details': [0]}
+
+
+def test_hit_is_checked_when_listener_is_down(bot, inventory, monkeypatch):
+    add, calls = inventory
+    bot.get_debt_report(7)
+    monkeypatch.setattr(cache_events, "_connected", False)
+    add(1, 50.0)
+
+    total, items = bot.get_debt_report(7)
+    assert total == 350.0 and len(items) == 3
+    assert calls['details'] == [0, 2]
+
+
+def test_insert_event_extends_from_after_id(bot, inventory):
+    add, calls = inventory
+    bot.get_debt_report(7)
+    new_id = add(3, 30.0)
+    bot.on_cache_event(f"inventory:7:{new_id}")
+
+    total, items = bot.get_debt_report(7)
+    assert total == 330.0
+    assert [item.split("**")[1] for item in items] == ["m3", "m2", "m1"]
+    # Faqat yangi yozuvlar so'raldi; keyingi so'rov yana keshdan
+    assert calls['details'] == [0, 2]
+    bot.get_debt_report(7)
+    assert calls['details'] == [0, 2]
+
+
+def test_already_rendered_insert_event_is_ignored(bot, inventory):
+    _, calls = inventory
+    bot.get_debt_report(7)
+    bot.on_cache_event("inventory:7:2")
+    bot.get_debt_report(7)
+    assert calls['details'] == [0]
+
+
+def test_out_of_order_insert_rebuilds(bot, inventory):
+    _, calls = inventory
+    bot.get_debt_report(7)
+    # Keshdagi chegaradan kichik, lekin hisobotda yo'q ID (kechroq commit bo'lgan tranzaksiya)
+    bot._report_cache[7]['ids'].discard(1)
+    bot.on_cache_event("inventory:7:1")
+    assert 7 not in bot._report_cache
+
+
+@pytest.mark.parametrize("payload", ["inventory:7", "inventory"])
+def test_update_or_delete_invalidates(bot, inventory, payload):
+    _, calls = inventory
+    bot.get_debt_report(7)
+    bot.on_cache_event(payload)
+    bot.get_debt_report(7)
+    assert calls['details'] == [0, 0]
+
+
+def test_own_write_marks_report_stale(bot, inventory, monkeypatch, make_update, make_context):
+    add, calls = inventory
+    monkeypatch.setattr(bot, "ADMIN_IDS", [1])
+    bot.get_debt_report(7)
+
+    def add_inventory(seller_id, product_id, count):
+        add(count, 10.0 * count)
+        return True, "m3", 10.0 * count, False
+
+    async def show_seller_detail_menu(update, context):
+        return bot.ADMIN_MENU
+
+    monkeypatch.setattr(bot, "add_inventory", add_inventory)
+    monkeypatch.setattr(bot, "show_seller_detail_menu", show_seller_detail_menu)
+    context = make_context({'selected_seller_id': 7, 'temp_product_id': 3})
+    asyncio.run(bot.finalize_inventory_count(make_update(chat_id=1, text="4"), context))
+
+    # NOTIFY kelmagan (tinglovchi sezdirmay uzilgan) bo'lsa ham yangi yozuv ko'rinadi
+    total, items = bot.get_debt_report(7)
+    assert total == 340.0 and len(items) == 3
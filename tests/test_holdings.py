@@ -0,0 +1,106 @@
+# "Mahsulotlarim": bitta xabarga sig'diriladigan ro'yxat va arxivlangan oylar bilan jamlash.
+# get_seller_holdings testi bazaga bog'liq (TEST_DATABASE_URL).
+import re
+import uuid
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+
+@pytest.fixture
+def holdings(bot, monkeypatch):
+    rows = []
+    monkeypatch.setattr(bot, "get_seller_id_by_chat_id", lambda chat_id: 7)
+    monkeypatch.setattr(bot, "get_seller_holdings", lambda seller_id: rows)
+    return rows
+
+
+def _show(bot, make_update, make_context) -> list:
+    update = make_update(chat_id=7)
+    assert asyncio.run(bot.show_seller_products(update, make_context())) == bot.SELLER_MENU
+    return update.message.replies
+
+
+def test_short_list_is_sent_whole(bot, holdings, make_update, make_context):
+    holdings += [
+        {'product_id': 1, 'nomi': "Non", 'soni': 3, 'jami_narxi': 3000},
+        {'product_id': 2, 'nomi': "Sut", 'soni': 1, 'jami_narxi': 500},
+    ]
+    replies = _show(bot, make_update, make_context)
+    assert len(replies) == 1
+    assert "Jami qiymat: 3 500 so'm" in replies[0]
+    assert "2. **Sut** - 1 dona" in replies[0]
+    assert "va yana" not in replies[0]
+
+
+def test_long_list_is_truncated_to_one_message(bot, holdings, make_update, make_context):
+    holdings += [
+        {'product_id': i, 'nomi': f"Mahsulot {i} " + "x" * 40, 'soni': i, 'jami_narxi': 1000 * i}
+        for i in range(1, 301)
+    ]
+    replies = _show(bot, make_update, make_context)
+
+    # Bitta xabar, Telegram chegarasidan (4096) past
+    assert len(replies) == 1
+    text = replies[0]
+    assert len(text) <= 4096
+    shown = len(re.findall(r"^\d+\. ", text, flags=re.M))
+    assert 0 < shown < 300
+    assert len(text.split("... va yana")[0]) <= bot.HOLDINGS_MESSAGE_LIMIT
+
+    # Qolganlari soni va qiymati bilan, jami esa butun ro'yxat bo'yicha
+    rest = holdings[shown:]
+    assert f"... va yana {len(rest)} ta mahsulot ({bot.get_formatted_price(sum(r['jami_narxi'] for r in rest))} so'm)" in text
+    assert f"Jami qiymat: {bot.get_formatted_price(sum(r['jami_narxi'] for r in holdings))} so'm" in text
+
+
+@pytest.fixture
+def archived(test_db):
+    db = test_db
+    tag = uuid.uuid4().hex[:8]
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO sellers (ism, parol) VALUES (%s, %s) RETURNING id", (f"h-{tag}", f"h-{tag}"))
+    seller_id = cursor.fetchone()[0]
+    product_ids = []
+    for name, price in (("a", 10), ("b", 20), ("c", 30)):
+        cursor.execute("INSERT INTO products (nomi, narxi) VALUES (%s, %s) RETURNING id", (f"{name}-{tag}", price))
+        product_ids.append(cursor.fetchone()[0])
+    conn.commit()
+
+    yield db, conn, seller_id, product_ids
+
+    cursor.execute("DELETE FROM inventory WHERE seller_id = %s", (seller_id,))
+    cursor.execute("DELETE FROM inventory_archived_totals WHERE seller_id = %s", (seller_id,))
+    cursor.execute("DELETE FROM products WHERE id = ANY(%s)", (product_ids,))
+    cursor.execute("DELETE FROM sellers WHERE id = %s", (seller_id,))
+    conn.commit()
+    conn.close()
+
+
+def test_holdings_merge_archived_totals(archived):
+    db, conn, seller_id, (a, b, c) = archived
+    cursor = conn.cursor()
+    now = datetime.now()
+    # a: faqat joriy yozuvlar, b: joriy + ikki arxiv oyi, c: faqat arxivda
+    for product_id, soni, narxi in ((a, 2, 20), (a, 3, 30), (b, 1, 20)):
+        cursor.execute(
+            "INSERT INTO inventory (seller_id, product_id, soni, narxi, sana) VALUES (%s, %s, %s, %s, %s)",
+            (seller_id, product_id, soni, narxi, now)
+        )
+    for davr, product_id, soni, narxi in ((date(2025, 1, 1), b, 4, 80), (date(2025, 2, 1), b, 5, 100),
+                                          (date(2025, 1, 1), c, 10, 300)):
+        cursor.execute(
+            "INSERT INTO inventory_archived_totals (davr, seller_id, product_id, soni, narxi) VALUES (%s, %s, %s, %s, %s)",
+            (davr, seller_id, product_id, soni, narxi)
+        )
+    conn.commit()
+
+    rows = db.get_seller_holdings(seller_id)
+    assert [(r['product_id'], int(r['soni']), float(r['jami_narxi'])) for r in rows] == [
+        (c, 10, 300.0),
+        (b, 1 + 4 + 5, 20.0 + 80 + 100),
+        (a, 5, 50.0),
+    ]
+    assert db.get_seller_holdings(-1) == []
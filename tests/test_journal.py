@@ -0,0 +1,141 @@
+import json
+import os
+import time
+import asyncio
+
+import journal
+
+
+def _record(i: int) -> dict:
+    return {'request_id': f"r{i}", 'seller_id': 1, 'product_id': 1, 'soni': i, 'narxi': None,
+            'sana': "2026-01-01T00:00:00"}
+
+
+def _quarantined() -> list:
+    with open(journal.quarantine_path(), encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_append_read_discard(journal_path):
+    for i in range(3):
+        journal.append(_record(i))
+
+    records, consumed = journal.read()
+    assert [r['request_id'] for r in records] == ["r0", "r1", "r2"]
+
+    journal.discard(consumed)
+    assert not os.path.exists(journal_path)
+    assert not journal.has_pending()
+
+
+def test_read_in_batches(journal_path):
+    for i in range(5):
+        journal.append(_record(i))
+
+    records, consumed = journal.read(max_records=2)
+    assert [r['request_id'] for r in records] == ["r0", "r1"]
+    journal.discard(consumed)
+
+    records, consumed = journal.read(max_records=2)
+    assert [r['request_id'] for r in records] == ["r2", "r3"]
+    journal.discard(consumed)
+
+    records, consumed = journal.read(max_records=2)
+    assert [r['request_id'] for r in records] == ["r4"]
+    journal.discard(consumed)
+    assert journal.read() == ([], 0)
+
+
+def test_discard_only_moves_offset(journal_path):
+    for i in range(5):
+        journal.append(_record(i))
+    with open(journal_path, 'rb') as f:
+        data = f.read()
+    inode = os.stat(journal_path).st_ino
+
+    records, offset = journal.read(max_records=2)
+    journal.discard(offset)
+
+    # Jurnal qayta yozilmaydi; yozib bo'lingan joy offset faylida saqlanadi
+    assert os.stat(journal_path).st_ino == inode
+    with open(journal_path, 'rb') as f:
+        assert f.read() == data
+    with open(journal.offset_path(), 'rb') as f:
+        assert int(f.read()) == offset
+    assert journal.has_pending()
+
+    # Partiyadan keyin qo'shilgan yozuv ham navbatda qoladi
+    journal.append(_record(5))
+    records, offset = journal.read()
+    assert [r['request_id'] for r in records] == ["r2", "r3", "r4", "r5"]
+    journal.discard(offset)
+    assert not os.path.exists(journal_path)
+    assert not os.path.exists(journal.offset_path())
+
+
+def test_torn_tail_is_kept_for_next_read(journal_path):
+    journal.append(_record(0))
+    # Jarayon qator yozilayotganda qulagan
+    with open(journal_path, 'ab') as f:
+        f.write(b'{"request_id":"r1","sel')
+
+    records, consumed = journal.read()
+    assert [r['request_id'] for r in records] == ["r0"]
+    journal.discard(consumed)
+
+    # Qayta ishga tushgandan keyingi yozuv buzilgan qatorga yopishmaydi
+    journal._tail_checked = False
+    journal.append(_record(2))
+    records, consumed = journal.read()
+    assert [r['request_id'] for r in records] == ["r2"]
+    assert _quarantined()[0]['raw'].startswith('{"request_id":"r1"')
+
+
+def test_corrupt_line_is_quarantined(journal_path):
+    journal.append(_record(0))
+    with open(journal_path, 'ab') as f:
+        f.write(b"not json\n")
+    journal.append(_record(1))
+
+    records, consumed = journal.read(max_records=1)
+    assert [r['request_id'] for r in records] == ["r0"]
+    journal.discard(consumed)
+
+    # Buzilgan qator keyingi partiyani to'sib qo'ymaydi
+    records, consumed = journal.read(max_records=1)
+    assert [r['request_id'] for r in records] == ["r1"]
+    assert _quarantined() == [{'reason': "buzilgan qator", 'raw': "not json"}]
+
+
+def test_quarantine_record(journal_path):
+    journal.quarantine(_record(7), "mahsulot topilmadi")
+    assert _quarantined() == [{'reason': "mahsulot topilmadi", 'record': _record(7)}]
+
+
+def test_replay_loop_does_not_block_event_loop(journal_path, bot, monkeypatch):
+    journal.append(_record(0))
+    calls = []
+
+    def slow_replay(max_batches=None):
+        calls.append(max_batches)
+        time.sleep(0.3)  # sekin baza
+        records, offset = journal.read(max_records=1)
+        journal.discard(offset)
+        return len(records)
+
+    monkeypatch.setattr(bot, "replay_inventory_journal", slow_replay)
+
+    async def run():
+        ticks = 0
+        task = asyncio.create_task(bot.journal_replay_loop())
+        start = time.monotonic()
+        while not calls or journal.has_pending():
+            await asyncio.sleep(0.01)
+            ticks += 1
+            assert time.monotonic() - start < 5
+        task.cancel()
+        return ticks
+
+    # Replay alohida oqimda: shu vaqtda event loop boshqa vazifalarni bajaradi
+    assert asyncio.run(run()) > 10
+    assert calls == [1]
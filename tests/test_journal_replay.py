@@ -0,0 +1,143 @@
+# Jurnal replay: partiyalar, karantin, qulashdan keyin tiklanish va o'tkazuvchanlik.
+# Bazaga bog'liq: TEST_DATABASE_URL berilmasa o'tkazib yuboriladi.
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import journal
+
+
+@pytest.fixture
+def env(test_db, journal_path):
+    db = test_db
+    tag = uuid.uuid4().hex[:8]
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO sellers (ism, parol) VALUES (%s, %s) RETURNING id", (f"t-{tag}", f"t-{tag}"))
+    seller_id = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO products (nomi, narxi) VALUES (%s, 100) RETURNING id", (f"t-{tag}",))
+    product_id = cursor.fetchone()[0]
+    conn.commit()
+
+    yield db, seller_id, product_id
+
+    cursor.execute("DELETE FROM inventory WHERE seller_id = %s", (seller_id,))
+    cursor.execute("DELETE FROM product_stock WHERE product_id = %s", (product_id,))
+    cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+    cursor.execute("DELETE FROM sellers WHERE id = %s", (seller_id,))
+    conn.commit()
+    conn.close()
+
+
+def _journal(seller_id: int, product_id: int, count: int) -> list:
+    start = datetime.now()
+    request_ids = []
+    for i in range(count):
+        request_id = uuid.uuid4().hex
+        journal.append({'request_id': request_id, 'seller_id': seller_id, 'product_id': product_id,
+                        'soni': 1, 'narxi': None, 'sana': (start + timedelta(microseconds=i)).isoformat()})
+        request_ids.append(request_id)
+    return request_ids
+
+
+def _inventory_rows(db, seller_id: int) -> list:
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT request_id FROM inventory WHERE seller_id = %s ORDER BY id", (seller_id,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def test_bad_record_is_quarantined(env):
+    db, seller_id, product_id = env
+    good = _journal(seller_id, product_id, 5)
+    journal.append({'request_id': "bad", 'seller_id': seller_id, 'product_id': product_id,
+                    'soni': "ko'p", 'narxi': None, 'sana': datetime.now().isoformat()})
+    good += _journal(seller_id, product_id, 5)
+
+    assert db.replay_inventory_journal(batch_size=4) == 10
+    assert _inventory_rows(db, seller_id) == good
+    assert not journal.has_pending()
+    with open(journal.quarantine_path(), encoding='utf-8') as f:
+        assert '"bad"' in f.read()
+
+
+def test_one_batch_per_call_counts_only_inserted(env):
+    db, seller_id, product_id = env
+    request_ids = _journal(seller_id, product_id, 6)
+    records, _ = journal.read()
+
+    assert db.replay_inventory_journal(batch_size=4, max_batches=1) == 4
+    assert journal.has_pending()
+    assert db.replay_inventory_journal(batch_size=4, max_batches=1) == 2
+    assert not journal.has_pending()
+
+    # Oldin yozilgan yozuvlar qayta jurnalga tushsa, yozilganlar soniga kirmaydi
+    for record in records[:3]:
+        journal.append(record)
+    assert db.replay_inventory_journal() == 0
+    assert _inventory_rows(db, seller_id) == request_ids
+    assert not journal.has_pending()
+
+
+def test_crash_between_commit_and_discard(env, monkeypatch):
+    db, seller_id, product_id = env
+    request_ids = _journal(seller_id, product_id, 10)
+
+    # Ikkinchi partiya commit bo'lgandan keyin, jurnal tozalanmasdan jarayon "qulaydi"
+    real_discard = journal.discard
+    calls = []
+
+    def crashing_discard(consumed):
+        calls.append(consumed)
+        if len(calls) == 2: raise SystemExit("crash")
+        real_discard(consumed)
+
+    monkeypatch.setattr(journal, "discard", crashing_discard)
+    with pytest.raises(SystemExit):
+        db.replay_inventory_journal(batch_size=4)
+    assert len(_inventory_rows(db, seller_id)) == 8
+
+    # Qayta ishga tushish: commit bo'lgan partiya takrorlanmaydi, qolgani yoziladi
+    monkeypatch.setattr(journal, "discard", real_discard)
+    db.replay_inventory_journal(batch_size=4)
+    assert _inventory_rows(db, seller_id) == request_ids
+    assert not journal.has_pending()
+
+
+def test_replay_throughput(env):
+    db, seller_id, product_id = env
+    count = 5000
+    _journal(seller_id, product_id, count)
+
+    start = time.perf_counter()
+    assert db.replay_inventory_journal(batch_size=500) == count
+    elapsed = time.perf_counter() - start
+
+    assert len(_inventory_rows(db, seller_id)) == count
+    print(f"\njurnal replay: {count} yozuv, {elapsed:.2f}s, {count / elapsed:.0f} yozuv/s")
+    assert count / elapsed > 500
+
+
+def test_committed_write_is_not_duplicated(env, monkeypatch):
+    db, seller_id, product_id = env
+    db.add_stock(product_id, 10)
+
+    # INSERT commit bo'ldi, lekin javobdan oldin ulanish xatosi: yozuv jurnalga ham tushadi
+    def lost_connection():
+        raise db.psycopg2.InterfaceError("connection already closed")
+
+    mark_write = db._mark_write
+    monkeypatch.setattr(db, "_mark_write", lost_connection)
+    success, _, _, queued = db.add_inventory(seller_id, product_id, 2)
+    assert success and queued
+    assert len(_inventory_rows(db, seller_id)) == 1
+
+    monkeypatch.setattr(db, "_mark_write", mark_write)
+    db.replay_inventory_journal()
+    assert len(_inventory_rows(db, seller_id)) == 1
+    assert not journal.has_pending()
@@ -0,0 +1,106 @@
+# logs.py: navbatli handler (nusxa, tashlanganlar hisobi) va to'la navbatda to'xtash.
+import queue
+import logging
+import threading
+
+import pytest
+
+import logs
+
+
+class Collect(logging.Handler):
+    def __init__(self, block: threading.Event = None):
+        super().__init__()
+        self.records = []
+        self.block = block
+
+    def emit(self, record):
+        if self.block: self.block.wait(5)
+        self.records.append(record)
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger(f"test_logs.{id(object())}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    yield logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+
+def test_prepare_does_not_mutate_original_record(logger):
+    other = Collect()
+    logger.addHandler(logs.DroppingQueueHandler(queue.Queue()))
+    logger.addHandler(other)
+
+    try:
+        raise ValueError("xato")
+    except ValueError:
+        logger.exception("qiymat %s", "a")
+
+    # Keyingi handler asl yozuvni oladi: argumentlar va exc_info joyida
+    record = other.records[0]
+    assert record.msg == "qiymat %s" and record.args == ("a",)
+    assert record.exc_info is not None
+
+
+def test_concurrent_drops_are_counted(logger):
+    full = queue.Queue(maxsize=1)
+    full.put(None)
+    handler = logs.DroppingQueueHandler(full)
+    logger.addHandler(handler)
+
+    def burst():
+        for i in range(1000):
+            logger.info("yozuv %d", i)
+
+    threads = [threading.Thread(target=burst) for _ in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert handler.dropped == handler._unreported == 8000
+
+    # Navbatda joy ochilgach, keyingi yozuv nechta tashlanganini aytadi
+    full.get_nowait()
+    logger.info("keyin")
+    assert full.get_nowait().dropped_before == 8000
+    assert handler._unreported == 0
+
+
+def test_stop_waits_for_full_queue_to_drain():
+    release = threading.Event()
+    output = Collect(block=release)
+    log_queue = queue.Queue(maxsize=3)
+    listener = logs.DrainingQueueListener(log_queue, output, stop_timeout=5)
+    listener.start()
+
+    records = [logging.makeLogRecord({'msg': f"r{i}"}) for i in range(4)]
+    for record in records: log_queue.put(record)
+    assert log_queue.full()
+
+    # Sekin chiqish: navbat to'la, stop() Full bilan yiqilmay bo'shashini kutadi
+    threading.Timer(0.2, release.set).start()
+    listener.stop()
+    assert [r.msg for r in output.records] == ["r0", "r1", "r2", "r3"]
+
+
+def test_stop_discards_oldest_when_output_is_stuck(capsys):
+    release = threading.Event()
+    output = Collect(block=release)
+    log_queue = queue.Queue(maxsize=3)
+    listener = logs.DrainingQueueListener(log_queue, output, stop_timeout=0.1)
+    listener.start()
+
+    for i in range(4):
+        log_queue.put(logging.makeLogRecord({'msg': f"r{i}"}))
+
+    stopping = threading.Thread(target=listener.stop)
+    stopping.start()
+    stopping.join(2)
+    # Sentinel navbatga tushdi; thread faqat band handler tugashini kutyapti
+    assert log_queue.qsize() == 3
+    release.set()
+    stopping.join(5)
+    assert not stopping.is_alive()
+    assert [r.msg for r in output.records] == ["r0", "r2", "r3"]
+    assert "1 ta yozuv tashlab yuborildi" in capsys.readouterr().err
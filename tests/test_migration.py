@@ -0,0 +1,99 @@
+# Eski (bo'limlanmagan) inventory jadvali: create_tables indekslari va migrate-partitions.
+# Bazaga bog'liq: TEST_DATABASE_URL serverida vaqtincha alohida baza yaratiladi.
+import uuid
+
+import pytest
+
+import db
+from conftest import TEST_DATABASE_URL
+
+
+def _admin_execute(sql: str) -> None:
+    conn = db.psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    try:
+        conn.cursor().execute(sql)
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def legacy_db(monkeypatch):
+    """Baseline sxemasidagi baza: inventory oddiy jadval, request_id ustuni yo'q."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL berilmagan")
+    name = f"legacy_{uuid.uuid4().hex[:8]}"
+    _admin_execute(f"CREATE DATABASE {name}")
+    url = db.psycopg2.extensions.make_dsn(TEST_DATABASE_URL, dbname=name)
+
+    conn = db.psycopg2.connect(url)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE products (id SERIAL PRIMARY KEY, nomi VARCHAR(255) UNIQUE NOT NULL, narxi DECIMAL(10, 2) NOT NULL);
+        CREATE TABLE sellers (id SERIAL PRIMARY KEY, ism VARCHAR(255) NOT NULL, mahalla VARCHAR(255),
+                              telefon VARCHAR(50), parol VARCHAR(50) UNIQUE NOT NULL, chat_id BIGINT UNIQUE);
+        CREATE TABLE inventory (id SERIAL PRIMARY KEY, seller_id INTEGER REFERENCES sellers(id),
+                                product_id INTEGER REFERENCES products(id), soni INTEGER NOT NULL,
+                                narxi DECIMAL(10, 2) NOT NULL, sana TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO products (nomi, narxi) VALUES ('Non', 100);
+        INSERT INTO sellers (ism, parol) VALUES ('Ali', 'p1');
+        INSERT INTO inventory (seller_id, product_id, soni, narxi)
+        SELECT 1, 1, g, g * 100 FROM generate_series(1, 50) g;
+    """)
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "DATABASE_URL", url)
+    monkeypatch.setattr(db, "DATABASE_REPLICA_URLS", [])
+    monkeypatch.setattr(db, "_primary_breaker", db.CircuitBreaker("Test baza", 3, 1, 60))
+    yield url
+    _admin_execute(f"DROP DATABASE {name} WITH (FORCE)")
+
+
+def _query(url: str, sql: str) -> list:
+    conn = db.psycopg2.connect(url)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def test_migration_before_create_tables_adds_request_id(legacy_db):
+    # Yangi kod bilan birinchi bo'lib migrate-partitions ishga tushirildi
+    assert db.migrate_inventory_to_partitioned(batch_size=20)
+    assert _query(legacy_db, "SELECT COUNT(*), COUNT(request_id) FROM inventory") == [(50, 0)]
+    assert _query(legacy_db, "SELECT relkind FROM pg_class WHERE relname = 'inventory'") == [('p',)]
+
+
+def test_legacy_indexes_are_built_concurrently_and_valid(legacy_db):
+    db.create_tables()
+    rows = _query(legacy_db, """
+        SELECT c.relname, i.indisvalid, i.indisunique FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'inventory'::regclass AND c.relname <> 'inventory_pkey' ORDER BY c.relname
+    """)
+    assert rows == sorted([('inventory_request_id_sana_key', True, True)] + [
+        (name, True, False) for name in db._INVENTORY_INDEXES
+    ])
+
+    # Uzilib qolgan CONCURRENTLY qurish INVALID indeks qoldiradi - keyingi ishga tushishda qayta quriladi
+    conn = db.psycopg2.connect(legacy_db)
+    conn.cursor().execute("""
+        UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'inventory_request_id_sana_key'::regclass
+    """)
+    conn.commit()
+    conn.close()
+    db.create_tables()
+    assert _query(legacy_db, """
+        SELECT indisvalid FROM pg_index WHERE indexrelid = 'inventory_request_id_sana_key'::regclass
+    """) == [(True,)]
+
+    # Migratsiya shu bazada davom etadi; takroriy ishga tushirish xavfsiz
+    assert db.migrate_inventory_to_partitioned(batch_size=20)
+    assert db.migrate_inventory_to_partitioned(batch_size=20)
+    assert _query(legacy_db, "SELECT COUNT(*) FROM inventory") == [(50,)]
+    assert {name for name, in _query(legacy_db, """
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'inventory'::regclass AND c.relname LIKE 'idx_%'
+    """)} == set(db._INVENTORY_INDEXES)
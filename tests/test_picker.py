@@ -0,0 +1,112 @@
+# Sahifalangan tanlash klaviaturalari (main.get_picker_page) va ularning keshi.
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def products(bot, monkeypatch):
+    rows = [{'id': i, 'nomi': f"mahsulot {i}"} for i in range(1, 26)]
+    loads = []
+
+    def get_all_products():
+        loads.append(1)
+        return list(rows)
+
+    monkeypatch.setattr(bot, "PICKER_PAGE_SIZE", 10)
+    monkeypatch.setattr(bot, "get_all_products", get_all_products)
+    return rows, loads
+
+
+def _buttons(markup) -> list:
+    return [button for row in markup.inline_keyboard for button in row]
+
+
+def _item_ids(markup) -> list:
+    return [int(b.callback_data.split(':')[1]) for b in _buttons(markup) if b.callback_data.startswith("prod:")]
+
+
+def _nav(markup) -> list:
+    return [b.callback_data for b in _buttons(markup) if b.callback_data.startswith("prodpg:")]
+
+
+def test_first_page(bot, products):
+    markup = bot.get_picker_page('prod', 0)
+    assert _item_ids(markup) == list(range(1, 11))
+    assert _nav(markup) == ["prodpg:1"]
+    assert _buttons(markup)[-1].text == "Keyingi ➡️ (2/3)"
+
+
+def test_middle_and_last_page(bot, products):
+    assert _nav(bot.get_picker_page('prod', 1)) == ["prodpg:0", "prodpg:2"]
+    last = bot.get_picker_page('prod', 2)
+    assert _item_ids(last) == list(range(21, 26))
+    assert _nav(last) == ["prodpg:1"]
+
+
+def test_out_of_range_page_is_clamped(bot, products):
+    assert bot.get_picker_page('prod', 99) is bot.get_picker_page('prod', 2)
+    assert bot.get_picker_page('prod', -1) is bot.get_picker_page('prod', 0)
+
+
+def test_single_page_has_no_navigation(bot, products, monkeypatch):
+    monkeypatch.setattr(bot, "PICKER_PAGE_SIZE", 50)
+    markup = bot.get_picker_page('prod', 0)
+    assert len(_item_ids(markup)) == 25
+    assert _nav(markup) == []
+
+
+def test_empty_list_is_not_cached(bot, products):
+    rows, loads = products
+    saved = list(rows)
+    rows.clear()
+    assert bot.get_picker_page('prod', 0) is None
+    rows.extend(saved)
+    assert _item_ids(bot.get_picker_page('prod', 0)) == list(range(1, 11))
+    assert len(loads) == 2
+
+
+def test_pages_are_cached(bot, products):
+    _, loads = products
+    assert bot.get_picker_page('prod', 1) is bot.get_picker_page('prod', 1)
+    assert bot.picker_name('prod', 7) == "mahsulot 7"
+    assert len(loads) == 1
+
+
+def test_new_product_invalidates_cache(bot, products, monkeypatch, make_update, make_context):
+    rows, loads = products
+    bot.get_picker_page('prod', 2)
+
+    def add_new_product(nomi, narxi):
+        rows.append({'id': 26, 'nomi': nomi})
+        return True
+
+    monkeypatch.setattr(bot, "add_new_product", add_new_product)
+    context = make_context({'new_product_name': "yangi"})
+    asyncio.run(bot.get_new_product_price(make_update(text="1500"), context))
+
+    assert _item_ids(bot.get_picker_page('prod', 2)) == list(range(21, 27))
+    assert bot.picker_name('prod', 26) == "yangi"
+    assert len(loads) == 2
+
+
+def test_new_seller_invalidates_cache(bot, monkeypatch, make_update, make_context):
+    sellers = [{'id': 1, 'ism': "Ali"}]
+    monkeypatch.setattr(bot, "get_all_sellers", lambda: list(sellers))
+    assert bot.picker_name('sel', 2) is None
+
+    def add_new_seller(ism, mahalla, telefon, parol):
+        sellers.append({'id': 2, 'ism': ism})
+        return True
+
+    monkeypatch.setattr(bot, "add_new_seller", add_new_seller)
+    context = make_context({'new_seller_name': "Vali", 'new_seller_mahalla': "M", 'new_seller_phone': "+998"})
+    asyncio.run(bot.get_new_seller_password(make_update(text="parol"), context))
+    assert bot.picker_name('sel', 2) == "Vali"
+
+
+@pytest.mark.parametrize("payload, kind", [("products", 'prod'), ("sellers", 'sel')])
+def test_cache_event_invalidates_picker(bot, payload, kind):
+    bot._picker_cache[kind] = {'names': {}, 'ids': [], 'pages': {}}
+    bot.on_cache_event(payload)
+    assert kind not in bot._picker_cache
@@ -0,0 +1,129 @@
+# /davr hisoboti: davr chegaralari, ixtiyoriy oraliq, "barcha sotuvchilar" holati va
+# get_inventory_in_range (LIMIT + butun oraliq bo'yicha jami). Oxirgisi bazaga bog'liq.
+import uuid
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def frozen_now(bot, monkeypatch):
+    def freeze(now: datetime):
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+        monkeypatch.setattr(bot, "datetime", FrozenDatetime)
+    return freeze
+
+
+@pytest.mark.parametrize("now, period, expected", [
+    # Yil oxiri: oy va hafta keyingi yilga o'tadi (2026-12-31 - payshanba)
+    (datetime(2026, 12, 31, 15, 30), 'month', (datetime(2026, 12, 1), datetime(2027, 1, 1))),
+    (datetime(2026, 12, 31, 15, 30), 'week', (datetime(2026, 12, 28), datetime(2027, 1, 4))),
+    (datetime(2026, 12, 31, 15, 30), 'today', (datetime(2026, 12, 31), datetime(2027, 1, 1))),
+    # Yakshanba haftaning oxirgi kuni; hafta oy chegarasidan o'tadi
+    (datetime(2026, 3, 1, 0, 0), 'week', (datetime(2026, 2, 23), datetime(2026, 3, 2))),
+    (datetime(2026, 3, 1, 0, 0), 'month', (datetime(2026, 3, 1), datetime(2026, 4, 1))),
+    # Dushanba yarim tunda hafta shu kundan boshlanadi; fevral (kabisa bo'lmagan yil) oxiri
+    (datetime(2026, 2, 23, 0, 0), 'week', (datetime(2026, 2, 23), datetime(2026, 3, 2))),
+    (datetime(2026, 2, 28, 23, 59), 'month', (datetime(2026, 2, 1), datetime(2026, 3, 1))),
+])
+def test_period_bounds(bot, frozen_now, now, period, expected):
+    frozen_now(now)
+    assert bot.period_bounds(period) == expected
+
+
+@pytest.mark.parametrize("args, expected", [
+    (["2026-01-01", "2026-01-31"], (datetime(2026, 1, 1), datetime(2026, 2, 1))),
+    (["2026-01-05"], (datetime(2026, 1, 5), datetime(2026, 1, 6))),
+    (["2026-01-05", "2026-01-05"], (datetime(2026, 1, 5), datetime(2026, 1, 6))),
+    # Teskari oraliq va noto'g'ri sana rad etiladi
+    (["2026-01-31", "2026-01-01"], None),
+    (["2026-02-30"], None),
+    (["31.01.2026"], None),
+])
+def test_parse_custom_range(bot, args, expected):
+    assert bot.parse_custom_range(args) == expected
+
+
+def test_admin_gets_all_sellers_after_leaving_seller_detail(bot, monkeypatch, make_update, make_context):
+    monkeypatch.setattr(bot, "ADMIN_IDS", [1])
+    monkeypatch.setattr(bot, "picker_name", lambda kind, item_id: "Ali")
+    requested = []
+
+    def fake_range(seller_id, start, end, limit):
+        requested.append(seller_id)
+        return {'total': 0.0, 'quantity': 0, 'count': 0, 'items': []}
+
+    monkeypatch.setattr(bot, "get_inventory_in_range", fake_range)
+    context = make_context(user_data={'selected_seller_id': 5})
+    start, end = datetime(2026, 1, 1), datetime(2026, 2, 1)
+
+    update = make_update(chat_id=1)
+    asyncio.run(bot.send_range_report(update, context, start, end, "Yanvar"))
+    assert requested == [5]
+    assert "Ali" in update.message.replies[0]
+
+    # Sotuvchilar bo'limiga qaytish tanlovni tozalaydi - hisobot barcha sotuvchilar bo'yicha
+    asyncio.run(bot.sellers_menu(make_update(chat_id=1), context))
+    update = make_update(chat_id=1)
+    asyncio.run(bot.send_range_report(update, context, start, end, "Yanvar"))
+    assert requested == [5, None]
+    assert "Barcha sotuvchilar" in update.message.replies[0]
+
+
+@pytest.fixture
+def inventory(test_db):
+    db = test_db
+    tag = uuid.uuid4().hex[:8]
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    seller_ids = []
+    for i in range(2):
+        cursor.execute("INSERT INTO sellers (ism, parol) VALUES (%s, %s) RETURNING id", (f"r{i}-{tag}", f"r{i}-{tag}"))
+        seller_ids.append(cursor.fetchone()[0])
+    cursor.execute("INSERT INTO products (nomi, narxi) VALUES (%s, 10) RETURNING id", (f"r-{tag}",))
+    product_id = cursor.fetchone()[0]
+
+    # Oraliq: joriy oyning 2-kuni (bo'limlar faqat joriy oydan boshlab yaratiladi)
+    start = datetime.now().replace(day=2, hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=1)
+    rows = [(seller_ids[0], start + timedelta(hours=h), h) for h in range(1, 8)]
+    rows += [(seller_ids[1], start + timedelta(hours=9), 100)]
+    # Oraliqdan tashqarida: chegaradagi `end` kirmaydi
+    rows += [(seller_ids[0], start - timedelta(seconds=1), 1000), (seller_ids[0], end, 1000)]
+    for seller_id, sana, soni in rows:
+        cursor.execute(
+            "INSERT INTO inventory (seller_id, product_id, soni, narxi, sana) VALUES (%s, %s, %s, %s, %s)",
+            (seller_id, product_id, soni, soni * 10, sana)
+        )
+    conn.commit()
+
+    yield db, seller_ids, start, end
+
+    cursor.execute("DELETE FROM inventory WHERE product_id = %s", (product_id,))
+    cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+    cursor.execute("DELETE FROM sellers WHERE id = ANY(%s)", (seller_ids,))
+    conn.commit()
+    conn.close()
+
+
+def test_inventory_in_range_limits_list_but_totals_whole_window(inventory):
+    db, seller_ids, start, end = inventory
+
+    report = db.get_inventory_in_range(seller_ids[0], start, end, limit=3)
+    # Ro'yxat - eng yangi 3 ta, jami esa oraliqdagi barcha 7 ta yozuv bo'yicha
+    assert [item['soni'] for item in report['items']] == [7, 6, 5]
+    assert report['count'] == 7
+    assert report['quantity'] == sum(range(1, 8))
+    assert report['total'] == sum(range(1, 8)) * 10
+
+    report = db.get_inventory_in_range(None, start, end, limit=1)
+    assert [item['soni'] for item in report['items']] == [100]
+    assert report['count'] >= 8
+    assert report['quantity'] >= sum(range(1, 8)) + 100
+
+    empty = db.get_inventory_in_range(seller_ids[0], end + timedelta(days=1), end + timedelta(days=2), limit=3)
+    assert empty == {'total': 0.0, 'quantity': 0, 'count': 0, 'items': []}
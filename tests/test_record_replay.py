@@ -0,0 +1,121 @@
+# recorder.py -> replay.py: yozilgan Update lar stub Bot API ga qarshi qayta o'ynatiladi.
+import time
+import asyncio
+import logging
+import threading
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+import recorder
+import replay
+
+
+def _message_update(update_id: int, chat_id: int, text: str) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 1767225600 + update_id,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f"u{chat_id}"},
+            'text': text,
+        },
+    }, None)
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    path = str(tmp_path / "updates.jsonl")
+    monkeypatch.setattr(recorder, "UPDATE_RECORD_PATH", path)
+    yield path
+    recorder.close()
+
+
+@pytest.fixture
+def stub_server():
+    replay.StubBotAPIHandler.calls.clear()
+    server = replay.start_stub_server()
+    yield f"http://127.0.0.1:{server.server_address[1]}/bot"
+    server.shutdown()
+
+
+def test_record_and_replay_round_trip(recording, stub_server):
+    updates = [_message_update(i, chat_id=100 + i % 2, text=f"salom {i}") for i in range(1, 6)]
+    for update in updates:
+        recorder.record(update.to_json())
+    # Yozish alohida threadda: close() navbatni faylga chiqaradi
+    recorder.close()
+
+    entries = recorder.read_recording([recording])
+    assert [entry['u']['update_id'] for entry in entries] == [1, 2, 3, 4, 5]
+    assert entries[0]['u']['message']['text'] == "salom 1"
+
+    echoed = []
+
+    async def echo(update, context):
+        echoed.append(update.message.text)
+        await update.message.reply_text(update.message.text)
+
+    application = ApplicationBuilder().token(replay.REPLAY_TOKEN).base_url(stub_server).updater(None).build()
+    application.add_handler(MessageHandler(filters.TEXT, echo))
+
+    outcome = asyncio.run(replay._replay(entries, None, application))
+
+    assert replay._summary(outcome['results'])['errors'] == 0
+    assert sorted(outcome['results']) == [1, 2, 3, 4, 5]
+    assert sorted(echoed) == [f"salom {i}" for i in range(1, 6)]
+    assert replay.StubBotAPIHandler.calls['sendMessage'] == 5
+
+
+def test_record_does_not_block_when_disk_is_slow(recording, monkeypatch):
+    monkeypatch.setattr(recorder, "UPDATE_RECORD_QUEUE_SIZE", 1)
+    writing, release = threading.Event(), threading.Event()
+
+    class SlowDisk(logging.Handler):
+        def emit(self, record):
+            writing.set()
+            release.wait(5)
+
+    recorder._get_logger()
+    recorder._listener.handlers = (SlowDisk(),)
+
+    recorder.record(_message_update(1, 1, "x").to_json())
+    assert writing.wait(5)
+    # Yozuvchi thread band, navbatda 1 ta joy bor: qolganlari kutmasdan tashlanadi
+    start = time.perf_counter()
+    for i in range(2, 6):
+        recorder.record(_message_update(i, 1, "x").to_json())
+    assert time.perf_counter() - start < 0.5
+    assert recorder.dropped() == 3
+    release.set()
+
+
+def test_close_with_full_queue(recording, monkeypatch):
+    monkeypatch.setattr(recorder, "UPDATE_RECORD_QUEUE_SIZE", 2)
+    writing, release = threading.Event(), threading.Event()
+
+    class SlowDisk(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.written = []
+
+        def emit(self, record):
+            writing.set()
+            release.wait(5)
+            self.written.append(record.getMessage())
+
+    recorder._get_logger()
+    disk = SlowDisk()
+    recorder._listener.handlers = (disk,)
+
+    for i in range(1, 4):
+        recorder.record(_message_update(i, 1, "x").to_json())
+        if i == 1: assert writing.wait(5)
+    assert recorder._queue_handler.queue.full()
+
+    # Navbat to'la: close() queue.Full bilan yiqilmaydi, disk bo'shagach hammasi yoziladi
+    threading.Timer(0.2, release.set).start()
+    recorder.close()
+    assert len(disk.written) == 3
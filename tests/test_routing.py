@@ -0,0 +1,154 @@
+# So'rovlarni yo'naltirish: replika / asosiy baza, read-your-writes, orqada qolgan va
+# ishlamayotgan replika. psycopg2.connect soxtasi bilan (bazasiz) va ixtiyoriy ravishda
+# ikki haqiqiy baza bilan (TEST_DATABASE_URL + TEST_DATABASE_REPLICA_URL).
+import os
+
+import pytest
+
+import db
+
+PRIMARY, REPLICA = "postgresql://primary/bot", "postgresql://replica/bot"
+
+
+class FakeConnection:
+    def __init__(self, url: str, lag: float):
+        self.url = url
+        self.lag = lag
+        self.closed = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return (self.lag,)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    """url -> {'lag': soniya, 'down': bool}; connects - ulanish urinishlari ro'yxati."""
+    state = {PRIMARY: {'lag': 0.0, 'down': False}, REPLICA: {'lag': 0.0, 'down': False}}
+    connects = []
+
+    def connect(url, connect_timeout=None):
+        connects.append(url)
+        if state[url]['down']: raise db.psycopg2.OperationalError("could not connect to server")
+        return FakeConnection(url, state[url]['lag'])
+
+    monkeypatch.setattr(db.psycopg2, "connect", connect)
+    monkeypatch.setattr(db, "DATABASE_URL", PRIMARY)
+    monkeypatch.setattr(db, "DATABASE_REPLICA_URLS", [REPLICA])
+    monkeypatch.setattr(db, "REPLICA_MAX_LAG", 5.0)
+    monkeypatch.setattr(db, "_replica_state", {})
+    monkeypatch.setattr(db, "_recent_writes", {})
+    monkeypatch.setattr(db, "_primary_breaker", db.CircuitBreaker("Test baza", 3, 1, 60))
+    db.set_request_chat_id(None)
+    yield state, connects
+    db.set_request_chat_id(None)
+
+
+def test_reads_go_to_replica_writes_to_primary(servers):
+    assert db.get_db_connection(readonly=True).url == REPLICA
+    assert db.get_db_connection().url == PRIMARY
+
+
+def test_read_your_writes_pins_chat_to_primary(servers, monkeypatch):
+    db.set_request_chat_id(5)
+    db._mark_write()
+    assert db.get_db_connection(readonly=True).url == PRIMARY
+
+    # Boshqa chat replikadan o'qiydi
+    db.set_request_chat_id(6)
+    assert db.get_db_connection(readonly=True).url == REPLICA
+
+    # Oyna tugagach yozgan chat ham replikaga qaytadi
+    db.set_request_chat_id(5)
+    monkeypatch.setattr(db, "READ_YOUR_WRITES_WINDOW", 0.0)
+    assert db.get_db_connection(readonly=True).url == REPLICA
+
+
+def test_lagging_replica_is_skipped_until_recheck(servers, monkeypatch):
+    state, connects = servers
+    state[REPLICA]['lag'] = 30.0
+    assert db.get_db_connection(readonly=True).url == PRIMARY
+
+    # Lag qayta tekshirilguncha replikaga ulanishga ham urinilmaydi
+    connects.clear()
+    assert db.get_db_connection(readonly=True).url == PRIMARY
+    assert connects == [PRIMARY]
+
+    state[REPLICA]['lag'] = 0.5
+    monkeypatch.setattr(db, "REPLICA_CHECK_INTERVAL", 0.0)
+    assert db.get_db_connection(readonly=True).url == REPLICA
+
+
+def test_replica_down_falls_back_to_primary(servers):
+    state, connects = servers
+    state[REPLICA]['down'] = True
+    assert db.get_db_connection(readonly=True).url == PRIMARY
+    assert not db.db_unavailable()
+
+    # Replika breakeri ochiq: keyingi o'qish replikani kutmasdan asosiy bazaga boradi
+    connects.clear()
+    assert db.get_db_connection(readonly=True).url == PRIMARY
+    assert connects == [PRIMARY]
+
+
+def test_read_from_primary(servers):
+    with db.read_from_primary():
+        assert db.get_db_connection(readonly=True).url == PRIMARY
+    assert db.get_db_connection(readonly=True).url == REPLICA
+
+
+def test_both_down_reports_unavailable(servers):
+    state, _ = servers
+    state[PRIMARY]['down'] = state[REPLICA]['down'] = True
+    assert db.get_db_connection(readonly=True) is None
+    assert db.db_unavailable()
+
+
+# --- Ikki haqiqiy baza bilan ---
+
+@pytest.fixture
+def test_replica(test_db, monkeypatch):
+    url = os.getenv("TEST_DATABASE_REPLICA_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_REPLICA_URL berilmagan")
+    monkeypatch.setattr(db, "DATABASE_REPLICA_URLS", [url])
+    monkeypatch.setattr(db, "_replica_state", {})
+    monkeypatch.setattr(db, "_recent_writes", {})
+    db.set_request_chat_id(None)
+    yield db
+    db.set_request_chat_id(None)
+
+
+def _server_of(conn) -> tuple:
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT current_database(), inet_server_port(), pg_is_in_recovery()")
+        return cursor.fetchone()[:2]
+    finally:
+        conn.close()
+
+
+def test_routing_with_two_servers(test_replica):
+    primary = _server_of(db.get_db_connection())
+    replica = _server_of(db.get_db_connection(readonly=True))
+    if primary == replica:
+        pytest.skip("TEST_DATABASE_REPLICA_URL asosiy baza bilan bir xil")
+
+    db.set_request_chat_id(42)
+    db._mark_write()
+    assert _server_of(db.get_db_connection(readonly=True)) == primary
+    with db.read_from_primary():
+        db.set_request_chat_id(43)
+        assert _server_of(db.get_db_connection(readonly=True)) == primary
+    assert _server_of(db.get_db_connection(readonly=True)) == replica
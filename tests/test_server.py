@@ -0,0 +1,48 @@
+# /debug/... endpointlari: token tekshiruvi (Telegram va Render siz, lokal HTTP server bilan).
+import os
+import json
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+from http.server import HTTPServer
+
+import pytest
+
+import logs
+
+
+@pytest.fixture
+def debug_server(monkeypatch):
+    os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+    # server.py import paytida root loggerni qayta sozlaydi - testlarda kerak emas
+    monkeypatch.setattr(logs, "setup_logging", lambda stream=None: None)
+    import server
+
+    monkeypatch.setattr(server, "DEBUG_TOKEN", "maxfiy-token")
+    httpd = HTTPServer(('127.0.0.1', 0), server.HealthCheckHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def get(path: str, token: str = None) -> int:
+        url = f"http://127.0.0.1:{httpd.server_port}{path}"
+        if token is not None: url += "?token=" + quote(token)
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                json.loads(response.read())
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    yield get
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("path", ["/debug/traces", "/debug/queues"])
+def test_debug_token(debug_server, path):
+    assert debug_server(path) == 403
+    assert debug_server(path, "noto'g'ri") == 403
+    # ASCII bo'lmagan token 500 (TypeError) emas, 403 qaytaradi
+    assert debug_server(path, "tokén-ё") == 403
+    assert debug_server(path, "maxfiy-token") == 200
@@ -0,0 +1,27 @@
+import pytest
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def traces(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    with tracing._buffer_lock:
+        tracing._buffer.clear()
+    for chat_id in (1, 2, 1):
+        with tracing.trace("update", chat_id=chat_id):
+            with tracing.span("handler"):
+                pass
+
+
+def test_newest_first_and_filtered():
+    result = tracing.get_traces(chat_id=1)
+    assert [r['chat_id'] for r in result] == [1, 1]
+    assert result[0]['trace_id'] > result[1]['trace_id']
+    assert result[0]['spans'][0]['name'] == "handler"
+
+
+@pytest.mark.parametrize("limit, expected", [(2, 2), (1, 1), (0, 0), (-5, 0)])
+def test_limit(limit, expected):
+    assert len(tracing.get_traces(limit=limit)) == expected
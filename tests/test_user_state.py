@@ -0,0 +1,29 @@
+import pytest
+from telegram.ext import ApplicationBuilder
+
+import user_state
+
+
+@pytest.fixture
+def application(monkeypatch):
+    monkeypatch.setattr(user_state, "_last_seen", {})
+    return ApplicationBuilder().token("123456:TEST").updater(None).build()
+
+
+def test_evict_idle_drops_only_idle_users(application):
+    for user_id in (1, 2, 3):
+        application.user_data[user_id]['selected_seller_id'] = user_id
+        user_state.touch(user_id)
+    user_state._last_seen[1] -= 100
+    user_state._last_seen[2] -= 100
+
+    assert user_state.evict_idle(application, ttl=50) == 2
+    assert set(application.user_data) == {3}
+    assert user_state.tracked_users() == 1
+
+
+def test_active_user_is_kept(application):
+    application.user_data[1]['temp_product_id'] = 5
+    user_state.touch(1)
+    assert user_state.evict_idle(application, ttl=50) == 0
+    assert application.user_data[1] == {'temp_product_id': 5}
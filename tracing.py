@@ -0,0 +1,149 @@
+# tracing.py
+# Har bir update uchun trace: handler, db.py chaqiruvlari va Telegram so'rovlari span sifatida
+# davomiyligi bilan yoziladi. Tayyor tracelar cheklangan xotira buferida (ring buffer) saqlanadi
+# va server.py dagi /debug/traces orqali ko'riladi.
+import os
+import time
+import random
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# --- Konfiguratsiya ---
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))   # 0..1, qancha update trace qilinadi
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))     # xotirada saqlanadigan tracelar soni
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "100"))         # bitta tracedagi spanlar chegarasi
+
+_buffer = deque(maxlen=TRACE_BUFFER_SIZE)
+_buffer_lock = threading.Lock()   # bufer HTTP server threadidan ham o'qiladi
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_trace_ids = itertools.count(1)
+
+
+class _Trace:
+    __slots__ = ('trace_id', 'name', 'chat_id', 'update_id', 'started_at', 'start', 'spans', 'dropped_spans', 'finished')
+
+    def __init__(self, name: str, chat_id: int or None, update_id: int or None):
+        self.trace_id = next(_trace_ids)
+        self.name = name
+        self.chat_id = chat_id
+        self.update_id = update_id
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.dropped_spans = 0
+        # Handler ichida yaratilgan fon vazifalari contextni meros oladi; trace tugagach
+        # ular yozgan spanlar hisobga olinmaydi
+        self.finished = False
+
+
+def _error_name(error: BaseException or None) -> str or None:
+    return f"{type(error).__name__}: {error}" if error else None
+
+
+@contextmanager
+def trace(name: str, chat_id: int = None, update_id: int = None):
+    """Yangi trace ochadi (TRACE_SAMPLE_RATE bo'yicha tanlab). Ichidagi span() lar shunga yoziladi."""
+    if not TRACE_ENABLED or random.random() >= TRACE_SAMPLE_RATE:
+        yield None
+        return
+
+    current = _Trace(name, chat_id, update_id)
+    token = _current_trace.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_trace.reset(token)
+        current.finished = True
+        record = {
+            'trace_id': current.trace_id,
+            'name': current.name,
+            'chat_id': current.chat_id,
+            'update_id': current.update_id,
+            'started_at': datetime.fromtimestamp(current.started_at).isoformat(timespec='milliseconds'),
+            'duration_ms': round((time.perf_counter() - current.start) * 1000, 3),
+            'error': _error_name(error),
+            'spans': current.spans,
+            'dropped_spans': current.dropped_spans,
+        }
+        with _buffer_lock:
+            _buffer.append(record)
+
+
+@contextmanager
+def span(name: str):
+    """Joriy trace ichida nomlangan bo'lak. Trace bo'lmasa hech narsa qilmaydi."""
+    current = _current_trace.get()
+    if current is None or current.finished:
+        yield
+        return
+
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if len(current.spans) < TRACE_MAX_SPANS:
+            current.spans.append({
+                'name': name,
+                'offset_ms': round((start - current.start) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'error': _error_name(error),
+            })
+        else:
+            current.dropped_spans += 1
+
+
+def traced(name: str = None):
+    """Sinxron funksiya uchun dekorator: har chaqiruv joriy tracega span bo'lib yoziladi."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None: return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_async(name: str = None):
+    """Asinxron funksiya (handler) uchun dekorator."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_trace.get() is None: return await func(*args, **kwargs)
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_traces(chat_id: int = None, min_duration_ms: float = 0.0, limit: int = 100) -> list:
+    """Eng yangi tracelardan boshlab, chat_id va minimal davomiylik bo'yicha filtrlangan ro'yxat."""
+    if limit <= 0: return []
+    with _buffer_lock:
+        records = list(_buffer)
+
+    result = []
+    for record in reversed(records):
+        if chat_id is not None and record['chat_id'] != chat_id: continue
+        if record['duration_ms'] < min_duration_ms: continue
+        result.append(record)
+        if len(result) >= limit: break
+    return result
@@ -0,0 +1,90 @@
+# user_state.py
+# Foydalanuvchi holatini (application.user_data) xotirada cheklash: har bir update da
+# foydalanuvchi "ko'rildi" deb belgilanadi, uzoq harakatsiz qolganlarning user_data si o'chiriladi.
+#
+# Benchmark (DB va Telegramsiz, 100k foydalanuvchi): python user_state.py
+import os
+import gc
+import time
+import resource
+import tracemalloc
+
+# user_id -> oxirgi update vaqti (time.monotonic)
+_last_seen = {}
+
+
+def touch(user_id: int) -> None:
+    _last_seen[user_id] = time.monotonic()
+
+
+def evict_idle(application, ttl: float) -> int:
+    """`ttl` soniyadan ko'p harakatsiz foydalanuvchilarning user_data sini o'chiradi. Sonini qaytaradi."""
+    now = time.monotonic()
+    idle_user_ids = [user_id for user_id, seen in _last_seen.items() if now - seen > ttl]
+    for user_id in idle_user_ids:
+        del _last_seen[user_id]
+        application.drop_user_data(user_id)
+    return len(idle_user_ids)
+
+
+def tracked_users() -> int:
+    return len(_last_seen)
+
+
+# --- Benchmark: 100k foydalanuvchi holati va evict_idle dan keyingi xotira ---
+
+def _rss_mb() -> float:
+    """Joriy RSS (Linux: /proc); boshqa tizimlarda eng yuqori RSS."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _benchmark(users: int = 100_000, active_share: float = 0.1, ttl: float = 1800.0) -> None:
+    from telegram.ext import ApplicationBuilder
+
+    # Token faqat shakl uchun: initialize() chaqirilmaydi, tarmoqqa murojaat yo'q
+    application = ApplicationBuilder().token("123456:BENCH").updater(None).build()
+
+    gc.collect()
+    rss_start = _rss_mb()
+    tracemalloc.start()
+
+    now = time.monotonic()
+    active = int(users * active_share)
+    for user_id in range(1, users + 1):
+        # Suhbat o'rtasida qolgan foydalanuvchining odatiy vaqtinchalik kalitlari
+        data = application.user_data[user_id]
+        data['selected_seller_id'] = user_id % 500
+        data['temp_product_id'] = user_id % 300
+        data['new_seller_name'] = f"Sotuvchi {user_id}"
+        data['new_seller_mahalla'] = f"Mahalla {user_id % 120}"
+        data['new_seller_phone'] = f"+99890{user_id:07d}"
+        # Oxirgi `active` ta foydalanuvchi yaqinda yozgan, qolganlari ttl dan oldin
+        _last_seen[user_id] = now if user_id > users - active else now - ttl - 1
+
+    gc.collect()
+    rss_full = _rss_mb()
+    heap_full = tracemalloc.get_traced_memory()[0] / 2 ** 20
+
+    start = time.perf_counter()
+    evicted = evict_idle(application, ttl)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    gc.collect()
+    rss_after = _rss_mb()
+    heap_after = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+
+    print(f"Foydalanuvchilar: {users}, faol: {active}, ttl={ttl:.0f}s")
+    print(f"RSS: boshida {rss_start:.1f}MB, {users} ta holat bilan {rss_full:.1f}MB "
+          f"(+{rss_full - rss_start:.1f}MB), evict_idle dan keyin {rss_after:.1f}MB")
+    # RSS darhol kamaymaydi: bo'shagan xotira jarayonda qoladi va keyingi foydalanuvchilarga ishlatiladi
+    print(f"Python heap (tracemalloc): {heap_full:.1f}MB -> {heap_after:.1f}MB")
+    print(f"evict_idle: {evicted} ta o'chirildi, {elapsed_ms:.0f}ms; qolgan user_data: "
+          f"{len(application.user_data)}, kuzatilayotgan: {tracked_users()}")
+
+
+if __name__ == '__main__':
+    _benchmark()